@@ -0,0 +1,37 @@
+"""add keyset pagination index on materials
+
+Revision ID: 3f9a6c1e2b7d
+Revises: c2b7e1d5f89a
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '3f9a6c1e2b7d'
+down_revision = 'c2b7e1d5f89a'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        # 列表/待审核列表按 is_approved 等值过滤，再按 (created_at, id) 倒序做游标翻页
+        if 'ix_materials_approved_created_at_id' not in existing:
+            op.create_index(
+                'ix_materials_approved_created_at_id',
+                'materials',
+                ['is_approved', 'created_at', 'id'],
+                unique=False,
+            )
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        if 'ix_materials_approved_created_at_id' in existing:
+            op.drop_index('ix_materials_approved_created_at_id', table_name='materials')
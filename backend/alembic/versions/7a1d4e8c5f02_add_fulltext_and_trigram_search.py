@@ -0,0 +1,76 @@
+"""add full-text search vector and trigram indexes on materials
+
+Revision ID: 7a1d4e8c5f02
+Revises: 3f9a6c1e2b7d
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '7a1d4e8c5f02'
+down_revision = '3f9a6c1e2b7d'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_EXPR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(tags, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
+TRIGRAM_INDEXES = [
+    ('ix_materials_title_trgm', 'title'),
+    ('ix_materials_tags_trgm', 'tags'),
+    ('ix_materials_description_trgm', 'description'),
+]
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    # pg_trgm 自 PostgreSQL 13 起为 trusted 扩展，数据库 owner 即可创建
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'search_vector' not in columns:
+        # 生成列由数据库在 INSERT/UPDATE 时自动维护，无需触发器
+        op.add_column(
+            'materials',
+            sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_EXPR, persisted=True)),
+        )
+
+    existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+    if 'ix_materials_search_vector' not in existing:
+        op.create_index('ix_materials_search_vector', 'materials', ['search_vector'], postgresql_using='gin')
+    for name, column in TRIGRAM_INDEXES:
+        if name not in existing:
+            op.create_index(
+                name,
+                'materials',
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+    for name, _ in TRIGRAM_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='materials')
+    if 'ix_materials_search_vector' in existing:
+        op.drop_index('ix_materials_search_vector', table_name='materials')
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'search_vector' in columns:
+        op.drop_column('materials', 'search_vector')
+    # pg_trgm 扩展可能被其他对象使用，保留不删
@@ -0,0 +1,44 @@
+"""add soft delete column to materials
+
+Revision ID: a8c3e5f1d7b4
+Revises: f3b9d1e7a2c6
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a8c3e5f1d7b4'
+down_revision = 'f3b9d1e7a2c6'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'deleted_at' not in columns:
+            op.add_column('materials', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        # 部分索引只包含待清理的行，后台清理任务按删除时间取批
+        if 'ix_materials_deleted_at' not in existing:
+            op.create_index(
+                'ix_materials_deleted_at',
+                'materials',
+                ['deleted_at'],
+                unique=False,
+                postgresql_where=sa.text('deleted_at IS NOT NULL'),
+            )
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        if 'ix_materials_deleted_at' in existing:
+            op.drop_index('ix_materials_deleted_at', table_name='materials')
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'deleted_at' in columns:
+            op.drop_column('materials', 'deleted_at')
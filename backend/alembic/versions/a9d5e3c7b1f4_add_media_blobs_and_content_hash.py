@@ -0,0 +1,51 @@
+"""add media_blobs table and materials.content_hash
+
+Revision ID: a9d5e3c7b1f4
+Revises: f1a6c4b8d2e3
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a9d5e3c7b1f4'
+down_revision = 'f1a6c4b8d2e3'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'media_blobs' not in existing_tables:
+        op.create_table(
+            'media_blobs',
+            sa.Column('sha256', sa.String(64), primary_key=True),
+            sa.Column('file_path', sa.String(500), nullable=False),
+            sa.Column('size', sa.Integer),
+            sa.Column('ref_count', sa.Integer, nullable=False, server_default=sa.text('1')),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        )
+
+    # 历史素材没有哈希（content_hash 为空），仍按独占文件处理
+    if 'materials' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'content_hash' not in columns:
+            op.add_column('materials', sa.Column('content_hash', sa.String(64), nullable=True))
+            op.create_index('ix_materials_content_hash', 'materials', ['content_hash'], unique=False)
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'materials' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'content_hash' in columns:
+            existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+            if 'ix_materials_content_hash' in existing:
+                op.drop_index('ix_materials_content_hash', table_name='materials')
+            op.drop_column('materials', 'content_hash')
+
+    if 'media_blobs' in existing_tables:
+        op.drop_table('media_blobs')
@@ -0,0 +1,37 @@
+"""add material_likes table
+
+Revision ID: b5e2f9a7c3d1
+Revises: 7a1d4e8c5f02
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b5e2f9a7c3d1'
+down_revision = '7a1d4e8c5f02'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    # 已有的 materials.likes 计数保留（历史匿名点赞），之后由点赞表增量维护
+    if 'material_likes' not in set(inspector.get_table_names()):
+        op.create_table(
+            'material_likes',
+            sa.Column('user_id', sa.Integer, nullable=False),
+            sa.Column('material_id', sa.Integer, nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.PrimaryKeyConstraint('user_id', 'material_id', name='pk_material_likes'),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='fk_material_likes_users', ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['material_id'], ['materials.id'], name='fk_material_likes_materials', ondelete='CASCADE'),
+        )
+        op.create_index('ix_material_likes_material_id', 'material_likes', ['material_id'], unique=False)
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'material_likes' in set(inspector.get_table_names()):
+        op.drop_table('material_likes')
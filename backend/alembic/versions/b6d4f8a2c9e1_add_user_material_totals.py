@@ -0,0 +1,69 @@
+"""add denormalized material totals and search indexes to users
+
+Revision ID: b6d4f8a2c9e1
+Revises: a8c3e5f1d7b4
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b6d4f8a2c9e1'
+down_revision = 'a8c3e5f1d7b4'
+branch_labels = None
+depends_on = None
+
+# 管理后台按用户名 / 邮箱前缀搜索（lower(col) LIKE 'term%'），text_pattern_ops 使 LIKE 前缀匹配可以走 B-tree
+PREFIX_INDEXES = [
+    ('ix_users_username_lower', 'username'),
+    ('ix_users_email_lower', 'email'),
+]
+
+# 从素材表回填（软删除的素材不计入）
+BACKFILL_SQL = """
+UPDATE users
+SET materials_count = t.n, materials_bytes = t.bytes
+FROM (
+    SELECT uploader_id, count(*) AS n, COALESCE(sum(file_size), 0) AS bytes
+    FROM materials
+    WHERE deleted_at IS NULL AND uploader_id IS NOT NULL
+    GROUP BY uploader_id
+) t
+WHERE users.id = t.uploader_id
+"""
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'users' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('users')}
+    if 'materials_count' not in columns:
+        op.add_column('users', sa.Column('materials_count', sa.Integer(), nullable=False, server_default='0'))
+    if 'materials_bytes' not in columns:
+        op.add_column('users', sa.Column('materials_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+    if 'materials_count' not in columns or 'materials_bytes' not in columns:
+        op.execute(BACKFILL_SQL)
+
+    existing = {idx['name'] for idx in inspector.get_indexes('users')}
+    for name, column in PREFIX_INDEXES:
+        if name not in existing:
+            op.create_index(name, 'users', [sa.text(f'lower({column}) text_pattern_ops')], unique=False)
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'users' not in set(inspector.get_table_names()):
+        return
+
+    existing = {idx['name'] for idx in inspector.get_indexes('users')}
+    for name, _ in PREFIX_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='users')
+
+    columns = {c['name'] for c in inspector.get_columns('users')}
+    for name in ('materials_bytes', 'materials_count'):
+        if name in columns:
+            op.drop_column('users', name)
@@ -0,0 +1,47 @@
+"""add derived asset heartbeat column to materials
+
+Revision ID: c4e8a2f6b1d9
+Revises: b6d4f8a2c9e1
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c4e8a2f6b1d9'
+down_revision = 'b6d4f8a2c9e1'
+branch_labels = None
+depends_on = None
+
+PENDING = "thumbnail_status = 'pending' OR hls_status = 'pending'"
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        # 已有行保持为空：升级前遗留的 pending 行会被恢复任务立即重新排队
+        if 'derived_heartbeat_at' not in columns:
+            op.add_column('materials', sa.Column('derived_heartbeat_at', sa.DateTime(), nullable=True))
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        # 部分索引只包含派生文件仍在生成的行，恢复任务按心跳时间取批
+        if 'ix_materials_derived_pending' not in existing:
+            op.create_index(
+                'ix_materials_derived_pending',
+                'materials',
+                ['derived_heartbeat_at'],
+                unique=False,
+                postgresql_where=sa.text(PENDING),
+            )
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' in set(inspector.get_table_names()):
+        existing = {idx['name'] for idx in inspector.get_indexes('materials')}
+        if 'ix_materials_derived_pending' in existing:
+            op.drop_index('ix_materials_derived_pending', table_name='materials')
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'derived_heartbeat_at' in columns:
+            op.drop_column('materials', 'derived_heartbeat_at')
@@ -0,0 +1,45 @@
+"""add upload_sessions table for resumable uploads
+
+Revision ID: c8e4f2a6d9b3
+Revises: a9d5e3c7b1f4
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = 'c8e4f2a6d9b3'
+down_revision = 'a9d5e3c7b1f4'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'upload_sessions' not in existing_tables:
+        op.create_table(
+            'upload_sessions',
+            sa.Column('id', sa.String(32), primary_key=True),
+            sa.Column('user_id', sa.Integer, sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('filename', sa.String(255), nullable=False),
+            sa.Column('file_type', sa.String(20), nullable=False),
+            sa.Column('total_size', sa.BigInteger, nullable=False),
+            sa.Column('received', sa.BigInteger, nullable=False, server_default=sa.text('0')),
+            sa.Column('chunk_size', sa.Integer, nullable=False),
+            sa.Column('fields', postgresql.JSONB, nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+        )
+        op.create_index('ix_upload_sessions_user_id', 'upload_sessions', ['user_id'], unique=False)
+        # 过期会话清理按 expires_at 扫描
+        op.create_index('ix_upload_sessions_expires_at', 'upload_sessions', ['expires_at'], unique=False)
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'upload_sessions' in existing_tables:
+        op.drop_table('upload_sessions')
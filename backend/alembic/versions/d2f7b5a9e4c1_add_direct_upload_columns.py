@@ -0,0 +1,37 @@
+"""add storage_key and content_hash to upload_sessions for presigned direct uploads
+
+Revision ID: d2f7b5a9e4c1
+Revises: c8e4f2a6d9b3
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd2f7b5a9e4c1'
+down_revision = 'c8e4f2a6d9b3'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'upload_sessions' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('upload_sessions')}
+        if 'storage_key' not in columns:
+            op.add_column('upload_sessions', sa.Column('storage_key', sa.String(500), nullable=True))
+        if 'content_hash' not in columns:
+            op.add_column('upload_sessions', sa.Column('content_hash', sa.String(64), nullable=True))
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'upload_sessions' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('upload_sessions')}
+        if 'content_hash' in columns:
+            op.drop_column('upload_sessions', 'content_hash')
+        if 'storage_key' in columns:
+            op.drop_column('upload_sessions', 'storage_key')
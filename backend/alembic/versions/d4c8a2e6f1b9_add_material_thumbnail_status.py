@@ -0,0 +1,40 @@
+"""add materials.thumbnail_status
+
+Revision ID: d4c8a2e6f1b9
+Revises: b5e2f9a7c3d1
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd4c8a2e6f1b9'
+down_revision = 'b5e2f9a7c3d1'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'thumbnail_status' not in columns:
+        op.add_column(
+            'materials',
+            sa.Column('thumbnail_status', sa.String(20), nullable=False, server_default='none'),
+        )
+        # 已有缩略图的历史数据视为已完成
+        op.execute("UPDATE materials SET thumbnail_status = 'ready' WHERE thumbnail_path IS NOT NULL")
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'thumbnail_status' in columns:
+        op.drop_column('materials', 'thumbnail_status')
@@ -0,0 +1,39 @@
+"""add HLS playlist columns to materials
+
+Revision ID: e5a1c7d3f9b2
+Revises: d2f7b5a9e4c1
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = 'e5a1c7d3f9b2'
+down_revision = 'd2f7b5a9e4c1'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'materials' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        if 'hls_path' not in columns:
+            op.add_column('materials', sa.Column('hls_path', sa.String(500), nullable=True))
+        if 'hls_status' not in columns:
+            op.add_column('materials', sa.Column('hls_status', sa.String(20), nullable=True))
+        if 'hls_files' not in columns:
+            op.add_column('materials', sa.Column('hls_files', postgresql.JSONB(), nullable=True))
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'materials' in existing_tables:
+        columns = {c['name'] for c in inspector.get_columns('materials')}
+        for name in ('hls_files', 'hls_status', 'hls_path'):
+            if name in columns:
+                op.drop_column('materials', name)
@@ -0,0 +1,40 @@
+"""add materials.variants
+
+Revision ID: e7b3d9f2a5c4
+Revises: d4c8a2e6f1b9
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = 'e7b3d9f2a5c4'
+down_revision = 'd4c8a2e6f1b9'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'variants' not in columns:
+        # [{width, height, format, path, size}]，历史数据为空列表
+        op.add_column(
+            'materials',
+            sa.Column('variants', postgresql.JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        )
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    if 'variants' in columns:
+        op.drop_column('materials', 'variants')
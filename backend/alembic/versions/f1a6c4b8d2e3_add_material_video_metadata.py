@@ -0,0 +1,45 @@
+"""add video poster and metadata columns on materials
+
+Revision ID: f1a6c4b8d2e3
+Revises: e7b3d9f2a5c4
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f1a6c4b8d2e3'
+down_revision = 'e7b3d9f2a5c4'
+branch_labels = None
+depends_on = None
+
+VIDEO_COLUMNS = [
+    ('poster_path', sa.String(500)),
+    ('duration', sa.Float()),
+    ('width', sa.Integer()),
+    ('height', sa.Integer()),
+    ('video_codec', sa.String(50)),
+]
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    for name, type_ in VIDEO_COLUMNS:
+        if name not in columns:
+            op.add_column('materials', sa.Column(name, type_, nullable=True))
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'materials' not in set(inspector.get_table_names()):
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('materials')}
+    for name, _ in reversed(VIDEO_COLUMNS):
+        if name in columns:
+            op.drop_column('materials', name)
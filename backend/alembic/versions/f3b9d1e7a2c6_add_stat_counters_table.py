@@ -0,0 +1,64 @@
+"""add stat_counters table for incrementally maintained admin statistics
+
+Revision ID: f3b9d1e7a2c6
+Revises: e5a1c7d3f9b2
+Create Date: 2026-10-18 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f3b9d1e7a2c6'
+down_revision = 'e5a1c7d3f9b2'
+branch_labels = None
+depends_on = None
+
+# 与 app/core/stats.py 中的 RECONCILE_SQL 相同：从原表计算初始计数
+BACKFILL_SQL = """
+INSERT INTO stat_counters (dimension, bucket, metric, value)
+SELECT s.dimension, s.bucket, v.metric, v.value
+FROM (
+    SELECT CASE GROUPING(category, map_name, created_at::date)
+               WHEN 7 THEN 'all' WHEN 3 THEN 'category' WHEN 5 THEN 'map' ELSE 'day' END AS dimension,
+           COALESCE(category, map_name, to_char(created_at::date, 'YYYY-MM-DD'), '') AS bucket,
+           count(*) AS total,
+           count(*) FILTER (WHERE is_approved) AS flagged,
+           'materials' AS total_metric,
+           'approved_materials' AS flagged_metric
+    FROM materials
+    GROUP BY GROUPING SETS ((), (category), (map_name), (created_at::date))
+    UNION ALL
+    SELECT CASE GROUPING(created_at::date) WHEN 1 THEN 'all' ELSE 'day' END,
+           COALESCE(to_char(created_at::date, 'YYYY-MM-DD'), ''),
+           count(*),
+           CASE GROUPING(created_at::date) WHEN 1 THEN count(*) FILTER (WHERE is_active) ELSE 0 END,
+           'users',
+           'active_users'
+    FROM users
+    GROUP BY GROUPING SETS ((), (created_at::date))
+) s
+CROSS JOIN LATERAL (VALUES (s.total_metric, s.total), (s.flagged_metric, s.flagged)) AS v(metric, value)
+WHERE v.value <> 0
+"""
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'stat_counters' not in existing_tables:
+        op.create_table(
+            'stat_counters',
+            sa.Column('dimension', sa.String(20), primary_key=True),
+            sa.Column('bucket', sa.String(100), primary_key=True),
+            sa.Column('metric', sa.String(30), primary_key=True),
+            sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        )
+        op.execute(BACKFILL_SQL)
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    if 'stat_counters' in existing_tables:
+        op.drop_table('stat_counters')
@@ -1,72 +1,238 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
-import os
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Literal, Optional
+from datetime import datetime
 
 from app.core.database import get_db
 from app.core.auth import get_admin_user
 from app.models import models
 from app.schemas import schemas
+from app.core.pagination import InvalidCursor, decode_id_cursor, encode_id_cursor, fetch_page
+from app.core.counting import invalidate_counts, resolve_total
+from app.core.search import apply_search, escape_like
+from app.core.uploads import public_file_key
+from app.core.export import EXPORT_FORMATS, export_query, stream_export
+from app.api.materials import filter_materials
+from app.core.stats import (
+    STAT_COLUMNS, active_deltas, adjust_user_totals, apply_stat_deltas, approval_deltas, load_stats,
+    material_deltas, reconcile_stats, stat_row,
+)
 
 router = APIRouter()
 
-@router.get("/stats", response_model=schemas.AdminStats)
-async def get_admin_stats(
-    admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
-):
-    """获取管理员统计信息"""
-    total_materials = db.query(models.Material).count()
-    approved_materials = db.query(models.Material).filter(models.Material.is_approved == True).count()
-    pending_materials = total_materials - approved_materials
-    
-    total_users = db.query(models.User).count()
-    active_users = db.query(models.User).filter(models.User.is_active == True).count()
-    
+def _breakdown(buckets: dict) -> List[schemas.StatsBucket]:
+    return [
+        schemas.StatsBucket(bucket=bucket, **metrics)
+        for bucket, metrics in buckets.items()
+        if any(metrics.values())
+    ]
+
+async def _admin_stats(db: AsyncSession, days: int) -> schemas.AdminStats:
+    stats = await load_stats(db, days)
+    totals = stats.get("all", {}).get("", {})
+    total_materials = totals.get("materials", 0)
+    approved_materials = totals.get("approved_materials", 0)
     return schemas.AdminStats(
         total_materials=total_materials,
         approved_materials=approved_materials,
-        pending_materials=pending_materials,
-        total_users=total_users,
-        active_users=active_users
+        pending_materials=total_materials - approved_materials,
+        total_users=totals.get("users", 0),
+        active_users=totals.get("active_users", 0),
+        by_category=sorted(_breakdown(stats.get("category", {})), key=lambda b: -b.materials),
+        by_map=sorted(_breakdown(stats.get("map", {})), key=lambda b: -b.materials),
+        by_day=sorted(_breakdown(stats.get("day", {})), key=lambda b: b.bucket),
     )
 
+@router.get("/stats", response_model=schemas.AdminStats)
+async def get_admin_stats(
+    days: int = Query(30, ge=1, le=366, description="按天统计的天数"),
+    admin_user: models.User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取管理员统计信息（读取计数器，不扫描素材 / 用户表）"""
+    return await _admin_stats(db, days)
+
+@router.post("/stats/reconcile", response_model=schemas.AdminStats)
+async def reconcile_admin_stats(
+    days: int = Query(30, ge=1, le=366, description="按天统计的天数"),
+    admin_user: models.User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """从素材 / 用户表重算统计计数器（一条聚合查询），用于校正偏差"""
+    await reconcile_stats(db)
+    await db.commit()
+    return await _admin_stats(db, days)
+
 @router.get("/materials/pending", response_model=schemas.MaterialResponse)
 async def get_pending_materials(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
+    count: Literal["none", "estimate", "exact"] = Query("exact", description="总数统计方式"),
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """获取待审核素材列表"""
-    skip = (page - 1) * size
-    
-    query = db.query(models.Material).filter(models.Material.is_approved == False)
-    total = query.count()
+    query = (
+        select(models.Material)
+        .options(selectinload(models.Material.uploader))
+        .filter(models.Material.is_approved == False, models.Material.deleted_at.is_(None))
+    )
+    total, total_kind = await resolve_total(db, query, count, cache_key=("pending",))
     
-    materials = query.order_by(models.Material.created_at.desc()).offset(skip).limit(size).all()
+    try:
+        materials, next_cursor = await fetch_page(db, query, page, size, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    for m in materials:
+        m.thumbnail_path = public_file_key(m.thumbnail_path)
     
     return schemas.MaterialResponse(
         materials=materials,
         total=total,
+        total_kind=total_kind,
         page=page,
-        size=size
+        size=size,
+        next_cursor=next_cursor
+    )
+
+@router.get("/materials/export")
+async def export_materials(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="导出格式"),
+    category: Optional[str] = Query(None),
+    map_name: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+    include_unapproved: bool = Query(False, description="是否包含未审核素材"),
+    admin_user: models.User = Depends(get_admin_user),
+):
+    """流式导出素材目录（筛选条件与素材列表相同，按 id 排序），服务端游标分批读取"""
+    query, _ = filter_materials(export_query(), category, map_name, search, include_unapproved)
+    filename = f"materials-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        stream_export(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"content-disposition": f'attachment; filename="{filename}"'},
     )
 
+def _bulk_condition(body: schemas.BulkModeration):
+    """把批量请求转换为素材的 WHERE 条件（ids 或筛选条件二选一，筛选条件不能为空）"""
+    if (body.ids is None) == (body.filter is None):
+        raise HTTPException(status_code=400, detail="ids 与 filter 必须且只能提供一个")
+    if body.ids is not None:
+        return models.Material.id.in_(body.ids)
+
+    f = body.filter
+    query = select(models.Material.id)
+    if f.category:
+        query = query.filter(models.Material.category == f.category)
+    if f.map_name:
+        query = query.filter(models.Material.map_name == f.map_name)
+    if f.uploader_id is not None:
+        query = query.filter(models.Material.uploader_id == f.uploader_id)
+    if f.is_approved is not None:
+        query = query.filter(models.Material.is_approved.is_(f.is_approved))
+    if f.created_before is not None:
+        query = query.filter(models.Material.created_at < f.created_before)
+    if f.search and f.search.strip():
+        query, _ = apply_search(query, f.search)
+    if query.whereclause is None:
+        raise HTTPException(status_code=400, detail="筛选条件不能为空")
+    return models.Material.id.in_(query.scalar_subquery())
+
+async def _soft_delete(db: AsyncSession, condition) -> list:
+    """软删除匹配的素材（一条 UPDATE ... RETURNING）并扣减统计计数与上传者计数；文件与行由后台任务清理"""
+    rows = (await db.execute(
+        update(models.Material)
+        .where(condition, models.Material.deleted_at.is_(None))
+        .values(deleted_at=datetime.utcnow(), updated_at=models.Material.updated_at)
+        .returning(models.Material.id, models.Material.uploader_id, models.Material.file_size, *STAT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )).all()
+    if rows:
+        await apply_stat_deltas(db, material_deltas([stat_row(row) for row in rows], sign=-1))
+        await adjust_user_totals(db, [(row.uploader_id, row.file_size) for row in rows], sign=-1)
+        await db.commit()
+        invalidate_counts()
+    return rows
+
+def _bulk_result(rows) -> schemas.BulkModerationResult:
+    return schemas.BulkModerationResult(affected=len(rows), ids=sorted(row.id for row in rows))
+
+# 批量路由需注册在 /materials/{material_id}/... 之前
+@router.post("/materials/batch/approve", response_model=schemas.BulkModerationResult)
+async def bulk_approve_materials(
+    body: schemas.BulkModeration,
+    admin_user: models.User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量审核通过（一条 UPDATE，已审核的素材不重复计数）"""
+    rows = (await db.execute(
+        update(models.Material)
+        .where(
+            _bulk_condition(body),
+            models.Material.is_approved.is_not(True),
+            models.Material.deleted_at.is_(None),
+        )
+        .values(is_approved=True)
+        .returning(models.Material.id, *STAT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )).all()
+    if rows:
+        await apply_stat_deltas(db, approval_deltas([stat_row(row) for row in rows]))
+        await db.commit()
+        invalidate_counts()
+    return _bulk_result(rows)
+
+@router.post("/materials/batch/reject", response_model=schemas.BulkModerationResult)
+async def bulk_reject_materials(
+    body: schemas.BulkModeration,
+    admin_user: models.User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量拒绝并删除待审核素材（已审核的素材不受影响）"""
+    return _bulk_result(await _soft_delete(db, _bulk_condition(body) & models.Material.is_approved.is_not(True)))
+
+@router.post("/materials/batch/delete", response_model=schemas.BulkModerationResult)
+async def bulk_delete_materials(
+    body: schemas.BulkModeration,
+    admin_user: models.User = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量删除素材"""
+    return _bulk_result(await _soft_delete(db, _bulk_condition(body)))
+
 @router.post("/materials/{material_id}/approve")
 async def approve_material(
     material_id: int,
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """审核通过素材"""
-    material = db.query(models.Material).filter(models.Material.id == material_id).first()
-    if not material:
-        raise HTTPException(status_code=404, detail="素材不存在")
+    # 只有状态确实从未审核变为已审核时才计数，重复审核不会重复计入
+    row = (await db.execute(
+        update(models.Material)
+        .where(
+            models.Material.id == material_id,
+            models.Material.is_approved.is_not(True),
+            models.Material.deleted_at.is_(None),
+        )
+        .values(is_approved=True)
+        .returning(*STAT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None:
+        if not await db.scalar(
+            select(models.Material.id).where(models.Material.id == material_id, models.Material.deleted_at.is_(None))
+        ):
+            raise HTTPException(status_code=404, detail="素材不存在")
+        return {"message": "素材审核通过"}
     
-    material.is_approved = True
-    db.commit()
+    await apply_stat_deltas(db, approval_deltas([stat_row(row)]))
+    await db.commit()
+    invalidate_counts()
     
     return {"message": "素材审核通过"}
 
@@ -74,97 +240,68 @@ async def approve_material(
 async def reject_material(
     material_id: int,
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """拒绝素材"""
-    material = db.query(models.Material).filter(models.Material.id == material_id).first()
-    if not material:
+    # 只有从未删除变为已删除的请求才扣减计数，文件与行由后台任务清理
+    if not await _soft_delete(db, models.Material.id == material_id):
         raise HTTPException(status_code=404, detail="素材不存在")
     
-    # 删除文件
-    if material.file_path:
-        file_path = f"uploads/{material.file_path}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    
-    if material.thumbnail_path:
-        thumb_path = f"uploads/{material.thumbnail_path}"
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
-    
-    # 删除数据库记录
-    db.delete(material)
-    db.commit()
-    
     return {"message": "素材已拒绝并删除"}
 
 @router.delete("/materials/{material_id}")
 async def delete_material(
     material_id: int,
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """删除素材"""
-    material = db.query(models.Material).filter(models.Material.id == material_id).first()
-    if not material:
+    # 只有从未删除变为已删除的请求才扣减计数，文件与行由后台任务清理
+    if not await _soft_delete(db, models.Material.id == material_id):
         raise HTTPException(status_code=404, detail="素材不存在")
     
-    # 删除文件
-    if material.file_path:
-        file_path = f"uploads/{material.file_path}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-    
-    if material.thumbnail_path:
-        thumb_path = f"uploads/{material.thumbnail_path}"
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
-    
-    # 删除数据库记录
-    db.delete(material)
-    db.commit()
-    
     return {"message": "素材已删除"}
 
-@router.get("/users", response_model=List[schemas.AdminUser])
+@router.get("/users", response_model=schemas.AdminUserResponse)
 async def get_users(
-    page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor"),
+    search: Optional[str] = Query(None, description="按用户名或邮箱前缀搜索（不区分大小写）"),
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """获取用户列表"""
-    skip = (page - 1) * size
-    
-    # 查询用户及其素材数量
-    users_with_counts = db.query(
-        models.User,
-        func.count(models.Material.id).label('materials_count')
-    ).outerjoin(models.Material).group_by(models.User.id).offset(skip).limit(size).all()
-    
-    result = []
-    for user, materials_count in users_with_counts:
-        admin_user_data = schemas.AdminUser(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            is_active=user.is_active,
-            is_admin=user.is_admin,
-            created_at=user.created_at,
-            materials_count=materials_count
-        )
-        result.append(admin_user_data)
-    
-    return result
+    """获取用户列表（按注册先后倒序，素材数读取冗余计数，不聚合素材表）"""
+    query = select(models.User)
+    if search and search.strip():
+        # lower(col) LIKE 'term%' 走 text_pattern_ops 表达式索引
+        pattern = f"{escape_like(search.strip().lower())}%"
+        query = query.filter(or_(
+            func.lower(models.User.username).like(pattern, escape="\\"),
+            func.lower(models.User.email).like(pattern, escape="\\"),
+        ))
+    if cursor:
+        try:
+            query = query.filter(models.User.id < decode_id_cursor(cursor))
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+
+    rows = (await db.scalars(query.order_by(models.User.id.desc()).limit(size + 1))).all()
+    users = rows[:size]
+    next_cursor = encode_id_cursor(users[-1].id) if len(rows) > size else None
+    return schemas.AdminUserResponse(
+        users=[schemas.AdminUser.model_validate(user) for user in users],
+        size=size,
+        next_cursor=next_cursor,
+    )
 
 @router.post("/users/{user_id}/toggle-active")
 async def toggle_user_active(
     user_id: int,
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """切换用户激活状态"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id, with_for_update=True)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -172,7 +309,8 @@ async def toggle_user_active(
         raise HTTPException(status_code=400, detail="不能修改自己的状态")
     
     user.is_active = not user.is_active
-    db.commit()
+    await apply_stat_deltas(db, active_deltas(1 if user.is_active else -1))
+    await db.commit()
     
     return {"message": f"用户已{'激活' if user.is_active else '禁用'}"}
 
@@ -180,10 +318,10 @@ async def toggle_user_active(
 async def toggle_user_admin(
     user_id: int,
     admin_user: models.User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """切换用户管理员状态"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
@@ -191,6 +329,6 @@ async def toggle_user_admin(
         raise HTTPException(status_code=400, detail="不能修改自己的管理员权限")
     
     user.is_admin = not user.is_admin
-    db.commit()
+    await db.commit()
     
     return {"message": f"用户已{'设为' if user.is_admin else '取消'}管理员"}
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Query, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 import traceback
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import Dict, List, Literal, Optional, Tuple
+from functools import partial
+from pathlib import PurePosixPath
+from pydantic import TypeAdapter, ValidationError
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
 import os
-import uuid
-from pathlib import Path
-from PIL import Image
-import aiofiles
+import zipfile
 
 from app.core.database import get_db
 from app.core.auth import get_current_user
 from app.models import models
 from app.schemas import schemas
 from app.core.config import settings
+from app.core.pagination import InvalidCursor, decode_cursor, fetch_page
+from app.core.search import apply_search
+from app.core.counting import invalidate_counts, resolve_total
+from app.core.view_counter import view_counter
+from app.core.uploads import StreamedFile, UploadTooLarge, get_upload_dir, public_file_key, remove_quietly
+from app.core.upload_form import FORM_OVERHEAD, FileField, MalformedForm, TooManyFiles, UploadForm, receive_form
+from app.core.storage import storage
+from app.core.blobs import DERIVED_FIELDS, acquire_blob, acquire_blobs, blob_file_name, find_processed_sibling, find_processed_siblings
+from app.core.stats import adjust_user_totals, apply_stat_deltas, material_deltas, stat_row
+from app.core.bulk_upload import BulkItem, archive_members, extract_member, stage_items
+from app.core.derived_assets import derived_asset_recovery
 
 router = APIRouter()
 
 # 允许的文件类型
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.mp4', '.mov', '.avi', '.webm'}
-MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_FILE_SIZE = settings.MAX_FILE_SIZE  # 默认 50MB
+BULK_ITEMS_ADAPTER = TypeAdapter(List[schemas.BulkUploadItem])
 
 def get_file_extension(filename: str) -> str:
     return os.path.splitext(filename)[1].lower()
@@ -37,6 +53,31 @@ def get_file_type(filename: str) -> str:
         return 'video'
     return 'unknown'
 
+def get_max_file_size(file_type: str) -> int:
+    """按文件类型取大小上限（MAX_IMAGE_SIZE / MAX_GIF_SIZE / MAX_VIDEO_SIZE）"""
+    return settings.MAX_FILE_SIZES.get(file_type, MAX_FILE_SIZE)
+
+def filter_materials(
+    query,
+    category: Optional[str] = None,
+    map_name: Optional[str] = None,
+    search: Optional[str] = None,
+    include_unapproved: bool = False,
+):
+    """素材列表的筛选条件（列表与导出共用），返回 (query, rank)；没有搜索词时 rank 为 None"""
+    query = query.filter(models.Material.deleted_at.is_(None))
+    if not include_unapproved:
+        query = query.filter(models.Material.is_approved == True)
+    if category:
+        query = query.filter(models.Material.category == category)
+    if map_name:
+        query = query.filter(models.Material.map_name == map_name)
+    rank = None
+    if search and search.strip():
+        # 全文检索 / 三元组回退，page 模式下按相关度排序
+        query, rank = apply_search(query, search)
+    return query, rank
+
 @router.get("/", response_model=schemas.MaterialResponse)
 async def get_materials(
     page: int = Query(1, ge=1),
@@ -44,46 +85,44 @@ async def get_materials(
     category: Optional[str] = Query(None),
     map_name: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="游标分页：上一页返回的 next_cursor，提供时忽略 page"),
+    count: Literal["none", "estimate", "exact"] = Query("exact", description="总数统计方式"),
     include_unapproved: bool = Query(False, description="调试用：是否包含未审核素材"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """获取素材列表"""
-    skip = (page - 1) * size
-    
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+
     try:
-        base_query = db.query(models.Material)
-        if include_unapproved:
-            query = base_query
-        else:
-            query = base_query.filter(models.Material.is_approved == True)
-
-        if category:
-            query = query.filter(models.Material.category == category)
-        if map_name:
-            query = query.filter(models.Material.map_name == map_name)
-        if search:
-            pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    models.Material.title.ilike(pattern),
-                    models.Material.description.ilike(pattern),
-                    models.Material.tags.ilike(pattern),
-                )
-            )
-
-        total = query.count()
-        query = query.order_by(models.Material.created_at.desc())
-        materials = query.offset(skip).limit(size).all()
+        # 一次 IN 查询批量加载本页所有上传者，避免序列化时逐行懒加载
+        query, rank = filter_materials(
+            select(models.Material).options(selectinload(models.Material.uploader)),
+            category, map_name, search, include_unapproved,
+        )
+
+        # 查询总带有 deleted_at IS NULL，不能用 reltuples（会计入待清理的软删除行），估算走 EXPLAIN
+        total, total_kind = await resolve_total(
+            db,
+            query,
+            count,
+            cache_key=("materials", include_unapproved, category, map_name, search.strip() if search else None),
+        )
+        materials, next_cursor = await fetch_page(db, query, page, size, cursor, rank=rank)
 
         for m in materials:
-            if m.thumbnail_path and ("\\" in m.thumbnail_path or ":" in m.thumbnail_path or "/" in m.thumbnail_path):
-                m.thumbnail_path = os.path.basename(m.thumbnail_path)
+            m.thumbnail_path = public_file_key(m.thumbnail_path)
 
         return schemas.MaterialResponse(
             materials=materials,
             total=total,
+            total_kind=total_kind,
             page=page,
-            size=size
+            size=size,
+            next_cursor=next_cursor
         )
     except Exception as e:
         print("[GET /materials] ERROR:", e)
@@ -91,110 +130,440 @@ async def get_materials(
         raise HTTPException(status_code=500, detail=f"内部错误: {e}")
 
 @router.get("/{material_id}", response_model=schemas.Material)
-async def get_material(material_id: int, db: Session = Depends(get_db)):
+async def get_material(material_id: int, db: AsyncSession = Depends(get_db)):
     """获取单个素材详情"""
-    material = db.query(models.Material).filter(models.Material.id == material_id).first()
+    material = await db.scalar(
+        select(models.Material)
+        .options(joinedload(models.Material.uploader))
+        .where(models.Material.id == material_id, models.Material.deleted_at.is_(None))
+    )
     if not material:
         raise HTTPException(status_code=404, detail="素材不存在")
     
-    # 增加浏览次数
-    material.views += 1
-    db.commit()
+    # 增加浏览次数：只记入缓冲区，由后台任务批量写回，读请求不再开启写事务
+    view_counter.record(material.id)
+    result = schemas.Material.model_validate(material)
+    result.views += view_counter.pending(material.id)
     
-    return material
+    return result
+
+def _multipart_doc(properties: dict, required: List[str]) -> dict:
+    """请求体由接口自行流式解析（不声明 File / Form 参数），在 OpenAPI 中补充表单结构"""
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": properties, "required": required,
+    }}}}}
+
+_TEXT = {"type": "string"}
+_BINARY = {"type": "string", "format": "binary"}
+
+async def _receive_upload_form(
+    request: Request,
+    db: AsyncSession,
+    file_fields: Dict[str, FileField],
+    max_body: int,
+    too_large_detail: str = "文件大小超出限制",
+) -> UploadForm:
+    """边接收边把文件写入上传目录；接收请求体前先结束事务，不占用数据库连接"""
+    # get_current_user 的查询开启了事务（expire_on_commit=False，提交后用户对象仍可用）
+    await db.commit()
+    try:
+        return await receive_form(request, get_upload_dir(), file_fields, max_body)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=too_large_detail)
+    except TooManyFiles:
+        raise HTTPException(status_code=400, detail=f"单次最多上传 {settings.BULK_UPLOAD_MAX_FILES} 个文件")
+    except MalformedForm:
+        raise HTTPException(status_code=400, detail="无效的表单数据")
+
+def _form_fields(form: UploadForm, required: Tuple[str, ...], optional: Tuple[str, ...] = ()) -> Dict[str, Optional[str]]:
+    """取表单文本字段，空字符串视为未填写（与 Form 参数一致）；缺少必填字段时返回 422"""
+    values = {name: form.fields.get(name) or None for name in required + optional}
+    missing = [name for name in required if values[name] is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"缺少表单字段: {', '.join(missing)}")
+    return values
+
+def _upload_file_limit(filename: str) -> int:
+    # 验证文件类型：不支持时立即中止，不再接收后续内容
+    if not is_allowed_file(filename):
+        raise HTTPException(status_code=400, detail="不支持的文件类型")
+    return get_max_file_size(get_file_type(filename))
 
-@router.post("/upload", response_model=schemas.Material)
+@router.post("/upload", response_model=schemas.Material, openapi_extra=_multipart_doc(
+    {"title": _TEXT, "category": _TEXT, "description": _TEXT, "map_name": _TEXT, "tags": _TEXT, "file": _BINARY},
+    ["title", "category", "file"],
+))
 async def upload_material(
-    # 这些字段需要从 multipart form 中获取，必须使用 Form 声明，否则会被当作 query 参数导致 422
-    title: str = Form(...),
-    category: str = Form(...),
-    description: Optional[str] = Form(None),
-    map_name: Optional[str] = Form(None),
-    tags: Optional[str] = Form(None),
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """上传素材文件"""
-    
-    # 验证文件类型
-    if not is_allowed_file(file.filename):
-        raise HTTPException(status_code=400, detail="不支持的文件类型")
-    
-    # 读取文件内容以确定大小
-    content = await file.read()
-    file_size = len(content)
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail="文件大小超出限制")
-    # 回到开头供后续保存
-    # (我们已在 content 中持有数据, 不再依赖 file.read())
-    
-    # 生成唯一文件名
-    file_ext = get_file_extension(file.filename)
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    # 与 main.py 中的 UPLOAD_DIR 保持一致
-    base_dir = Path(__file__).resolve().parents[2]  # 到 backend 目录
-    upload_dir = base_dir / settings.UPLOAD_DIR
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    relative_name = unique_filename
-    file_path = upload_dir / relative_name
+    """上传素材文件
+
+    multipart 字段：title、category、description、map_name、tags 与 file。请求头
+    Content-Length 超限时直接拒绝；文件边接收边写入上传目录并计算 SHA-256，
+    超过该类型的大小上限立即中止。
+    """
+    max_body = max(MAX_FILE_SIZE, *settings.MAX_FILE_SIZES.values()) + FORM_OVERHEAD
+    form = await _receive_upload_form(request, db, {"file": FileField(_upload_file_limit)}, max_body)
+    try:
+        fields = _form_fields(form, ("title", "category"), ("description", "map_name", "tags"))
+        files = form.files_for("file")
+        if not files:
+            raise HTTPException(status_code=422, detail="缺少表单字段: file")
+    except HTTPException:
+        form.discard()
+        raise
     
-    # 目录已按 settings 创建，不再重复
+    return await create_material_from_upload(
+        db,
+        background_tasks,
+        files[0].streamed,
+        filename=files[0].filename,
+        uploader=current_user,
+        **fields,
+    )
+
+async def create_material_from_upload(
+    db: AsyncSession,
+    background_tasks: BackgroundTasks,
+    streamed: StreamedFile,
+    filename: str,
+    uploader: models.User,
+    **fields,
+) -> models.Material:
+    """把已落盘的临时文件登记为素材：内容寻址去重、入库并安排缩略图任务
+
+    相同内容只保存一份（<sha256><ext>），重复上传直接复用已生成的缩略图 / 变体。
+    """
+    file_ext = get_file_extension(filename)
+    file_type = get_file_type(filename)
     
-    # 保存文件
-    async with aiofiles.open(file_path, 'wb') as f:
-        await f.write(content)
+    relative_name, is_new_blob = await acquire_blob(
+        db, streamed.sha256, blob_file_name(streamed.sha256, file_ext), streamed.size
+    )
+    if streamed.temp_path is not None:
+        if is_new_blob:
+            # 存入存储后端（本地存储为原子重命名）
+            await storage.save(streamed.temp_path, relative_name)
+        else:
+            remove_quietly(streamed.temp_path)
+    elif streamed.staged_key is not None:
+        # 预签名直传的文件已在存储中的暂存 key 上，不经过 API 进程
+        if is_new_blob:
+            await storage.move(streamed.staged_key, relative_name)
+        else:
+            await storage.delete(streamed.staged_key)
+    elif is_new_blob:
+        # 跳过上传的直传会话依赖已有的内容；其间内容已被清理时需要重新上传
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="文件尚未上传到存储")
     
-    # 生成缩略图（仅对图片）
-    thumbnail_path = None
-    file_type = get_file_type(file.filename)
-    if file_type == 'image':
-        try:
-            thumbnail_filename = f"thumb_{unique_filename}"
-            thumb_path_obj = upload_dir / thumbnail_filename
-            # 仅保存相对文件名，便于前端拼接 /uploads/<name>
-            thumbnail_path = thumbnail_filename
-
-            with Image.open(file_path) as img:
-                img.thumbnail((300, 300))
-                save_kwargs = {"optimize": True}
-                # 只有 JPEG 才设置 quality，PNG 传 quality 会抛出异常
-                if img.format and img.format.upper() in {"JPEG", "JPG"}:
-                    save_kwargs["quality"] = 85
-                img.save(thumb_path_obj, **save_kwargs)
-        except Exception as e:
-            # 不阻断主流程，只记录更明确的错误（含文件名与类型）
-            print(f"生成缩略图失败: {e} (file={file.filename}, path={file_path})")
+    # 图片缩略图 / 视频封面在响应发出后由后台任务生成，这里只标记为 pending
+    derived = _pending_derived(file_type)
+    sibling = None if is_new_blob else await find_processed_sibling(db, streamed.sha256)
+    if sibling is not None:
+        derived = {name: getattr(sibling, name) for name in DERIVED_FIELDS}
     
     # 创建数据库记录
     material = models.Material(
-        title=title,
-        description=description,
-        category=category,
-        map_name=map_name,
         file_path=relative_name,
         file_type=file_type,
-        file_size=file_size,
-        thumbnail_path=thumbnail_path if thumbnail_path else None,
-        tags=tags,
-        uploader_id=current_user.id,  # 使用当前登录用户
-        is_approved=True  # 暂时自动审核通过
+        file_size=streamed.size,
+        content_hash=streamed.sha256,
+        uploader_id=uploader.id,  # 使用当前登录用户
+        uploader=uploader,
+        is_approved=True,  # 暂时自动审核通过
+        created_at=datetime.utcnow(),  # 统计按创建日期计数，需要在提交前确定
+        **derived,
+        **fields,
     )
     
     db.add(material)
-    db.commit()
-    db.refresh(material)
+    try:
+        await apply_stat_deltas(db, material_deltas([stat_row(material)]))
+        await adjust_user_totals(db, [(uploader.id, streamed.size)])
+        await db.commit()
+    except Exception:
+        # 入库失败时清理新保存的文件，避免留下孤儿文件
+        if is_new_blob:
+            await storage.delete(relative_name)
+        raise
+    invalidate_counts()
+    
+    if material.thumbnail_status == 'pending':
+        _schedule_derived_assets(background_tasks, material.id, file_type, relative_name)
     
     return material
 
-@router.post("/{material_id}/like")
-async def like_material(material_id: int, db: Session = Depends(get_db)):
-    material = db.query(models.Material).filter(models.Material.id == material_id).first()
-    if not material:
+def _pending_derived(file_type: str) -> dict:
+    """新文件的派生字段初始状态：由后台任务生成的缩略图 / HLS 先标记为 pending"""
+    derived = {"thumbnail_status": 'pending' if file_type in ('image', 'video') else 'none'}
+    if file_type == 'video' and settings.HLS_ENABLED:
+        derived["hls_status"] = 'pending'
+    return derived
+
+def _schedule_derived_assets(background_tasks: BackgroundTasks, material_id: int, file_type: str, key: str) -> None:
+    """响应发出后生成缩略图 / 变体（图片）或封面与元数据（视频）；任务丢失时由恢复任务重新排队"""
+    background_tasks.add_task(derived_asset_recovery.run, material_id, file_type, key)
+
+def _bulk_file_limit(filename: str) -> Optional[int]:
+    # 不支持的类型不接收内容，稍后记录为该条目的错误
+    return get_max_file_size(get_file_type(filename)) if is_allowed_file(filename) else None
+
+@router.post("/bulk-upload", response_model=schemas.BulkUploadResponse, openapi_extra=_multipart_doc(
+    {
+        "category": {**_TEXT, "description": "默认类别"},
+        "map_name": {**_TEXT, "description": "默认地图"},
+        "tags": {**_TEXT, "description": "默认标签"},
+        "items": {**_TEXT, "description": "JSON 数组：按 filename 覆盖单个文件的 title / category 等字段"},
+        "files": {"type": "array", "items": _BINARY},
+        "archive": {**_BINARY, "description": "zip 压缩包，与 files 可同时提供"},
+    },
+    ["category"],
+))
+async def bulk_upload_materials(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量上传素材：边接收边落盘，一条 INSERT 写入，逐个返回结果
+
+    files 中的文件在接收时直接写入上传目录并计算 SHA-256，超出大小上限的
+    文件只记录在该条目上；压缩包超限或请求体超过 BULK_UPLOAD_MAX_SIZE 时
+    立即中止。
+    """
+    form = await _receive_upload_form(
+        request,
+        db,
+        {
+            "files": FileField(_bulk_file_limit, max_count=settings.BULK_UPLOAD_MAX_FILES, abort_too_large=False),
+            "archive": FileField(lambda _: settings.BULK_ARCHIVE_MAX_SIZE, compute_hash=False),
+        },
+        settings.BULK_UPLOAD_MAX_SIZE,
+        too_large_detail="压缩包或请求大小超出限制",
+    )
+    archives = form.files_for("archive")
+    archive_path = archives[0].streamed.temp_path if archives else None
+    upload_dir = get_upload_dir()
+    try:
+        defaults = _form_fields(form, ("category",), ("map_name", "tags", "items"))
+        try:
+            overrides = {
+                item.filename: item.model_dump(exclude={"filename"}, exclude_none=True)
+                for item in BULK_ITEMS_ADAPTER.validate_json(defaults.pop("items") or "[]")
+            }
+        except ValidationError:
+            raise HTTPException(status_code=400, detail="items 格式错误")
+        
+        # (文件名, 已落盘的文件或错误, 解出压缩包成员的函数)
+        sources = [(f.filename, f, None) for f in form.files_for("files")]
+        if archive_path is not None:
+            try:
+                names = await run_in_threadpool(archive_members, archive_path)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail="无效的 zip 压缩包")
+            sources += [
+                (PurePosixPath(name).name, None, partial(extract_member, archive_path, name, upload_dir))
+                for name in names
+            ]
+        
+        if not sources:
+            raise HTTPException(status_code=400, detail="没有可上传的文件")
+        if len(sources) > settings.BULK_UPLOAD_MAX_FILES:
+            raise HTTPException(status_code=400, detail=f"单次最多上传 {settings.BULK_UPLOAD_MAX_FILES} 个文件")
+        
+        bulk_items = []
+        for index, (filename, received, extract) in enumerate(sources):
+            fields = {"title": os.path.splitext(filename)[0][:200], **defaults}
+            fields.update(overrides.get(filename, {}))
+            item = BulkItem(index=index, filename=filename, fields=fields)
+            if not is_allowed_file(filename):
+                item.error = "不支持的文件类型"
+            elif received is not None:
+                item.streamed = received.streamed
+                if received.too_large:
+                    item.error = "文件大小超出限制"
+            else:
+                item.stage = partial(extract, max_size=get_max_file_size(get_file_type(filename)))
+            bulk_items.append(item)
+        
+        await stage_items(bulk_items, settings.BULK_UPLOAD_CONCURRENCY)
+    except BaseException:
+        form.discard()
+        raise
+    finally:
+        if archive_path is not None:
+            remove_quietly(archive_path)
+    
+    await create_materials_from_uploads(
+        db, background_tasks, [item for item in bulk_items if item.streamed is not None], current_user
+    )
+    
+    results = [
+        schemas.BulkUploadResult(
+            index=item.index, filename=item.filename, material_id=item.material_id, error=item.error
+        )
+        for item in bulk_items
+    ]
+    created = sum(1 for r in results if r.material_id is not None)
+    return schemas.BulkUploadResponse(created=created, failed=len(results) - created, results=results)
+
+async def create_materials_from_uploads(
+    db: AsyncSession,
+    background_tasks: BackgroundTasks,
+    items: List[BulkItem],
+    uploader: models.User,
+) -> None:
+    """create_material_from_upload 的批量版本：一次登记 blob、一条 INSERT 写入全部素材
+
+    新素材的 id 写回 item.material_id。
+    """
+    if not items:
+        return
+    saved_keys = []
+    try:
+        blobs = await acquire_blobs(db, [
+            (item.streamed.sha256, blob_file_name(item.streamed.sha256, get_file_extension(item.filename)), item.streamed.size)
+            for item in items
+        ])
+        
+        # 新 blob 由本批第一个出现的文件保存，其余重复内容直接丢弃临时文件
+        for item in items:
+            relative_name, is_new_blob = blobs[item.streamed.sha256]
+            if is_new_blob and relative_name not in saved_keys:
+                await storage.save(item.streamed.temp_path, relative_name)
+                saved_keys.append(relative_name)
+            else:
+                remove_quietly(item.streamed.temp_path)
+        
+        siblings = await find_processed_siblings(
+            db, [sha256 for sha256, (_, is_new_blob) in blobs.items() if not is_new_blob]
+        )
+        rows = []
+        now = datetime.utcnow()
+        for item in items:
+            file_type = get_file_type(item.filename)
+            sibling = siblings.get(item.streamed.sha256)
+            if sibling is not None:
+                derived = {name: getattr(sibling, name) for name in DERIVED_FIELDS}
+            else:
+                derived = _pending_derived(file_type)
+            rows.append({
+                "file_path": blobs[item.streamed.sha256][0],
+                "file_type": file_type,
+                "file_size": item.streamed.size,
+                "content_hash": item.streamed.sha256,
+                "uploader_id": uploader.id,
+                "is_approved": True,  # 与单个上传一致，暂时自动审核通过
+                "created_at": now,
+                **derived,
+                **item.fields,
+            })
+        
+        # ORM 批量 INSERT ... RETURNING，id 按参数顺序返回
+        ids = (await db.scalars(
+            insert(models.Material).returning(models.Material.id, sort_by_parameter_order=True), rows
+        )).all()
+        await apply_stat_deltas(db, material_deltas(stat_row(row) for row in rows))
+        await adjust_user_totals(db, [(row["uploader_id"], row["file_size"]) for row in rows])
+        await db.commit()
+    except Exception:
+        # 清理本批留下的临时文件与新保存的文件
+        for item in items:
+            remove_quietly(item.streamed.temp_path)
+        for key in saved_keys:
+            await storage.delete(key)
+        raise
+    invalidate_counts()
+    
+    for item, row, material_id in zip(items, rows, ids):
+        item.material_id = material_id
+        if row["thumbnail_status"] == 'pending':
+            _schedule_derived_assets(background_tasks, material_id, row["file_type"], row["file_path"])
+
+async def _update_likes(db: AsyncSession, material_id: int, delta) -> int:
+    """原子地调整冗余的 likes 计数并返回新值（不修改 updated_at）"""
+    return await db.scalar(
+        update(models.Material)
+        .where(models.Material.id == material_id)
+        .values(likes=delta, updated_at=models.Material.updated_at)
+        .returning(models.Material.likes)
+        .execution_options(synchronize_session=False)
+    )
+
+@router.post("/{material_id}/like", response_model=schemas.LikeResult)
+async def like_material(
+    material_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """点赞（幂等，重复点赞不会重复计数）"""
+    # FOR KEY SHARE：提交前素材行不会被清理任务物理删除，插入点赞不会撞上外键错误；
+    # 与更新 likes 的行锁不冲突，并发点赞不会互相阻塞
+    likes = await db.scalar(
+        select(models.Material.likes)
+        .where(models.Material.id == material_id, models.Material.deleted_at.is_(None))
+        .with_for_update(read=True, key_share=True)
+    )
+    if likes is None:
+        raise HTTPException(status_code=404, detail="素材不存在")
+
+    inserted = await db.scalar(
+        pg_insert(models.MaterialLike)
+        .values(user_id=current_user.id, material_id=material_id)
+        .on_conflict_do_nothing()
+        .returning(models.MaterialLike.material_id)
+    )
+    if inserted is not None:
+        likes = await _update_likes(db, material_id, models.Material.likes + 1)
+    await db.commit()
+    return {"likes": likes, "liked": True}
+
+@router.delete("/{material_id}/like", response_model=schemas.LikeResult)
+async def unlike_material(
+    material_id: int,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """取消点赞（幂等）"""
+    likes = await db.scalar(
+        select(models.Material.likes).where(models.Material.id == material_id, models.Material.deleted_at.is_(None))
+    )
+    if likes is None:
         raise HTTPException(status_code=404, detail="素材不存在")
-    material.likes += 1
-    db.commit()
-    return {"likes": material.likes}
+
+    deleted = await db.scalar(
+        models.MaterialLike.__table__.delete()
+        .where(
+            models.MaterialLike.user_id == current_user.id,
+            models.MaterialLike.material_id == material_id,
+        )
+        .returning(models.MaterialLike.material_id)
+    )
+    if deleted is not None:
+        likes = await _update_likes(db, material_id, func.greatest(models.Material.likes - 1, 0))
+    await db.commit()
+    return {"likes": likes, "liked": False}
+
+@router.get("/likes/status", response_model=schemas.LikedStatus)
+async def get_liked_status(
+    ids: List[int] = Query(..., description="一页素材的 id，如 ?ids=1&ids=2"),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量查询当前用户是否点赞过这些素材（一次查询）"""
+    if len(ids) > 100:
+        raise HTTPException(status_code=400, detail="一次最多查询 100 个素材")
+    liked_ids = (await db.scalars(
+        select(models.MaterialLike.material_id).where(
+            models.MaterialLike.user_id == current_user.id,
+            models.MaterialLike.material_id.in_(ids),
+        )
+    )).all()
+    return {"liked_ids": list(liked_ids)}
 
 @router.get("/categories/list")
 async def get_categories():
@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+import hashlib
+import logging
+from urllib.parse import quote
+
+from app.core.database import get_db
+from app.core.config import settings
+from app.models import models
+from app.core.storage import LocalStorage, storage
+from app.core.thumbnails import enabled_formats, image_pool, make_resized
+from app.core.image_cache import image_cache
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+FORMAT_ALIASES = {"jpg": "jpeg"}
+RESIZE_FORMATS = enabled_formats(settings.IMAGE_RESIZE_FORMATS)
+
+def snap_size(value: int, allowed: List[int] = settings.IMAGE_RESIZE_SIZES) -> int:
+    """把请求的边长向上取到允许列表中的值（超过最大值时取最大值），限制缓存中的尺寸种类"""
+    for size in allowed:
+        if size >= value:
+            return size
+    return allowed[-1]
+
+def _image_source(material: models.Material) -> Optional[str]:
+    """缩放的源图：图片 / GIF 用原文件（GIF 取第一帧），视频用封面"""
+    if material.file_type in ("image", "gif"):
+        return material.file_path
+    return material.poster_path
+
+@router.get("/{material_id}/image")
+async def get_resized_image(
+    request: Request,
+    material_id: int,
+    w: int = Query(..., ge=1, description="目标宽度，向上取到 IMAGE_RESIZE_SIZES 中的值"),
+    h: Optional[int] = Query(None, ge=1, description="目标高度（可选），图片等比缩放到 w x h 框内"),
+    fmt: str = Query("webp", description="输出格式：webp / jpeg / png"),
+    db: AsyncSession = Depends(get_db)
+):
+    """按需生成指定尺寸的图片（不放大），结果缓存在磁盘 LRU 中"""
+    fmt = FORMAT_ALIASES.get(fmt.lower(), fmt.lower())
+    if fmt not in RESIZE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的格式，可选: {', '.join(RESIZE_FORMATS)}")
+
+    material = await db.scalar(select(models.Material).where(
+        models.Material.id == material_id, models.Material.deleted_at.is_(None)
+    ))
+    if not material:
+        raise HTTPException(status_code=404, detail="素材不存在")
+    source = _image_source(material)
+    if not source:
+        raise HTTPException(status_code=404, detail="该素材没有可用的图片")
+    # 缩放可能耗时数秒，先归还数据库连接
+    await db.close()
+
+    width = snap_size(w)
+    height = snap_size(h) if h else None
+    # 源文件 key 不可变，缓存名由源 key 与参数确定，同时作为强 ETag
+    digest = hashlib.sha256(f"{source}|{width}|{height or ''}|{fmt}".encode()).hexdigest()
+    etag = f'"{digest[:32]}"'
+    headers = {
+        "cache-control": f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable",
+        "etag": etag,
+    }
+    if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    async def _create(dst):
+        async with storage.local_copy(source) as src:
+            await image_pool.run(make_resized, str(src), str(dst), width, height, fmt)
+
+    try:
+        path = await image_cache.get_or_create(f"{digest}.{fmt}", _create)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="源文件不存在")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="图片处理超时，请稍后重试")
+    except Exception as e:
+        logger.warning("resize failed: %r (material=%s, source=%s)", e, material_id, source)
+        raise HTTPException(status_code=422, detail="无法处理该图片")
+
+    media_type = f"image/{fmt}"
+    if settings.MEDIA_ACCEL_REDIRECT and isinstance(storage, LocalStorage) and path.is_relative_to(storage.root):
+        # 与 /uploads 相同，由 nginx 从上传卷发送缓存文件
+        key = path.relative_to(storage.root).as_posix()
+        headers["x-accel-redirect"] = settings.MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(key)
+        return Response(headers=headers, media_type=media_type)
+    return FileResponse(path, media_type=media_type, headers=headers)
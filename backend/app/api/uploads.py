@@ -0,0 +1,294 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Request
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import uuid
+
+from app.core.database import get_db
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.models import models
+from app.schemas import schemas
+from app.core.uploads import StreamedFile, UploadTooLarge, hash_file, remove_quietly, write_chunk_at
+from app.core.upload_sessions import (
+    SessionBusy, detach_session_file, direct_upload_key, discard_session_files, restore_session_file, session_file_lock,
+    session_temp_path,
+)
+from app.core.storage import storage
+from app.api.materials import (
+    create_material_from_upload, get_file_extension, get_file_type, get_max_file_size, is_allowed_file
+)
+
+router = APIRouter()
+
+# 会话中保存、完成时写入素材的字段
+MATERIAL_FIELDS = set(schemas.MaterialBase.model_fields)
+
+def _expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+def _status(session: models.UploadSession) -> schemas.UploadSessionStatus:
+    return schemas.UploadSessionStatus(
+        id=session.id,
+        filename=session.filename,
+        total_size=session.total_size,
+        chunk_size=session.chunk_size,
+        received=session.received,
+        next_chunk=session.received // session.chunk_size,
+        expires_at=session.expires_at,
+    )
+
+def _not_contiguous(received: int, chunk_size: int) -> HTTPException:
+    return HTTPException(status_code=409, detail=f"分片不连续，请从第 {received // chunk_size} 片继续")
+
+def _session_gone() -> HTTPException:
+    return HTTPException(status_code=404, detail="上传会话不存在或已过期")
+
+async def _advance(db: AsyncSession, session_id: str, expected: int, received: int):
+    """仅当进度仍为 expected 时更新为 received 并续期，返回 (received, expires_at)；会话已变化时返回 None"""
+    table = models.UploadSession.__table__
+    row = (await db.execute(
+        update(table)
+        .where(table.c.id == session_id, table.c.received == expected)
+        .values(received=received, expires_at=_expires_at())
+        .returning(table.c.received, table.c.expires_at)
+    )).first()
+    await db.commit()
+    return tuple(row) if row is not None else None
+
+async def _get_session(
+    db: AsyncSession, session_id: str, user: models.User, lock: bool = False
+) -> models.UploadSession:
+    query = select(models.UploadSession).where(
+        models.UploadSession.id == session_id,
+        models.UploadSession.user_id == user.id,
+    )
+    if lock:
+        # 完成 / 取消操作串行执行，并让并发分片的条件更新等到它们提交后落空
+        query = query.with_for_update()
+    session = await db.scalar(query)
+    if session is None or session.expires_at < datetime.utcnow():
+        raise _session_gone()
+    return session
+
+async def _owns_content(db: AsyncSession, user: models.User, sha256: str) -> bool:
+    """该用户是否已有这份内容的素材（可以跳过直传）"""
+    owned = await db.scalar(
+        select(models.Material.id)
+        .where(
+            models.Material.uploader_id == user.id,
+            models.Material.content_hash == sha256,
+            models.Material.deleted_at.is_(None),
+        )
+        .limit(1)
+    )
+    return owned is not None
+
+def _validate_upload(data: schemas.UploadSessionCreate) -> str:
+    """校验文件类型与声明的大小，返回 file_type"""
+    if not is_allowed_file(data.filename):
+        raise HTTPException(status_code=400, detail="不支持的文件类型")
+    file_type = get_file_type(data.filename)
+    if data.total_size > get_max_file_size(file_type):
+        raise HTTPException(status_code=400, detail="文件大小超出限制")
+    return file_type
+
+@router.post("/", response_model=schemas.UploadSessionStatus)
+async def create_upload_session(
+    data: schemas.UploadSessionCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """创建分片上传会话"""
+    file_type = _validate_upload(data)
+    session = models.UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=data.filename,
+        file_type=file_type,
+        total_size=data.total_size,
+        received=0,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        fields=data.model_dump(include=MATERIAL_FIELDS),
+        expires_at=_expires_at(),
+    )
+    temp_path = session_temp_path(session.id)
+    temp_path.touch()
+    db.add(session)
+    try:
+        await db.commit()
+    except Exception:
+        remove_quietly(temp_path)
+        raise
+    return _status(session)
+
+@router.post("/direct", response_model=schemas.DirectUploadTicket)
+async def create_direct_upload(
+    data: schemas.DirectUploadCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """创建直传会话：返回预签名 PUT，客户端把文件直接传到对象存储后调用 complete"""
+    if not storage.supports_presign:
+        raise HTTPException(status_code=400, detail="当前存储后端不支持直传，请使用分片上传")
+    file_type = _validate_upload(data)
+
+    session_id = uuid.uuid4().hex
+    session = models.UploadSession(
+        id=session_id,
+        user_id=current_user.id,
+        filename=data.filename,
+        file_type=file_type,
+        total_size=data.total_size,
+        received=0,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        fields=data.model_dump(include=MATERIAL_FIELDS),
+        storage_key=direct_upload_key(session_id, get_file_extension(data.filename)),
+        content_hash=data.sha256,
+        expires_at=_expires_at(),
+    )
+    # 只有自己上传过的内容才跳过上传；别人的素材中存在该哈希不能证明客户端持有文件
+    owned = await _owns_content(db, current_user, data.sha256)
+    db.add(session)
+    await db.commit()
+
+    upload = None
+    if not owned:
+        upload = schemas.PresignedRequest(**storage.presign_put(session.storage_key, data.total_size, data.sha256))
+    return schemas.DirectUploadTicket(id=session.id, upload=upload, expires_at=session.expires_at)
+
+@router.get("/{session_id}", response_model=schemas.UploadSessionStatus)
+async def get_upload_session(
+    session_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """查询已接收的偏移，断点续传时从 next_chunk 继续"""
+    return _status(await _get_session(db, session_id, current_user))
+
+@router.put("/{session_id}/chunks/{index}", response_model=schemas.UploadSessionStatus)
+async def upload_chunk(
+    request: Request,
+    session_id: str,
+    index: int = Path(..., ge=0),
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """上传第 index 个分片（请求体为原始字节），写在 index * chunk_size 处
+
+    可以重传已接收过的分片（其后的内容会被丢弃），但不能跳过尚未接收的分片。
+    接收请求体期间不持有会话行锁与数据库连接，同一会话的分片由临时文件锁串行。
+    """
+    session = await _get_session(db, session_id, current_user)
+    if session.storage_key:
+        raise HTTPException(status_code=409, detail="直传会话请直接上传到存储")
+    offset = index * session.chunk_size
+    max_bytes = min(session.chunk_size, session.total_size - offset)
+    if max_bytes <= 0:
+        raise HTTPException(status_code=400, detail="分片编号超出文件大小")
+    if offset > session.received:
+        raise _not_contiguous(session.received, session.chunk_size)
+    # 读取请求体可能持续很久，先结束事务归还连接
+    await db.close()
+
+    try:
+        async with session_file_lock(session.id):
+            # 持有文件锁后重新读取进度：锁外读到的值可能已被上一个分片推进
+            received = await db.scalar(
+                select(models.UploadSession.received).where(models.UploadSession.id == session.id)
+            )
+            await db.close()
+            if received is None:
+                raise _session_gone()
+            if offset > received:
+                raise _not_contiguous(received, session.chunk_size)
+            try:
+                written = await write_chunk_at(session_temp_path(session.id), offset, request.stream(), max_bytes)
+            except BaseException:
+                # 文件已截回 offset，进度随之回退，避免 received 超过文件实际长度
+                if offset < received:
+                    await _advance(db, session.id, received, offset)
+                raise
+            updated = await _advance(db, session.id, received, offset + written)
+    except SessionBusy:
+        raise HTTPException(status_code=409, detail="该会话的其他分片正在上传，请稍后重试")
+    except FileNotFoundError:
+        raise _session_gone()
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="分片大小超出限制")
+    if updated is None:
+        raise HTTPException(status_code=409, detail="上传会话已完成或已取消")
+
+    session.received, session.expires_at = updated
+    return _status(session)
+
+@router.post("/{session_id}/complete", response_model=schemas.Material)
+async def complete_upload(
+    background_tasks: BackgroundTasks,
+    session_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """全部分片到齐（或直传完成）后创建素材（与普通上传共用去重与缩略图流程）"""
+    session = await _get_session(db, session_id, current_user, lock=True)
+    staged = None
+    if session.storage_key:
+        # 直传：内容已由对象存储按 SHA-256 校验，这里只核对暂存对象的大小
+        size = await storage.size(session.storage_key)
+        if size is None:
+            # 跳过上传的会话：重新确认该用户仍有这份内容（素材可能已被删除）
+            if not await _owns_content(db, current_user, session.content_hash):
+                raise HTTPException(status_code=409, detail="文件尚未上传到存储")
+            streamed = StreamedFile(temp_path=None, size=session.total_size, sha256=session.content_hash)
+        elif size != session.total_size:
+            await db.delete(session)
+            await db.commit()
+            await discard_session_files(db, session.id, session.storage_key, session.content_hash)
+            raise HTTPException(status_code=400, detail="文件大小与声明不一致")
+        else:
+            streamed = StreamedFile(
+                temp_path=None, size=size, sha256=session.content_hash, staged_key=session.storage_key
+            )
+    else:
+        if session.received != session.total_size:
+            raise HTTPException(status_code=409, detail="文件尚未上传完整")
+        try:
+            # 从这里起文件只在 staged 路径上，重传的分片无法再改写它
+            staged = await detach_session_file(session.id)
+        except SessionBusy:
+            raise HTTPException(status_code=409, detail="该会话的分片正在上传，请稍后重试")
+        except FileNotFoundError:
+            raise _session_gone()
+
+    try:
+        if staged is not None:
+            sha256 = await run_in_threadpool(hash_file, staged)
+            streamed = StreamedFile(temp_path=staged, size=session.total_size, sha256=sha256)
+        # 会话删除与素材创建在同一事务中提交
+        await db.delete(session)
+        return await create_material_from_upload(
+            db,
+            background_tasks,
+            streamed,
+            filename=session.filename,
+            uploader=current_user,
+            **(session.fields or {}),
+        )
+    except BaseException:
+        if staged is not None:
+            restore_session_file(session.id, staged)
+        raise
+
+@router.delete("/{session_id}")
+async def abort_upload(
+    session_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """放弃上传，删除会话与已接收的数据"""
+    session = await _get_session(db, session_id, current_user, lock=True)
+    await db.delete(session)
+    await db.commit()
+    await discard_session_files(db, session.id, session.storage_key, session.content_hash)
+    return {"message": "上传已取消"}
@@ -1,44 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
 
 from app.core.database import get_db
 from app.core.auth import get_password_hash, authenticate_user, create_access_token, get_current_user
 from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
 from app.models import models
 from app.schemas import schemas
+from app.core.stats import apply_stat_deltas, user_deltas
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.User)
-async def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """用户注册"""
     # 检查用户名是否已存在
-    if db.query(models.User).filter(models.User.username == user.username).first():
+    if await db.scalar(select(models.User.id).where(models.User.username == user.username)):
         raise HTTPException(status_code=400, detail="用户名已存在")
     
     # 检查邮箱是否已存在
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == user.email)):
         raise HTTPException(status_code=400, detail="邮箱已被注册")
     
     # 创建新用户
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
-        hashed_password=hashed_password
+        hashed_password=hashed_password,
+        is_active=True,
+        created_at=datetime.utcnow(),
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await apply_stat_deltas(db, user_deltas(db_user.created_at, db_user.is_active))
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=schemas.Token)
-async def login_user(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     """用户登录"""
-    user = authenticate_user(db, user_credentials.username, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,9 +69,9 @@ async def get_current_user_info(current_user: models.User = Depends(get_current_
     return current_user
 
 @router.get("/{user_id}", response_model=schemas.User)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """获取用户信息"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     return user
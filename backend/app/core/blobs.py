@@ -0,0 +1,129 @@
+# 内容寻址存储（按 SHA-256 去重）
+from collections import Counter
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Integer, String, column, delete, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.storage import shard_key
+from app.models import models
+
+"""内容寻址的素材文件
+
+上传时边写边算 SHA-256，文件以 ab/cd/<sha256><ext> 保存，缩略图、封面
+与变体也都以哈希为前缀命名、放在同一目录。media_blobs 表记录每个文件的引用计数：
+
+- 相同内容的再次上传只把 ref_count 加一，丢弃临时文件，并直接复用已有
+  素材生成好的缩略图 / 变体 / 视频元数据
+- 删除素材时 ref_count 减一，只有最后一个引用消失时才删除磁盘文件
+
+引用计数的增减都在素材所在的事务里完成；ON CONFLICT 的行锁保证同一
+内容的并发上传会串行地看到彼此的结果。
+"""
+
+# 复用已有素材时复制的派生字段
+DERIVED_FIELDS = (
+    "thumbnail_path",
+    "thumbnail_status",
+    "variants",
+    "poster_path",
+    "duration",
+    "width",
+    "height",
+    "video_codec",
+    "hls_path",
+    "hls_status",
+    "hls_files",
+)
+
+
+def blob_file_name(sha256: str, ext: str) -> str:
+    """内容对应的存储 key（按哈希分片目录）"""
+    return shard_key(f"{sha256}{ext}")
+
+
+async def acquire_blobs(db: AsyncSession, blobs: Sequence[Tuple[str, str, int]]) -> Dict[str, Tuple[str, bool]]:
+    """批量登记引用（[(sha256, file_path, size)]，可含重复），返回 {sha256: (blob 的 file_path, 是否为新 blob)}
+
+    同一哈希在一批内出现多次时合并为一行，ref_count 一次加上出现次数；
+    按哈希排序写入，避免并发批次之间的行锁死锁。
+    """
+    counts = Counter(sha256 for sha256, _, _ in blobs)
+    values = {}
+    for sha256, file_path, size in blobs:
+        values.setdefault(sha256, {"sha256": sha256, "file_path": file_path, "size": size, "ref_count": counts[sha256]})
+    if not values:
+        return {}
+    stmt = pg_insert(models.MediaBlob).values([values[sha256] for sha256 in sorted(values)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.MediaBlob.sha256],
+        set_={"ref_count": models.MediaBlob.ref_count + stmt.excluded.ref_count},
+    ).returning(models.MediaBlob.sha256, models.MediaBlob.file_path, models.MediaBlob.ref_count)
+    rows = (await db.execute(stmt)).all()
+    # 新插入的行 ref_count 恰好等于本批的引用数（引用归零的行会被删除）
+    return {sha256: (blob_path, ref_count == counts[sha256]) for sha256, blob_path, ref_count in rows}
+
+
+async def acquire_blob(db: AsyncSession, sha256: str, file_path: str, size: int) -> Tuple[str, bool]:
+    """登记一次引用，返回 (blob 的 file_path, 是否为新 blob)"""
+    return (await acquire_blobs(db, [(sha256, file_path, size)]))[sha256]
+
+
+async def release_blobs(db: AsyncSession, hashes: Iterable[str]) -> Set[str]:
+    """批量释放引用（可含重复，每次出现释放一次），返回最后一个引用已消失的哈希，调用方应在提交后删除文件
+
+    一条 UPDATE ... FROM (VALUES ...) 扣减全部计数，再一条 DELETE 删除归零的行；
+    多个哈希时先按哈希顺序加行锁，与 acquire_blobs 的加锁顺序一致，避免并发批次死锁。
+    """
+    counts = Counter(sha256 for sha256 in hashes if sha256)
+    if not counts:
+        return set()
+    if len(counts) > 1:
+        await db.execute(
+            select(models.MediaBlob.sha256)
+            .where(models.MediaBlob.sha256.in_(counts))
+            .order_by(models.MediaBlob.sha256)
+            .with_for_update()
+        )
+    released = values(column("sha256", String), column("n", Integer), name="released").data(sorted(counts.items()))
+    rows = (await db.execute(
+        update(models.MediaBlob)
+        .where(models.MediaBlob.sha256 == released.c.sha256)
+        .values(ref_count=models.MediaBlob.ref_count - released.c.n)
+        .returning(models.MediaBlob.sha256, models.MediaBlob.ref_count)
+        .execution_options(synchronize_session=False)
+    )).all()
+    gone = {sha256 for sha256, ref_count in rows if ref_count <= 0}
+    if gone:
+        await db.execute(delete(models.MediaBlob).where(models.MediaBlob.sha256.in_(gone)))
+    # 没有登记过的（数据异常）按独占文件处理
+    return gone | (set(counts) - {sha256 for sha256, _ in rows})
+
+
+async def release_blob(db: AsyncSession, sha256: str) -> bool:
+    """释放一次引用；返回 True 表示这是最后一个引用，调用方应在提交后删除文件"""
+    return sha256 in await release_blobs(db, [sha256])
+
+
+async def blob_in_use(db: AsyncSession, sha256: str) -> bool:
+    """是否已有素材引用该内容（直传失败 / 过期时据此决定能否删除对象）"""
+    return await db.scalar(select(models.MediaBlob.sha256).where(models.MediaBlob.sha256 == sha256)) is not None
+
+
+async def find_processed_siblings(db: AsyncSession, hashes: Iterable[str]) -> Dict[str, models.Material]:
+    """按哈希各找一个内容相同且派生文件已生成完毕的素材"""
+    hashes = set(hashes)
+    if not hashes:
+        return {}
+    materials = await db.scalars(
+        select(models.Material)
+        .where(models.Material.content_hash.in_(hashes), models.Material.thumbnail_status == "ready")
+        .order_by(models.Material.content_hash)
+        .distinct(models.Material.content_hash)
+    )
+    return {material.content_hash: material for material in materials}
+
+
+async def find_processed_sibling(db: AsyncSession, sha256: str) -> Optional[models.Material]:
+    return (await find_processed_siblings(db, [sha256])).get(sha256)
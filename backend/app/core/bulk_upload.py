@@ -0,0 +1,67 @@
+# 批量上传：并发落盘多个文件 / zip 压缩包成员
+import asyncio
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Callable, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.uploads import StreamedFile, UploadTooLarge, copy_to_temp
+
+"""批量上传
+
+一次请求携带多个文件（multipart）或一个 zip 压缩包，每个文件对应一个
+BulkItem。multipart 中的文件在接收请求体时已直接写入临时文件（见
+upload_form）；压缩包先流式落盘，再在线程池中并发解出成员并计算 SHA-256，
+并发数由 BULK_UPLOAD_CONCURRENCY 限制。单个文件失败只记录在该条目上，
+不影响其他文件。全部落盘后由上传接口一次批量登记 blob、
+一条 INSERT 写入所有素材。
+"""
+
+
+@dataclass
+class BulkItem:
+    index: int
+    filename: str
+    fields: Dict = field(default_factory=dict)
+    # 在线程池中执行、把内容复制到临时文件的函数；为空表示已判定失败
+    stage: Optional[Callable[[], StreamedFile]] = None
+    streamed: Optional[StreamedFile] = None
+    error: Optional[str] = None
+    material_id: Optional[int] = None
+
+
+def archive_members(archive_path: Path) -> List[str]:
+    """压缩包中需要导入的文件（跳过目录、隐藏文件与 macOS 元数据）"""
+    with zipfile.ZipFile(archive_path) as zf:
+        names = []
+        for info in zf.infolist():
+            path = PurePosixPath(info.filename)
+            if info.is_dir() or path.name.startswith(".") or "__MACOSX" in path.parts:
+                continue
+            names.append(info.filename)
+        return names
+
+
+def extract_member(archive_path: Path, name: str, upload_dir: Path, max_size: int) -> StreamedFile:
+    """解出单个成员到临时文件；按实际解压字节数限制大小，防止压缩炸弹"""
+    # 每个线程各自打开 ZipFile，共享的文件句柄不是线程安全的
+    with zipfile.ZipFile(archive_path) as zf, zf.open(name) as src:
+        return copy_to_temp(src, upload_dir, max_size)
+
+
+async def stage_items(items: List[BulkItem], concurrency: int) -> None:
+    """并发执行各条目的 stage，把结果写回 streamed / error"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _stage(item: BulkItem) -> None:
+        async with semaphore:
+            try:
+                item.streamed = await run_in_threadpool(item.stage)
+            except UploadTooLarge:
+                item.error = "文件大小超出限制"
+            except Exception:
+                item.error = "文件读取失败"
+
+    await asyncio.gather(*(_stage(item) for item in items if item.stage is not None))
@@ -1,7 +1,7 @@
 import os
 import sys
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
 
@@ -34,6 +34,88 @@ class Settings:
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", str(50 * 1024 * 1024)))  # 50MB
     ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.mp4', '.mov', '.avi', '.webm'}
+    # 文件存储后端：local（UPLOAD_DIR）或 s3（S3 兼容对象存储，如 MinIO）
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local").lower()
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_ENDPOINT_URL: Optional[str] = os.getenv("S3_ENDPOINT_URL") or None  # MinIO: http://minio:9000
+    S3_REGION: Optional[str] = os.getenv("S3_REGION") or None
+    S3_ACCESS_KEY_ID: Optional[str] = os.getenv("S3_ACCESS_KEY_ID") or None
+    S3_SECRET_ACCESS_KEY: Optional[str] = os.getenv("S3_SECRET_ACCESS_KEY") or None
+    # 预签名直传 URL 有效期（秒）
+    S3_PRESIGN_EXPIRES: int = int(os.getenv("S3_PRESIGN_EXPIRES", "3600"))
+    # 按文件类型的大小上限（未设置时沿用 MAX_FILE_SIZE）
+    MAX_FILE_SIZES: Dict[str, int] = {
+        "image": int(os.getenv("MAX_IMAGE_SIZE", str(MAX_FILE_SIZE))),
+        "gif": int(os.getenv("MAX_GIF_SIZE", str(MAX_FILE_SIZE))),
+        "video": int(os.getenv("MAX_VIDEO_SIZE", str(MAX_FILE_SIZE))),
+    }
+
+    # 媒体文件服务：缓存有效期（秒，文件 key 不可变），
+    # MEDIA_ACCEL_REDIRECT 设为 nginx internal location（如 /_media/）时由 nginx 发送文件
+    MEDIA_CACHE_MAX_AGE: int = int(os.getenv("MEDIA_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+    MEDIA_ACCEL_REDIRECT: Optional[str] = os.getenv("MEDIA_ACCEL_REDIRECT") or None
+
+    # 分片续传：分片大小、会话有效期（秒，每次写入分片后顺延）、过期会话清理间隔（秒）
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(5 * 1024 * 1024)))  # 5MB
+    UPLOAD_SESSION_TTL: int = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+    UPLOAD_SESSION_GC_INTERVAL: float = float(os.getenv("UPLOAD_SESSION_GC_INTERVAL", "600"))
+
+    # 软删除素材的后台清理：检查间隔、每批行数、删除文件失败时的重试次数
+    MATERIAL_PURGE_INTERVAL: float = float(os.getenv("MATERIAL_PURGE_INTERVAL", "30"))
+    MATERIAL_PURGE_BATCH: int = int(os.getenv("MATERIAL_PURGE_BATCH", "200"))
+    MATERIAL_PURGE_RETRIES: int = int(os.getenv("MATERIAL_PURGE_RETRIES", "3"))
+
+    # 批量上传：单次最多文件数、同时处理的文件数、zip 压缩包大小上限、单次请求体大小上限
+    BULK_UPLOAD_MAX_FILES: int = int(os.getenv("BULK_UPLOAD_MAX_FILES", "200"))
+    BULK_UPLOAD_CONCURRENCY: int = int(os.getenv("BULK_UPLOAD_CONCURRENCY", "8"))
+    BULK_ARCHIVE_MAX_SIZE: int = int(os.getenv("BULK_ARCHIVE_MAX_SIZE", str(2 * 1024 * 1024 * 1024)))  # 2GB
+    BULK_UPLOAD_MAX_SIZE: int = int(os.getenv("BULK_UPLOAD_MAX_SIZE", str(BULK_ARCHIVE_MAX_SIZE)))
+
+    # 列表总数缓存（秒）
+    COUNT_CACHE_TTL: int = int(os.getenv("COUNT_CACHE_TTL", "60"))
+    # 浏览次数缓冲写回间隔（秒）
+    VIEW_FLUSH_INTERVAL: float = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
+
+    # 图片处理进程池：进程数 / 同时提交的任务上限 / 单任务超时（秒）
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", "2"))
+    IMAGE_CONCURRENCY: int = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+    IMAGE_TIMEOUT: float = float(os.getenv("IMAGE_TIMEOUT", "30"))
+    # 响应式图片变体：宽度列表（像素）与输出格式（webp，可选 avif）
+    IMAGE_VARIANT_WIDTHS: List[int] = [
+        int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "160,480,1080").split(",") if w.strip()
+    ]
+    IMAGE_VARIANT_FORMATS: List[str] = [
+        f.strip().lower() for f in os.getenv("IMAGE_VARIANT_FORMATS", "webp").split(",") if f.strip()
+    ]
+    # 按需缩放（/api/media/{id}/image）：允许的边长（请求值向上取到列表中的值）、输出格式、
+    # 磁盘缓存目录（默认 UPLOAD_DIR/.resized）与容量上限（字节，超出后按最近最少使用淘汰）
+    IMAGE_RESIZE_SIZES: List[int] = sorted(
+        int(w) for w in os.getenv("IMAGE_RESIZE_SIZES", "160,320,480,640,960,1280,1920").split(",") if w.strip()
+    )
+    IMAGE_RESIZE_FORMATS: List[str] = [
+        f.strip().lower() for f in os.getenv("IMAGE_RESIZE_FORMATS", "webp,jpeg,png").split(",") if f.strip()
+    ]
+    IMAGE_CACHE_DIR: str = os.getenv("IMAGE_CACHE_DIR", "")
+    IMAGE_CACHE_MAX_BYTES: int = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+
+    # 视频处理：ffmpeg / ffprobe 可执行文件、同时运行的提取任务数、单个命令超时（秒）
+    FFMPEG_PATH: str = os.getenv("FFMPEG_PATH", "ffmpeg")
+    FFPROBE_PATH: str = os.getenv("FFPROBE_PATH", "ffprobe")
+    VIDEO_CONCURRENCY: int = int(os.getenv("VIDEO_CONCURRENCY", "2"))
+    VIDEO_TIMEOUT: float = float(os.getenv("VIDEO_TIMEOUT", "120"))
+    # HLS 转码：是否启用、档位（高度:视频码率 kbps，不超过原视频高度）、分片时长（秒）、
+    # 同时运行的转码任务数、单个视频的转码超时（秒）
+    HLS_ENABLED: bool = os.getenv("HLS_ENABLED", "true").lower() in ("1", "true", "yes")
+    HLS_RENDITIONS: List[List[int]] = [
+        [int(x) for x in r.split(":")] for r in os.getenv("HLS_RENDITIONS", "360:800,720:2800,1080:5000").split(",") if r.strip()
+    ]
+    HLS_SEGMENT_SECONDS: int = int(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+    HLS_CONCURRENCY: int = int(os.getenv("HLS_CONCURRENCY", "1"))
+    HLS_TIMEOUT: float = float(os.getenv("HLS_TIMEOUT", "1800"))
+    # 派生文件任务恢复：心跳 / 检查间隔（秒）、心跳超过多久视为任务已丢失（秒，如进程重启）、每批行数
+    DERIVED_RECOVERY_INTERVAL: float = float(os.getenv("DERIVED_RECOVERY_INTERVAL", "60"))
+    DERIVED_STALE_AFTER: float = float(os.getenv("DERIVED_STALE_AFTER", "300"))
+    DERIVED_RECOVERY_BATCH: int = int(os.getenv("DERIVED_RECOVERY_BATCH", "50"))
     
     # 服务器配置
     HOST: str = os.getenv("HOST", "0.0.0.0")
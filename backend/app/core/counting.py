@@ -0,0 +1,124 @@
+# 列表总数统计策略
+import json
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+"""列表总数（total）的计算策略
+
+对大表做 COUNT(*) 往往是列表请求里最贵的一条 SQL，这里提供三种模式：
+
+- exact：精确计数，结果按过滤条件组合缓存在进程内，素材上传 / 审核 /
+  拒绝 / 删除时整体失效，另有 TTL 兜底多进程部署下的陈旧数据
+- estimate：不扫表，无过滤条件时读取 pg_class.reltuples，否则读取
+  EXPLAIN 的行数估算；估算值很小时精确计数本身就很便宜，直接退回 exact
+- none：不返回总数，适合只需要“下一页”的游标翻页客户端
+"""
+
+COUNT_MODES = ("none", "estimate", "exact")
+
+# 估算值低于该阈值时直接精确计数
+ESTIMATE_EXACT_THRESHOLD = 1000
+
+
+class CountCache:
+    """按过滤条件缓存精确计数的简单 TTL 缓存（线程安全）"""
+
+    def __init__(self, ttl: int, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: Dict[Hashable, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: Hashable, value: int) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data.clear()
+            self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+count_cache = CountCache(settings.COUNT_CACHE_TTL)
+
+
+def invalidate_counts() -> None:
+    """素材集合发生变化（上传 / 审核 / 拒绝 / 删除）后调用"""
+    count_cache.invalidate()
+
+
+async def exact_count(db: AsyncSession, query, cache_key: Hashable) -> int:
+    cached = count_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    count_cache.set(cache_key, total)
+    return total
+
+
+async def estimate_table_rows(db: AsyncSession, table_name: str) -> Optional[int]:
+    """读取 pg_class.reltuples；表从未 ANALYZE 过时返回 None"""
+    reltuples = await db.scalar(
+        text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": table_name},
+    )
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+async def estimate_query_rows(db: AsyncSession, query) -> int:
+    """读取规划器对查询结果行数的估算（EXPLAIN，不实际执行）"""
+    conn = await db.connection()
+    compiled = query.order_by(None).compile(
+        dialect=conn.dialect,
+        compile_kwargs={"render_postcompile": True},
+    )
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def resolve_total(
+    db: AsyncSession,
+    query,
+    mode: str,
+    cache_key: Hashable,
+    table_name: Optional[str] = None,
+) -> Tuple[Optional[int], str]:
+    """按模式计算总数，返回 (total, total_kind)
+
+    table_name 仅在查询没有任何过滤条件时传入，此时估算直接读 reltuples。
+    """
+    if mode == "none":
+        return None, "none"
+    if mode == "estimate":
+        if table_name:
+            estimate = await estimate_table_rows(db, table_name)
+        else:
+            estimate = await estimate_query_rows(db, query)
+        if estimate is not None and estimate >= ESTIMATE_EXACT_THRESHOLD:
+            return estimate, "estimate"
+    return await exact_count(db, query, cache_key), "exact"
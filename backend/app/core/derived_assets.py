@@ -0,0 +1,149 @@
+# 派生文件任务的登记与恢复
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from pathlib import PurePosixPath
+from typing import Optional, Set
+
+from sqlalchemy import or_, select, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.thumbnails import generate_image_assets
+from app.core.video import process_video
+from app.models import models
+
+"""派生文件任务的恢复
+
+缩略图 / 变体与视频封面 / HLS 由上传请求的后台任务生成，进程重启或崩溃时
+正在排队、运行的任务随之丢失，对应的行会一直停在 thumbnail_status /
+hls_status = 'pending'（分片迁移脚本也会一直跳过它们）。
+
+每个任务运行期间登记在本进程中，后台循环每隔 DERIVED_RECOVERY_INTERVAL 秒：
+
+1. 刷新本进程正在处理（含排队等待进程池 / 转码名额）的行的
+   derived_heartbeat_at，任务仍在运行的行不会被其他 worker 抢走
+2. 取一批仍为 pending、心跳超过 DERIVED_STALE_AFTER 秒未刷新的行（FOR UPDATE
+   SKIP LOCKED，多个 worker 各取各的），把心跳改为当前时间后在本进程重新运行
+
+只差 HLS 的视频同样整体重跑 process_video（封面与元数据会重新生成一遍）。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _pending():
+    table = models.Material
+    condition = table.thumbnail_status == "pending"
+    if settings.HLS_ENABLED:
+        # 关闭 HLS 后遗留的 pending 不再有任务处理，不必恢复
+        condition = or_(condition, table.hls_status == "pending")
+    return condition
+
+
+class DerivedAssetRecovery:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = settings.DERIVED_RECOVERY_INTERVAL,
+        stale_after: float = settings.DERIVED_STALE_AFTER,
+        batch_size: int = settings.DERIVED_RECOVERY_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.stale_after = stale_after
+        self.batch_size = batch_size
+        self._running: Set[int] = set()  # 本进程正在处理的素材 id
+        self._tasks: Set[asyncio.Task] = set()  # 恢复出来的任务
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self, material_id: int, file_type: str, key: str) -> None:
+        """生成缩略图 / 变体（图片）或封面、元数据与 HLS（视频），运行期间由心跳续期"""
+        stem = PurePosixPath(key).stem
+        self._running.add(material_id)
+        try:
+            if file_type == "image":
+                await generate_image_assets(material_id, key, stem)
+            elif file_type == "video":
+                await process_video(material_id, key, stem)
+        finally:
+            self._running.discard(material_id)
+
+    async def heartbeat(self, now: Optional[datetime] = None) -> None:
+        """刷新本进程正在处理的行的心跳"""
+        if not self._running:
+            return
+        table = models.Material
+        async with self.session_factory() as db:
+            await db.execute(
+                update(table)
+                .where(table.id.in_(list(self._running)))
+                .values(derived_heartbeat_at=now or datetime.utcnow(), updated_at=table.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def recover(self, now: Optional[datetime] = None) -> int:
+        """认领一批心跳过期的 pending 行并在本进程重新运行，返回认领的行数"""
+        now = now or datetime.utcnow()
+        table = models.Material
+        stale = (
+            select(table.id)
+            .where(
+                table.deleted_at.is_(None),
+                _pending(),
+                or_(
+                    table.derived_heartbeat_at.is_(None),
+                    table.derived_heartbeat_at < now - timedelta(seconds=self.stale_after),
+                ),
+            )
+            .order_by(table.derived_heartbeat_at.nulls_first())
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.session_factory() as db:
+            claimed = (await db.execute(
+                update(table)
+                .where(table.id.in_(stale.scalar_subquery()))
+                .values(derived_heartbeat_at=now, updated_at=table.updated_at)
+                .returning(table.id, table.file_type, table.file_path)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        # 提交后再开始：心跳已是当前时间，其他 worker 不会重复认领
+        for material_id, file_type, key in claimed:
+            task = asyncio.create_task(self.run(material_id, file_type, key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.heartbeat()
+                recovered = await self.recover()
+                if recovered:
+                    logger.info("requeued %d materials with stale derived assets", recovered)
+            except Exception as e:
+                logger.warning("recover derived asset tasks failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # 未完成的任务直接取消：行保持 pending，心跳过期后由任意 worker 恢复
+        tasks = [t for t in (self._task, *self._tasks) if t is not None]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._tasks.clear()
+
+
+derived_asset_recovery = DerivedAssetRecovery()
@@ -0,0 +1,100 @@
+# 素材目录的流式导出
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.core.uploads import public_file_key
+from app.models import models
+
+"""流式导出
+
+导出查询通过服务端游标执行（yield_per，asyncpg 在事务内分批 FETCH），
+每取到一批行就编码为一个 NDJSON / CSV 文本块交给 StreamingResponse，
+内存占用只与批大小有关，导出几百万行也不会在 Python 里拼出完整列表。
+
+响应开始发送后请求的依赖（包括 get_db 的会话）可能已经结束，因此生成器
+自己打开会话，并在客户端断开（生成器被关闭）时随之关闭游标与连接。
+"""
+
+EXPORT_BATCH = 1000
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# 导出的列（按此顺序作为 CSV 表头）
+EXPORT_COLUMNS = (
+    models.Material.id,
+    models.Material.title,
+    models.Material.description,
+    models.Material.category,
+    models.Material.map_name,
+    models.Material.tags,
+    models.Material.file_type,
+    models.Material.file_path,
+    models.Material.file_size,
+    models.Material.content_hash,
+    models.Material.thumbnail_path,
+    models.Material.duration,
+    models.Material.width,
+    models.Material.height,
+    models.Material.views,
+    models.Material.likes,
+    models.Material.is_approved,
+    models.Material.uploader_id,
+    models.User.username.label("uploader"),
+    models.Material.created_at,
+    models.Material.updated_at,
+)
+
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def export_query():
+    """导出的基础查询（按 id 排序，调用方追加筛选条件）"""
+    return (
+        select(*EXPORT_COLUMNS)
+        .outerjoin(models.User, models.User.id == models.Material.uploader_id)
+        .order_by(models.Material.id)
+    )
+
+
+def _value(key: str, value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if key == "thumbnail_path":
+        # 与列表接口一致：旧数据的绝对路径只保留文件名
+        return public_file_key(value)
+    return value
+
+
+def encode_ndjson(rows: Sequence) -> str:
+    return "".join(
+        json.dumps({key: _value(key, value) for key, value in zip(EXPORT_FIELDS, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: Sequence, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_value(key, value) for key, value in zip(EXPORT_FIELDS, row)] for row in rows)
+    return buffer.getvalue()
+
+
+async def stream_export(query, fmt: str, session_factory=AsyncSessionLocal) -> AsyncIterator[str]:
+    """按批产出编码后的文本块；CSV 以 UTF-8 BOM 和表头开始，便于 Excel 识别中文"""
+    if fmt == "csv":
+        yield "\ufeff" + encode_csv([], header=True)
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH))
+        async for rows in result.partitions():
+            yield encode_csv(rows) if fmt == "csv" else encode_ndjson(rows)
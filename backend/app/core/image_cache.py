@@ -0,0 +1,142 @@
+# 按需缩放结果的磁盘 LRU 缓存
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.uploads import get_upload_dir, remove_quietly
+
+"""磁盘 LRU 缓存
+
+缓存文件按名称前两个字符分目录保存，内存中用 OrderedDict 记录
+名称 -> 大小，按最近使用排序；写入新文件后总大小超过 max_bytes 时从最久
+未使用的一端删除。命中时更新文件 mtime，进程重启后按 mtime 重建顺序。
+所有文件系统调用（stat / utime / 删除）都在线程池中执行，不阻塞事件循环。
+
+同一名称的并发请求只生成一次：第一个请求创建生成任务，其余请求等待同一个
+任务（客户端断开也不会取消生成）。
+
+每个 worker 进程各自维护索引，多个 worker 时磁盘占用可能短暂超过上限，
+下一次写入或重启时会按实际文件重新收敛；被其他进程删除的文件视为未命中。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def path(self, name: str) -> Path:
+        return self.directory / name[:2] / name
+
+    def _scan(self) -> "OrderedDict[str, int]":
+        """扫描已有缓存文件，按 mtime 从旧到新排序；顺带清理写了一半的临时文件"""
+        found = []
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if ".tmp-" in entry.name:
+                    remove_quietly(Path(entry.path))
+                    continue
+                st = entry.stat()
+                found.append((st.st_mtime, entry.name, st.st_size))
+        found.sort()
+        return OrderedDict((name, size) for _, name, size in found)
+
+    async def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self._loaded:
+                self._entries = await run_in_threadpool(self._scan)
+                self._total = sum(self._entries.values())
+                self._loaded = True
+                await self._evict()
+
+    def _add(self, name: str, size: int) -> None:
+        self._total += size - self._entries.pop(name, 0)
+        self._entries[name] = size
+
+    def _discard(self, name: str) -> None:
+        self._total -= self._entries.pop(name, 0)
+
+    async def _evict(self) -> None:
+        # 先在内存中摘除，再到线程池删除文件；至少保留最新的一个文件，即使它本身就超过上限
+        victims = []
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total -= size
+            victims.append(self.path(name))
+        if victims:
+            await run_in_threadpool(lambda: [remove_quietly(path) for path in victims])
+
+    @staticmethod
+    def _touch(path: Path) -> Optional[int]:
+        """更新 mtime 作为最近使用时间并返回大小；文件不存在（被其他进程淘汰）时返回 None"""
+        try:
+            os.utime(path)
+            return path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    async def _lookup(self, name: str) -> Optional[Path]:
+        path = self.path(name)
+        size = await run_in_threadpool(self._touch, path)
+        if size is None:
+            self._discard(name)
+            return None
+        self._add(name, size)
+        return path
+
+    async def _create(self, name: str, create: Callable[[Path], Awaitable[None]]) -> Path:
+        path = self.path(name)
+        await run_in_threadpool(path.parent.mkdir, parents=True, exist_ok=True)
+        await create(path)
+        size = (await run_in_threadpool(path.stat)).st_size
+        self._add(name, size)
+        await self._evict()
+        return path
+
+    def _finish(self, name: str, task: asyncio.Task) -> None:
+        self._pending.pop(name, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("generate cached file %s failed: %r", name, task.exception())
+
+    async def get_or_create(self, name: str, create: Callable[[Path], Awaitable[None]]) -> Path:
+        """返回缓存文件路径；未命中时调用 create(path) 生成（同名并发请求共享一次生成）"""
+        await self._ensure_loaded()
+        path = await self._lookup(name)
+        if path is not None:
+            return path
+        task = self._pending.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._create(name, create))
+            self._pending[name] = task
+            task.add_done_callback(lambda t: self._finish(name, t))
+        return await asyncio.shield(task)
+
+
+def get_cache_dir() -> Path:
+    if settings.IMAGE_CACHE_DIR:
+        return Path(settings.IMAGE_CACHE_DIR).resolve()
+    # 默认放在上传目录下（以 . 开头，不会被 /uploads 直接访问），便于 nginx 通过同一个卷发送
+    return get_upload_dir() / ".resized"
+
+
+image_cache = DiskLRUCache(get_cache_dir(), settings.IMAGE_CACHE_MAX_BYTES)
@@ -0,0 +1,158 @@
+# 本地存储的媒体文件服务（长缓存、强 ETag、Range、可选 X-Accel-Redirect）
+import os
+import re
+from calendar import timegm
+from email.utils import formatdate, parsedate
+from mimetypes import guess_type
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+"""媒体文件服务
+
+素材文件的 key 一经写入就不会再改变内容（原文件按 SHA-256 命名，缩略图 /
+封面 / 变体由原文件确定地生成），因此响应带上
+Cache-Control: public, max-age=..., immutable，浏览器与 CDN 在有效期内
+不再回源验证。
+
+ETag 采用与 nginx 相同的强校验格式 "<mtime 十六进制>-<大小十六进制>"，
+Python 直出与 nginx 接管时的条件请求结果一致。
+
+设置 MEDIA_ACCEL_REDIRECT（如 /_media/）后，这里只做路径检查与 304 判断，
+通过 X-Accel-Redirect 把文件传输交给 nginx 的 internal location（sendfile
+零拷贝，Range 也由 nginx 处理），Python worker 不再读取文件字节。
+"""
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_etag(stat_result: os.stat_result) -> str:
+    return f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个字节区间，返回闭区间 (start, end)
+
+    不是单区间的 bytes 请求（多区间等）返回 None，按 RFC 9110 忽略 Range
+    返回完整文件；区间无法满足时抛出 ValueError。
+    """
+    match = RANGE_PATTERN.match(header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """206 Partial Content：只发送文件的 [start, end] 字节"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: Path, start: int, end: int, size: int, headers: Dict[str, str]):
+        self.path = path
+        self.start = start
+        self.end = end
+        super().__init__(status_code=206, headers=headers, media_type=guess_type(path.name)[0])
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # 文件在发送过程中被截断：结束响应，客户端按 Content-Length 判定不完整
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class MediaFiles(StaticFiles):
+    def __init__(self, directory: Path, max_age: int, accel_prefix: Optional[str] = None):
+        super().__init__(directory=str(directory))
+        # lookup_path 返回解析过符号链接的路径，X-Accel-Redirect 的 key 相对它计算
+        self.root = Path(os.path.realpath(directory))
+        self.cache_control = f"public, max-age={max_age}, immutable"
+        self.accel_prefix = accel_prefix.rstrip("/") + "/" if accel_prefix else None
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # 上传临时文件与处理中的工作目录以 . 开头，不对外提供
+        if any(part.startswith(".") for part in PurePosixPath(path).parts):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def _not_modified(self, request_headers: Headers, etag: str, stat_result: os.stat_result) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # 有 If-None-Match 时忽略 If-Modified-Since（RFC 9110 13.1.3）
+            return if_none_match.strip() == "*" or etag in [
+                tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+            ]
+        if_modified_since = parsedate(request_headers.get("if-modified-since", ""))
+        return if_modified_since is not None and int(stat_result.st_mtime) <= timegm(if_modified_since[:6])
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        etag = media_etag(stat_result)
+        headers = {
+            "cache-control": self.cache_control,
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+        if self._not_modified(request_headers, etag, stat_result):
+            return Response(status_code=304, headers=headers)
+
+        full_path = Path(full_path)
+        if self.accel_prefix:
+            key = full_path.relative_to(self.root).as_posix()
+            return Response(
+                headers={"cache-control": self.cache_control, "x-accel-redirect": self.accel_prefix + quote(key)},
+                media_type=guess_type(full_path.name)[0],
+            )
+
+        size = stat_result.st_size
+        range_header = request_headers.get("range")
+        # If-Range 与当前 ETag 不一致说明客户端缓存的是旧内容，返回完整文件
+        if range_header and request_headers.get("if-range", etag) == etag:
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+            if byte_range is not None:
+                return FileRangeResponse(full_path, *byte_range, size=size, headers=headers)
+        return FileResponse(full_path, stat_result=stat_result, headers=headers)
+
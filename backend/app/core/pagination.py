@@ -0,0 +1,104 @@
+# 游标（keyset）分页工具
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+
+"""基于 (created_at, id) 的游标分页
+
+OFFSET 分页在翻到很深的页时需要扫描并丢弃前面所有的行；游标分页只需
+从上一页最后一条记录的位置继续往后读，配合 (created_at, id) 复合索引，
+任意深度的翻页代价都相同。游标对客户端是不透明的字符串。
+"""
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误或已被篡改"""
+
+
+def encode_cursor(created_at: datetime, material_id: int) -> str:
+    """把排序键编码为不透明的 URL 安全字符串"""
+    payload = json.dumps({"c": created_at.isoformat(), "i": material_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，返回 (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["c"]), int(payload["i"])
+    except Exception as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def encode_id_cursor(last_id: int) -> str:
+    """只按 id 排序的列表（如管理后台用户列表）使用的游标"""
+    payload = json.dumps({"i": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_id_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["i"])
+    except Exception as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def order_by_newest(query):
+    """按 created_at、id 倒序排列（id 用于打破 created_at 相同的平局）"""
+    return query.order_by(models.Material.created_at.desc(), models.Material.id.desc())
+
+
+def apply_cursor(query, cursor: Optional[str]):
+    """在查询上追加“位于游标之后”的过滤条件；cursor 为空时原样返回
+
+    使用行值比较 (created_at, id) < (:c, :i)，PostgreSQL 可以直接用
+    (created_at, id) 复合索引做范围扫描。
+    """
+    if not cursor:
+        return query
+    created_at, material_id = decode_cursor(cursor)
+    return query.filter(
+        tuple_(models.Material.created_at, models.Material.id) < tuple_(created_at, material_id)
+    )
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query,
+    page: int,
+    size: int,
+    cursor: Optional[str] = None,
+    rank=None,
+) -> Tuple[List[models.Material], Optional[str]]:
+    """取一页素材并返回 (materials, next_cursor)
+
+    提供 cursor 时走游标模式，忽略 page；否则沿用 page/size 的 OFFSET 模式。
+    两种模式都多取一行来判断是否还有下一页，并都会返回 next_cursor，
+    方便客户端从任意一页切换到游标模式。
+
+    rank 为搜索相关度表达式：仅在 page 模式下生效，按相关度倒序排列，
+    此时结果不是按时间排序的，因此不返回 next_cursor。
+    """
+    ranked = rank is not None and not cursor
+    if ranked:
+        query = order_by_newest(query.order_by(rank.desc()))
+    else:
+        query = order_by_newest(apply_cursor(query, cursor))
+    if not cursor:
+        query = query.offset((page - 1) * size)
+    rows = (await db.execute(query.limit(size + 1))).scalars().all()
+
+    materials = rows[:size]
+    next_cursor = None
+    if len(rows) > size and not ranked:
+        last = materials[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return materials, next_cursor
@@ -0,0 +1,136 @@
+# 软删除素材的后台清理
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, select, update
+
+from app.core.blobs import release_blobs
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.storage import storage
+from app.core.uploads import material_file_names
+from app.models import models
+
+"""软删除与文件清理
+
+管理员删除 / 拒绝素材时只把 deleted_at 设为当前时间并扣减统计计数，
+请求耗时与文件数量无关；deleted_at 非空的行不再出现在任何列表与详情中。
+
+后台任务每隔 MATERIAL_PURGE_INTERVAL 秒按删除时间取一批行（FOR UPDATE
+SKIP LOCKED，多个 worker 各取各的），在同一事务中：
+
+1. 批量释放内容引用，找出最后一个引用已消失的内容
+2. 删除这些素材的全部文件，失败时退避重试 MATERIAL_PURGE_RETRIES 次
+3. 物理删除这批行并提交
+
+释放引用后 media_blobs 的行锁一直持有到提交，同一内容的并发上传会等待
+清理完成后重新登记，不会复用正在删除的文件。文件删除最终失败时整批回滚，
+行保持软删除状态并排到队尾，下一轮再试（已删除的文件再删一次不会报错）。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+async def delete_with_retry(key: str, retries: int = settings.MATERIAL_PURGE_RETRIES) -> None:
+    """删除存储中的文件，失败时按 0.5s、1s、2s… 退避重试，最后一次的异常向上抛出"""
+    for attempt in range(retries + 1):
+        try:
+            await storage.delete(key)
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            logger.info("delete %s failed (attempt %d): %r", key, attempt + 1, e)
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+class MaterialPurger:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = settings.MATERIAL_PURGE_INTERVAL,
+        batch_size: int = settings.MATERIAL_PURGE_BATCH,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge_batch(self) -> int:
+        """清理一批软删除的素材，返回物理删除的行数"""
+        async with self.session_factory() as db:
+            materials: List[models.Material] = list(await db.scalars(
+                select(models.Material)
+                .where(models.Material.deleted_at.is_not(None))
+                .order_by(models.Material.deleted_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ))
+            if not materials:
+                return 0
+            # 回滚后 ORM 实例全部过期，异步会话里不能再懒加载属性，先取出 id
+            ids = [m.id for m in materials]
+
+            # 相同内容的文件可能被其他素材共享，只有最后一个引用消失的内容才删除文件
+            released = await release_blobs(db, [m.content_hash for m in materials])
+            keys = dict.fromkeys(
+                key
+                for m in materials
+                if not m.content_hash or m.content_hash in released
+                for key in material_file_names(m)
+            )
+            try:
+                for key in keys:
+                    await delete_with_retry(key)
+            except Exception:
+                # 整批回滚并把删除时间推后，避免删不掉的文件一直挡在队首
+                await db.rollback()
+                await db.execute(
+                    update(models.Material)
+                    .where(models.Material.id.in_(ids))
+                    .values(deleted_at=datetime.utcnow(), updated_at=models.Material.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                raise
+
+            await db.execute(delete(models.Material).where(models.Material.id.in_(ids)))
+            await db.commit()
+        return len(ids)
+
+    async def purge(self) -> int:
+        """清理全部软删除的素材，返回物理删除的行数"""
+        total = 0
+        while True:
+            removed = await self.purge_batch()
+            total += removed
+            if removed < self.batch_size:
+                return total
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                removed = await self.purge()
+                if removed:
+                    logger.info("purged %d deleted materials", removed)
+            except Exception as e:
+                logger.warning("purge deleted materials failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+material_purger = MaterialPurger()
@@ -0,0 +1,67 @@
+# 素材搜索（PostgreSQL 全文检索 + pg_trgm 三元组回退）
+import re
+from typing import Tuple
+
+from sqlalchemy import func, literal, or_
+
+from app.models import models
+
+"""搜索引擎
+
+materials.search_vector 是由数据库维护的 tsvector 生成列，权重为
+title(A) > tags(B) > description(C)，并建有 GIN 索引；title/tags/description
+另外各有一个 gin_trgm_ops 索引。
+
+- 普通的字母数字词：前缀匹配的 to_tsquery，按 ts_rank_cd 排序
+- 过短（< 3 个字符）或包含中日韩文字的词：'simple' 分词器不会切分 CJK
+  文本，改走三元组回退，用 ILIKE（可由 trigram 索引加速）过滤，
+  按 similarity 排序
+"""
+
+TS_CONFIG = "simple"
+MIN_FTS_TERM_LENGTH = 3
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_trigram_term(term: str) -> bool:
+    """短词或 CJK 词走三元组回退"""
+    return len(term) < MIN_FTS_TERM_LENGTH or bool(_CJK_RE.search(term))
+
+
+def build_prefix_tsquery(term: str) -> str:
+    """把用户输入转为安全的前缀 tsquery 文本，如 "mirage smoke" -> "mirage:* & smoke:*" """
+    words = _WORD_RE.findall(term.lower())
+    return " & ".join(f"{w}:*" for w in words)
+
+
+def escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_search(query, term: str) -> Tuple[object, object]:
+    """为查询追加搜索条件，返回 (query, rank 表达式)"""
+    term = term.strip()
+    tsquery_text = build_prefix_tsquery(term)
+
+    if is_trigram_term(term) or not tsquery_text:
+        pattern = f"%{escape_like(term)}%"
+        query = query.filter(
+            or_(
+                models.Material.title.ilike(pattern, escape="\\"),
+                models.Material.tags.ilike(pattern, escape="\\"),
+                models.Material.description.ilike(pattern, escape="\\"),
+            )
+        )
+        rank = func.greatest(
+            func.similarity(models.Material.title, term),
+            func.similarity(func.coalesce(models.Material.tags, ""), term),
+            func.similarity(func.coalesce(models.Material.description, ""), term) * literal(0.5),
+        )
+        return query, rank
+
+    tsquery = func.to_tsquery(TS_CONFIG, tsquery_text)
+    query = query.filter(models.Material.search_vector.op("@@")(tsquery))
+    rank = func.ts_rank_cd(models.Material.search_vector, tsquery)
+    return query, rank
@@ -0,0 +1,205 @@
+# 管理后台统计计数器
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Integer, column, delete, or_, select, text, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import models
+
+"""统计计数器
+
+stat_counters 按 (dimension, bucket, metric) 保存计数，管理后台读取的是
+几十行计数而不是对 materials / users 做 COUNT(*)，耗时与表大小无关：
+
+- dimension=all：素材总数、已审核数、用户总数、活跃用户数
+- dimension=category / map：按分类、地图的素材数与已审核数
+- dimension=day：按创建日期（UTC）的新增素材数、已审核数与注册用户数
+
+上传、审核、拒绝、删除、注册、启用 / 禁用用户时，调用方在同一个事务里
+用 apply_stat_deltas 增减计数（INSERT ... ON CONFLICT DO UPDATE，按主键
+排序写入避免死锁），与数据变更一起提交或回滚。
+
+reconcile_stats 用一条分组集合（GROUPING SETS）聚合查询从原表重算全部
+计数，用于迁移时的初始填充和计数偏差后的校正。
+
+users.materials_count / materials_bytes 是每个上传者的素材数与总字节数，
+由 adjust_user_totals 在同一事务中增减。调用方先写 stat_counters 再写
+users，与 reconcile_stats 的加锁顺序一致。
+"""
+
+# (dimension, bucket, metric)
+StatKey = Tuple[str, str, str]
+
+# 计算素材计数需要的列，可直接用于 RETURNING
+STAT_COLUMNS = (
+    models.Material.category,
+    models.Material.map_name,
+    models.Material.created_at,
+    models.Material.is_approved,
+)
+
+RECONCILE_USERS_SQL = text("""
+UPDATE users
+SET materials_count = COALESCE(t.n, 0), materials_bytes = COALESCE(t.bytes, 0)
+FROM users u
+LEFT JOIN (
+    SELECT uploader_id, count(*) AS n, COALESCE(sum(file_size), 0) AS bytes
+    FROM materials
+    WHERE deleted_at IS NULL
+    GROUP BY uploader_id
+) t ON t.uploader_id = u.id
+WHERE users.id = u.id
+  AND (users.materials_count, users.materials_bytes) IS DISTINCT FROM (COALESCE(t.n, 0), COALESCE(t.bytes, 0))
+""")
+
+RECONCILE_SQL = text("""
+INSERT INTO stat_counters (dimension, bucket, metric, value)
+SELECT s.dimension, s.bucket, v.metric, v.value
+FROM (
+    SELECT CASE GROUPING(category, map_name, created_at::date)
+               WHEN 7 THEN 'all' WHEN 3 THEN 'category' WHEN 5 THEN 'map' ELSE 'day' END AS dimension,
+           COALESCE(category, map_name, to_char(created_at::date, 'YYYY-MM-DD'), '') AS bucket,
+           count(*) AS total,
+           count(*) FILTER (WHERE is_approved) AS flagged,
+           'materials' AS total_metric,
+           'approved_materials' AS flagged_metric
+    FROM materials
+    WHERE deleted_at IS NULL
+    GROUP BY GROUPING SETS ((), (category), (map_name), (created_at::date))
+    UNION ALL
+    SELECT CASE GROUPING(created_at::date) WHEN 1 THEN 'all' ELSE 'day' END,
+           COALESCE(to_char(created_at::date, 'YYYY-MM-DD'), ''),
+           count(*),
+           CASE GROUPING(created_at::date) WHEN 1 THEN count(*) FILTER (WHERE is_active) ELSE 0 END,
+           'users',
+           'active_users'
+    FROM users
+    GROUP BY GROUPING SETS ((), (created_at::date))
+) s
+CROSS JOIN LATERAL (VALUES (s.total_metric, s.total), (s.flagged_metric, s.flagged)) AS v(metric, value)
+WHERE v.value <> 0
+""")
+
+
+def _day(created_at: Optional[datetime]) -> str:
+    return created_at.date().isoformat() if created_at else ""
+
+
+def stat_row(material) -> Tuple:
+    """从 ORM 对象、RETURNING 行或 INSERT 参数字典中取出 STAT_COLUMNS 对应的值"""
+    if isinstance(material, dict):
+        return tuple(material.get(column.key) for column in STAT_COLUMNS)
+    return tuple(getattr(material, column.key) for column in STAT_COLUMNS)
+
+
+def _material_buckets(category, map_name, created_at) -> List[Tuple[str, str]]:
+    return [("all", ""), ("category", category or ""), ("map", map_name or ""), ("day", _day(created_at))]
+
+
+def material_deltas(rows: Iterable[Tuple], sign: int = 1) -> Counter:
+    """新增（sign=1）/ 删除（sign=-1）素材引起的计数变化，rows 为 stat_row 的结果"""
+    deltas: Counter = Counter()
+    for category, map_name, created_at, is_approved in rows:
+        for dimension, bucket in _material_buckets(category, map_name, created_at):
+            deltas[(dimension, bucket, "materials")] += sign
+            if is_approved:
+                deltas[(dimension, bucket, "approved_materials")] += sign
+    return deltas
+
+
+def approval_deltas(rows: Iterable[Tuple], sign: int = 1) -> Counter:
+    """审核通过（sign=1）/ 撤销审核（sign=-1）引起的计数变化"""
+    deltas: Counter = Counter()
+    for category, map_name, created_at, _ in rows:
+        for dimension, bucket in _material_buckets(category, map_name, created_at):
+            deltas[(dimension, bucket, "approved_materials")] += sign
+    return deltas
+
+
+def user_deltas(created_at: Optional[datetime], is_active: bool, sign: int = 1) -> Counter:
+    """注册（sign=1）/ 删除（sign=-1）用户引起的计数变化"""
+    deltas: Counter = Counter({("all", "", "users"): sign, ("day", _day(created_at), "users"): sign})
+    if is_active:
+        deltas[("all", "", "active_users")] += sign
+    return deltas
+
+
+def active_deltas(sign: int) -> Counter:
+    """启用（sign=1）/ 禁用（sign=-1）用户"""
+    return Counter({("all", "", "active_users"): sign})
+
+
+def counter_upsert(deltas: Dict[StatKey, int]):
+    """增减计数的 INSERT ... ON CONFLICT 语句（同步 / 异步会话通用）；没有变化时返回 None"""
+    rows = [
+        {"dimension": dimension, "bucket": bucket, "metric": metric, "value": value}
+        for (dimension, bucket, metric), value in sorted(deltas.items())
+        if value
+    ]
+    if not rows:
+        return None
+    stmt = pg_insert(models.StatCounter).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[models.StatCounter.dimension, models.StatCounter.bucket, models.StatCounter.metric],
+        set_={"value": models.StatCounter.value + stmt.excluded.value},
+    )
+
+
+async def apply_stat_deltas(db: AsyncSession, deltas: Dict[StatKey, int]) -> None:
+    stmt = counter_upsert(deltas)
+    if stmt is not None:
+        await db.execute(stmt)
+
+
+async def adjust_user_totals(db: AsyncSession, rows: Iterable[Tuple[Optional[int], Optional[int]]], sign: int = 1) -> None:
+    """按上传者增减 users.materials_count / materials_bytes，rows 为 (uploader_id, file_size)；一条 UPDATE ... FROM (VALUES ...)"""
+    totals: Dict[int, List[int]] = {}
+    for uploader_id, file_size in rows:
+        if uploader_id is None:
+            continue
+        total = totals.setdefault(uploader_id, [0, 0])
+        total[0] += sign
+        total[1] += sign * (file_size or 0)
+    if not totals:
+        return
+    changes = values(
+        column("user_id", Integer), column("n", Integer), column("bytes", BigInteger), name="changes"
+    ).data([(user_id, n, size) for user_id, (n, size) in sorted(totals.items())])
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == changes.c.user_id)
+        .values(
+            materials_count=models.User.materials_count + changes.c.n,
+            materials_bytes=models.User.materials_bytes + changes.c.bytes,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def load_stats(db: AsyncSession, days: int) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """读取计数：{dimension: {bucket: {metric: value}}}，按天的计数只取最近 days 天"""
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    table = models.StatCounter
+    rows = (await db.execute(
+        select(table.dimension, table.bucket, table.metric, table.value)
+        .where(or_(table.dimension != "day", table.bucket >= since))
+    )).all()
+    stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for dimension, bucket, metric, value in rows:
+        stats.setdefault(dimension, {}).setdefault(bucket, {})[metric] = value
+    return stats
+
+
+async def reconcile_stats(db: AsyncSession) -> None:
+    """从原表重算全部计数（调用方负责提交）
+
+    EXCLUSIVE 锁会等待已经写过计数的事务提交，并阻塞新的写入直到本事务
+    结束，重算结果因此不会漏掉或重复计入并发的变更；读取不受影响。
+    """
+    await db.execute(text("LOCK TABLE stat_counters IN EXCLUSIVE MODE"))
+    await db.execute(delete(models.StatCounter))
+    await db.execute(RECONCILE_SQL)
+    await db.execute(RECONCILE_USERS_SQL)
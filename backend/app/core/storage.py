@@ -0,0 +1,212 @@
+# 素材文件存储后端（本地目录 / S3 兼容对象存储）
+import base64
+import mimetypes
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.uploads import commit_temp, get_upload_dir, remove_quietly
+
+"""文件存储抽象
+
+素材的原文件、缩略图、封面与变体都以 key（相对路径，如
+ab/cd/<sha256>.jpg，见 shard_key）保存，数据库中的 file_path /
+thumbnail_path 等字段就是 key。早期的素材仍是不分目录的扁平 key，
+两种 key 可以共存，scripts/shard_uploads.py 负责把它们迁移到分片目录。
+
+- local：key 对应 UPLOAD_DIR 下的文件，由 main.py 挂载到 /uploads
+- s3：key 对应存储桶中的对象（AWS S3、MinIO 等），前端通过
+  VITE_UPLOAD_URL 指向桶的公开地址；支持预签名 PUT，客户端直接把文件传到
+  对象存储，API 只负责登记元数据
+
+两种后端的上传临时文件都写在本地 UPLOAD_DIR，缩略图 / 视频处理通过
+local_copy 拿到本地路径（s3 会先下载到临时目录）。
+"""
+
+
+# HLS 播放列表与分片：系统 mime 表中常缺失或把 .ts 识别为其他类型
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+
+def shard_key(name: str) -> str:
+    """按文件名前 4 个字符分两级目录：<sha256>.jpg -> ab/cd/<sha256>.jpg
+
+    单个目录中的文件数因此始终很少，目录查找、备份与静态文件 stat 不会随
+    素材总数变慢。
+    """
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+
+def sibling_key(key: str, name: str) -> str:
+    """与 key 同目录的另一个文件（缩略图、封面、变体与原文件放在一起）"""
+    return str(PurePosixPath(key).with_name(name))
+
+
+class StorageError(RuntimeError):
+    """存储后端配置或调用失败"""
+
+
+class LocalStorage:
+    supports_presign = False
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    async def save(self, local_path: Path, key: str) -> None:
+        """把本地文件移动为 key（同一文件系统内为原子重命名）"""
+        dst = self.path(key)
+        if local_path == dst:
+            return
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        commit_temp(local_path, dst)
+
+    async def move(self, src_key: str, key: str) -> None:
+        """把存储中的 src_key 改名为 key"""
+        dst = self.path(key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        commit_temp(self.path(src_key), dst)
+
+    async def delete(self, key: str) -> None:
+        remove_quietly(self.path(key))
+
+    async def size(self, key: str) -> Optional[int]:
+        """对象大小，不存在时为 None"""
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        # 本地存储直接返回文件本身，处理结果写在同一目录下
+        yield self.path(key)
+
+    def presign_put(self, key: str, size: int, sha256: str) -> Dict:
+        raise StorageError("local storage does not support presigned uploads")
+
+
+class S3Storage:
+    supports_presign = True
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        presign_expires: int = 3600,
+        scratch_dir: Optional[Path] = None,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise StorageError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.presign_expires = presign_expires
+        self.scratch_dir = scratch_dir
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            # MinIO 等自建服务通常只支持 path-style 地址
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+
+    @staticmethod
+    def _content_type(key: str) -> str:
+        return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+    async def save(self, local_path: Path, key: str) -> None:
+        """上传本地文件（大文件自动分段上传），成功后删除本地文件"""
+        await run_in_threadpool(
+            self.client.upload_file, str(local_path), self.bucket, key,
+            ExtraArgs={"ContentType": self._content_type(key)},
+        )
+        remove_quietly(local_path)
+
+    async def move(self, src_key: str, key: str) -> None:
+        """服务端复制为 key 后删除 src_key，文件字节不经过 API 进程"""
+        await run_in_threadpool(
+            self.client.copy_object,
+            Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": src_key},
+            ContentType=self._content_type(key), MetadataDirective="REPLACE",
+        )
+        await self.delete(src_key)
+
+    async def delete(self, key: str) -> None:
+        # DeleteObject 对不存在的 key 同样返回成功
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            head = await run_in_threadpool(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[Path]:
+        work_dir = Path(tempfile.mkdtemp(prefix=".work-", dir=self.scratch_dir))
+        try:
+            path = work_dir / Path(key).name
+            await run_in_threadpool(self.client.download_file, self.bucket, key, str(path))
+            yield path
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def presign_put(self, key: str, size: int, sha256: str) -> Dict:
+        """生成预签名 PUT：客户端必须带上返回的 headers，对象存储据此校验内容的 SHA-256"""
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        content_type = self._content_type(key)
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=self.presign_expires,
+        )
+        return {
+            "url": url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type, "x-amz-checksum-sha256": checksum},
+        }
+
+
+def create_storage():
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(get_upload_dir())
+    if settings.STORAGE_BACKEND == "s3":
+        if not settings.S3_BUCKET:
+            raise StorageError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key=settings.S3_ACCESS_KEY_ID,
+            secret_key=settings.S3_SECRET_ACCESS_KEY,
+            presign_expires=settings.S3_PRESIGN_EXPIRES,
+            scratch_dir=get_upload_dir(),
+        )
+    raise StorageError(f"unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+storage = create_storage()
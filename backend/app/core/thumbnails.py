@@ -0,0 +1,221 @@
+# 缩略图生成（进程池，不阻塞事件循环）
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.storage import sibling_key, storage
+from app.core.uploads import remove_quietly
+from app.models import models
+
+"""缩略图与响应式图片流水线
+
+图片解码与缩放是 CPU 密集操作，放在事件循环里会让大图阻塞整个 worker。
+这里把它们交给一个有界的进程池：
+
+- IMAGE_WORKERS：进程数
+- IMAGE_CONCURRENCY：同时提交到进程池的任务上限，超出的在协程里排队
+- IMAGE_TIMEOUT：单个任务的等待超时（秒），超时记为失败
+
+上传接口只把素材标记为 thumbnail_status='pending' 并立即返回，缩略图
+在响应发出后由后台任务生成并存入存储后端，完成后回写 thumbnail_path /
+thumbnail_status。
+
+同一个后台任务还会按 IMAGE_VARIANT_WIDTHS 生成多尺寸变体（默认 WebP，
+安装了 pillow-avif-plugin 时可在 IMAGE_VARIANT_FORMATS 中加入 avif），
+写入 materials.variants，客户端据此挑选够用的最小尺寸。
+
+其他尺寸由 /api/media/{id}/image 按需生成（make_resized），同样在这个
+进程池中执行，结果缓存在 image_cache。
+"""
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (300, 300)
+
+
+def make_thumbnail(src: str, dst: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> None:
+    """在子进程中执行：生成缩略图（必须是模块级函数以便 pickle）"""
+    with Image.open(src) as img:
+        # JPEG 草稿模式：解码时直接按 1/2、1/4、1/8 缩小，大图省去大部分解码开销
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        save_kwargs = {"optimize": True}
+        # 只有 JPEG 才设置 quality，PNG 传 quality 会抛出异常
+        if img.format and img.format.upper() in {"JPEG", "JPG"}:
+            save_kwargs["quality"] = 85
+        img.save(dst, **save_kwargs)
+
+
+VARIANT_QUALITY = 80
+
+
+def enabled_formats(formats: Sequence[str]) -> List[str]:
+    """过滤掉当前 Pillow 不支持写出的格式（AVIF 依赖可选插件）"""
+    try:
+        import pillow_avif  # noqa: F401  注册 AVIF 编码器
+    except ImportError:
+        pass
+    Image.init()
+    return [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+
+
+def make_variants(src: str, stem: str, widths: Sequence[int], formats: Sequence[str]) -> List[Dict]:
+    """在子进程中执行：按宽度生成多尺寸变体，返回变体描述列表
+
+    不放大图片：超过原图宽度的尺寸会合并为一份原宽度的变体。
+    """
+    out_dir = os.path.dirname(src)
+    formats = enabled_formats(formats)
+    variants: List[Dict] = []
+    with Image.open(src) as img:
+        largest = max(widths)
+        img.draft("RGB", (largest, largest))
+        # 按 EXIF 方向摆正，手机照片否则会横躺
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+
+        current = img
+        for width in sorted({min(w, img.width) for w in widths}, reverse=True):
+            height = max(1, round(img.height * width / img.width))
+            # 从上一个（更大的）尺寸继续缩小，比每次都从原图缩放更快
+            current = current.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                name = f"{stem}_w{width}.{fmt}"
+                path = os.path.join(out_dir, name)
+                current.save(path, format=fmt.upper(), quality=VARIANT_QUALITY)
+                variants.append({
+                    "width": width,
+                    "height": height,
+                    "format": fmt,
+                    "path": name,
+                    "size": os.path.getsize(path),
+                })
+    return variants
+
+
+def make_resized(src: str, dst: str, width: int, height: Optional[int], fmt: str) -> None:
+    """在子进程中执行：按需缩放（等比缩放到 width x height 框内，不放大），写入 dst
+
+    先写临时文件再原子替换，并发读取缓存的请求不会读到写了一半的图片。
+    """
+    box = (width, height or width * 100)
+    with Image.open(src) as img:
+        img.draft("RGB", box)
+        img = ImageOps.exif_transpose(img)
+        # JPEG 不支持透明通道
+        if fmt == "jpeg" or img.mode not in ("RGB", "RGBA"):
+            keep_alpha = fmt != "jpeg" and ("transparency" in img.info or img.mode in ("RGBA", "LA", "PA"))
+            img = img.convert("RGBA" if keep_alpha else "RGB")
+        img.thumbnail(box, Image.LANCZOS)
+        tmp = f"{dst}.tmp-{os.getpid()}"
+        try:
+            img.save(tmp, format=fmt.upper(), quality=VARIANT_QUALITY)
+            os.replace(tmp, dst)
+        except BaseException:
+            remove_quietly(Path(tmp))
+            raise
+
+
+class ImageProcessPool:
+    """有并发上限与超时的进程池封装"""
+
+    def __init__(self, max_workers: int, concurrency: int, timeout: float):
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        """在进程池中执行 fn(*args)；超时抛出 asyncio.TimeoutError
+
+        超时只会放弃等待，子进程里的任务仍会跑完，进程数上限保证不会无限堆积。
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._get_executor(), fn, *args)
+            return await asyncio.wait_for(future, self.timeout)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImageProcessPool(
+    max_workers=settings.IMAGE_WORKERS,
+    concurrency=settings.IMAGE_CONCURRENCY,
+    timeout=settings.IMAGE_TIMEOUT,
+)
+
+
+async def build_image_assets(material_id: int, src: Path, key: str, stem: str) -> Dict:
+    """为本地图片 src（存储 key 为 key）生成缩略图与多尺寸变体并存入存储，返回需要回写的字段
+
+    派生文件与原图放在同一目录下。
+    """
+    thumbnail_name = f"thumb_{src.name}"
+    dst = src.parent / thumbnail_name
+    try:
+        await image_pool.run(make_thumbnail, str(src), str(dst))
+        thumbnail_key = sibling_key(key, thumbnail_name)
+        await storage.save(dst, thumbnail_key)
+        # 仅保存存储 key，便于前端拼接 /uploads/<key>
+        values = {"thumbnail_path": thumbnail_key, "thumbnail_status": "ready"}
+    except Exception as e:
+        # 不阻断主流程，只记录更明确的错误（含素材与路径）
+        logger.warning("生成缩略图失败: %r (material=%s, path=%s)", e, material_id, src)
+        remove_quietly(dst)
+        values = {"thumbnail_path": None, "thumbnail_status": "failed"}
+
+    try:
+        variants = await image_pool.run(
+            make_variants, str(src), stem, settings.IMAGE_VARIANT_WIDTHS, settings.IMAGE_VARIANT_FORMATS
+        )
+        for variant in variants:
+            variant_key = sibling_key(key, variant["path"])
+            await storage.save(src.parent / variant["path"], variant_key)
+            variant["path"] = variant_key
+        values["variants"] = variants
+    except Exception as e:
+        logger.warning("生成图片变体失败: %r (material=%s, path=%s)", e, material_id, src)
+    return values
+
+
+async def save_material_assets(material_id: int, values: Dict) -> None:
+    """回写派生字段（不算内容修改，updated_at 保持不变）"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(models.Material)
+            .where(models.Material.id == material_id)
+            .values(updated_at=models.Material.updated_at, **values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+async def generate_image_assets(material_id: int, key: str, stem: str) -> None:
+    """后台任务：生成缩略图与多尺寸变体，并回写素材"""
+    try:
+        async with storage.local_copy(key) as src:
+            values = await build_image_assets(material_id, src, key, stem)
+    except Exception as e:
+        logger.warning("读取原图失败: %r (material=%s, key=%s)", e, material_id, key)
+        values = {"thumbnail_path": None, "thumbnail_status": "failed"}
+    await save_material_assets(material_id, values)
@@ -0,0 +1,273 @@
+# multipart 上传表单的流式解析
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import aiofiles
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.core.uploads import StreamedFile, UploadTooLarge, new_temp_path, remove_quietly
+
+"""流式解析上传表单
+
+File / Form 参数会先把整个请求体解析进 SpooledTemporaryFile，接口拿到
+UploadFile 后才检查大小并复制到 UPLOAD_DIR：超限的文件要完整收完才被
+拒绝，每个文件还要写两遍。上传接口改为直接读取 request.stream()：
+
+1. 请求头 Content-Length 超过请求体上限时立即拒绝，不读取请求体
+2. 用 python-multipart 的流式解析器逐块解析，文件内容直接写入 UPLOAD_DIR
+   下的临时文件并按需计算 SHA-256；单个文件或累计字节数超过上限时立即
+   中止（没有 Content-Length 的分块请求同样受限）
+3. 解析失败或中止时删除已写入的全部临时文件
+
+解析器的回调是同步的，只记录事件；每喂入一块数据后再依次处理事件，
+文件写入通过 aiofiles 在线程池中执行，不阻塞事件循环。
+"""
+
+FIELDS_MAX_SIZE = 1024 * 1024  # 全部文本字段合计的字节数上限
+MAX_FIELDS = 100
+# 请求体中文件以外的部分（文本字段、分隔符与各部分的头）的余量
+FORM_OVERHEAD = 2 * FIELDS_MAX_SIZE
+
+
+class MalformedForm(Exception):
+    """请求体不是合法的 multipart/form-data"""
+
+
+class TooManyFiles(Exception):
+    """同一字段的文件数超过上限"""
+
+
+@dataclass
+class FileField:
+    """表单中的文件字段
+
+    limit(filename) 返回单个文件的大小上限，返回 None 表示不接收（内容直接
+    丢弃）；也可以直接抛出异常中止整个请求。
+    """
+    limit: Callable[[str], Optional[int]]
+    max_count: int = 1
+    compute_hash: bool = True
+    # 为 False 时单个文件超限只标记 too_large 并丢弃其内容，继续接收其他文件
+    abort_too_large: bool = True
+
+
+@dataclass
+class FormFile:
+    field: str
+    filename: str
+    # 未接收或超限时为空
+    streamed: Optional[StreamedFile] = None
+    too_large: bool = False
+
+
+@dataclass
+class UploadForm:
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: List[FormFile] = field(default_factory=list)
+
+    def files_for(self, name: str) -> List[FormFile]:
+        return [f for f in self.files if f.field == name]
+
+    def discard(self) -> None:
+        """删除全部已落盘的临时文件（校验失败、未交给存储时调用）"""
+        for f in self.files:
+            if f.streamed is not None and f.streamed.temp_path is not None:
+                remove_quietly(f.streamed.temp_path)
+
+
+class _Part:
+    def __init__(self):
+        self.disposition = b""
+        self.name = ""
+        self.data = bytearray()  # 文本字段
+        self.spec: Optional[FileField] = None
+        self.file: Optional[FormFile] = None
+        self.limit = 0
+        self.size = 0
+        self.digest = None
+        self.temp_path: Optional[Path] = None
+        self.out = None
+        self.skip = False
+
+
+class _FormReceiver:
+    def __init__(self, upload_dir: Path, file_fields: Dict[str, FileField]):
+        self.upload_dir = upload_dir
+        self.file_fields = file_fields
+        self.form = UploadForm()
+        self.ended = False
+        self._fields_size = 0
+        self._part = _Part()
+        self._header_name = b""
+        self._header_value = b""
+        self._events: list = []
+        self._temp_paths: List[Path] = []
+        self._open: Optional[_Part] = None  # 正在写入的文件（同一时刻最多一个）
+
+    # ---- python-multipart 回调：只记录事件 ----
+
+    def on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            self._part.disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        self._events.append(("begin", self._part))
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append(("data", self._part, data[start:end]))
+
+    def on_part_end(self) -> None:
+        self._events.append(("end", self._part))
+
+    def on_end(self) -> None:
+        self.ended = True
+
+    # ---- 事件处理 ----
+
+    async def _begin(self, part: _Part) -> None:
+        _, options = parse_options_header(part.disposition)
+        if b"name" not in options:
+            raise MalformedForm("missing field name")
+        part.name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" not in options:
+            if len(self.form.fields) >= MAX_FIELDS:
+                raise MalformedForm("too many fields")
+            return
+        filename = options[b"filename"].decode("utf-8", "replace")
+        part.spec = self.file_fields.get(part.name)
+        # 未声明的文件字段与未选择文件的空输入框直接丢弃
+        if part.spec is None or not filename:
+            part.skip = True
+            return
+        if len(self.form.files_for(part.name)) >= part.spec.max_count:
+            raise TooManyFiles(part.name)
+        part.file = FormFile(field=part.name, filename=filename)
+        self.form.files.append(part.file)
+        limit = part.spec.limit(filename)
+        if limit is None:
+            part.skip = True
+            return
+        part.limit = limit
+        part.digest = hashlib.sha256() if part.spec.compute_hash else None
+        part.temp_path = new_temp_path(self.upload_dir)
+        self._temp_paths.append(part.temp_path)
+        part.out = await aiofiles.open(part.temp_path, "wb")
+        self._open = part
+
+    async def _data(self, part: _Part, data: bytes) -> None:
+        if part.skip:
+            return
+        if part.spec is None:
+            self._fields_size += len(data)
+            if self._fields_size > FIELDS_MAX_SIZE:
+                raise MalformedForm("form fields too large")
+            part.data += data
+            return
+        part.size += len(data)
+        if part.size > part.limit:
+            if part.spec.abort_too_large:
+                raise UploadTooLarge(f"{part.file.filename} exceeds {part.limit} bytes")
+            # 只放弃这个文件，其余内容照常接收
+            part.file.too_large = True
+            part.skip = True
+            await self._close(part)
+            remove_quietly(part.temp_path)
+            return
+        if part.digest is not None:
+            part.digest.update(data)
+        await part.out.write(data)
+
+    async def _end(self, part: _Part) -> None:
+        if part.spec is None:
+            if not part.skip:
+                self.form.fields[part.name] = part.data.decode("utf-8", "replace")
+            return
+        if part.skip:
+            return
+        await self._close(part)
+        part.file.streamed = StreamedFile(
+            temp_path=part.temp_path,
+            size=part.size,
+            sha256=part.digest.hexdigest() if part.digest is not None else None,
+        )
+
+    async def _close(self, part: _Part) -> None:
+        if part.out is not None:
+            await part.out.close()
+            part.out = None
+        self._open = None
+
+    async def process(self) -> None:
+        events, self._events = self._events, []
+        for event in events:
+            if event[0] == "begin":
+                await self._begin(event[1])
+            elif event[0] == "data":
+                await self._data(event[1], event[2])
+            else:
+                await self._end(event[1])
+
+    async def abort(self) -> None:
+        if self._open is not None:
+            await self._close(self._open)
+        for path in self._temp_paths:
+            remove_quietly(path)
+
+
+async def receive_form(
+    request: Request, upload_dir: Path, file_fields: Dict[str, FileField], max_body: int
+) -> UploadForm:
+    """流式解析 multipart 请求体，文件直接写入 upload_dir 下的临时文件
+
+    请求体超过 max_body 或文件超过其上限时抛出 UploadTooLarge；格式错误时抛出
+    MalformedForm；文件数超过 max_count 时抛出 TooManyFiles。异常时已写入的
+    临时文件全部删除，成功时由调用方接管（不再需要时调用 UploadForm.discard）。
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_body:
+        raise UploadTooLarge(f"request body exceeds {max_body} bytes")
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise MalformedForm("expected multipart/form-data")
+
+    receiver = _FormReceiver(upload_dir, file_fields)
+    parser = MultipartParser(params[b"boundary"], {
+        name: getattr(receiver, name)
+        for name in (
+            "on_part_begin", "on_part_data", "on_part_end", "on_header_field",
+            "on_header_value", "on_header_end", "on_headers_finished", "on_end",
+        )
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise UploadTooLarge(f"request body exceeds {max_body} bytes")
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise MalformedForm(str(e))
+            await receiver.process()
+        parser.finalize()
+        if not receiver.ended:
+            raise MalformedForm("incomplete multipart body")
+    except BaseException:
+        await receiver.abort()
+        raise
+    return receiver.form
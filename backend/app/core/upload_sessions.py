@@ -0,0 +1,189 @@
+# 分片续传会话的过期清理
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：只有进程内互斥（开发服务器单进程）
+    fcntl = None
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.blobs import blob_in_use
+from app.core.database import AsyncSessionLocal
+from app.core.storage import storage
+from app.core.uploads import get_upload_dir, new_temp_path, remove_quietly, temp_path_for
+from app.models import models
+
+"""分片续传
+
+客户端先创建会话（声明文件名、总大小与素材字段），再按编号逐片 PUT，
+第 n 片写在偏移 n * chunk_size 处；断线后查询会话拿到已接收的偏移即可
+从下一片继续。分片直接写入 UPLOAD_DIR/.upload-<会话 id>.part，全部到齐
+后 complete 接口计算哈希并走与普通上传相同的建素材流程。
+
+存储后端支持预签名时，客户端也可以创建直传会话：声明 SHA-256 后拿到
+预签名 PUT 直接把文件传到对象存储中该会话独有的暂存 key
+（.direct/<会话 id><ext>，对象存储按声明的 SHA-256 校验内容），complete
+核对暂存对象的大小后在存储内改名为 ab/cd/<sha256><ext> 并登记元数据，
+文件字节不经过 API 进程。已有同样内容的素材不能证明客户端持有文件，
+只有该用户自己上传过的内容才可以跳过上传。
+
+分片请求不持有会话行锁：先读会话做校验并归还连接，再对临时文件加排他
+flock（跨 worker 进程）后写入，最后用 received 作条件的 UPDATE 登记进度，
+条件不成立（会话已完成 / 取消 / 过期）时返回 409。接收请求体期间不占用
+数据库连接。
+
+会话在 UPLOAD_SESSION_TTL 秒内没有新分片即视为过期，由后台任务每隔
+UPLOAD_SESSION_GC_INTERVAL 秒批量删除过期会话及其临时文件 / 未完成的
+直传对象。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBusy(Exception):
+    """同一会话的另一个分片 / complete 请求正在使用临时文件"""
+
+
+# 本进程内正在使用的会话（flock 不可用时也能互斥）
+_busy_sessions: Set[str] = set()
+
+
+DIRECT_PREFIX = ".direct/"
+
+
+def session_temp_path(session_id: str) -> Path:
+    return temp_path_for(get_upload_dir(), session_id)
+
+
+def direct_upload_key(session_id: str, ext: str) -> str:
+    """直传会话的暂存 key（每个会话独有）"""
+    return f"{DIRECT_PREFIX}{session_id}{ext}"
+
+
+@asynccontextmanager
+async def session_file_lock(session_id: str) -> AsyncIterator[None]:
+    """独占会话的临时文件，已被占用时立即抛出 SessionBusy（不排队等待）
+
+    临时文件不存在（会话已被取消 / 清理）时抛出 FileNotFoundError。
+    """
+    if session_id in _busy_sessions:
+        raise SessionBusy(session_id)
+    _busy_sessions.add(session_id)
+    fd = None
+    try:
+        fd = os.open(session_temp_path(session_id), os.O_RDWR)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SessionBusy(session_id)
+        yield
+    finally:
+        # 关闭文件描述符即释放 flock
+        if fd is not None:
+            os.close(fd)
+        _busy_sessions.discard(session_id)
+
+
+async def detach_session_file(session_id: str) -> Path:
+    """持有文件锁时把会话临时文件改名到一个只有调用方知道的路径并返回
+
+    complete 之后对这个路径计算哈希并交给存储（本地存储为原子重命名成内容寻址
+    文件）。改名后重传的分片打不开原路径（FileNotFoundError），不会改写即将
+    成为共享文件的 inode；分片正在写入时抛出 SessionBusy。
+    """
+    staged = new_temp_path(get_upload_dir())
+    async with session_file_lock(session_id):
+        os.replace(session_temp_path(session_id), staged)
+    return staged
+
+
+def restore_session_file(session_id: str, staged: Path) -> None:
+    """complete 未能建成素材时把文件放回会话路径，会话可以继续上传或重试"""
+    try:
+        os.replace(staged, session_temp_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+async def discard_session_files(
+    db: AsyncSession, session_id: str, storage_key: Optional[str], content_hash: Optional[str]
+) -> None:
+    """清理会话留下的文件：分片临时文件与直传的暂存对象
+
+    升级前创建的直传会话直接使用内容寻址 key，同一内容的并发会话共享一个
+    对象；这类 key 只有在没有素材引用该内容、也没有其他会话在用时才删除。
+    """
+    remove_quietly(session_temp_path(session_id))
+    if not storage_key:
+        return
+    if storage_key.startswith(DIRECT_PREFIX):
+        await storage.delete(storage_key)
+        return
+    if content_hash and await blob_in_use(db, content_hash):
+        return
+    shared = await db.scalar(
+        select(models.UploadSession.id)
+        .where(models.UploadSession.storage_key == storage_key, models.UploadSession.id != session_id)
+        .limit(1)
+    )
+    if shared is None:
+        await storage.delete(storage_key)
+
+
+class UploadSessionCollector:
+    def __init__(self, session_factory=AsyncSessionLocal, interval: float = settings.UPLOAD_SESSION_GC_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def collect(self, now: Optional[datetime] = None) -> int:
+        """删除过期会话并清理临时文件 / 未完成的直传对象，返回清理的会话数"""
+        table = models.UploadSession.__table__
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(table)
+                .where(table.c.expires_at < (now or datetime.utcnow()))
+                .returning(table.c.id, table.c.storage_key, table.c.content_hash)
+            )
+            expired = result.all()
+            await db.commit()
+            # 先提交删除再清理文件：并发的分片请求即使写完，条件更新也找不到会话
+            for session_id, storage_key, content_hash in expired:
+                await discard_session_files(db, session_id, storage_key, content_hash)
+        return len(expired)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                removed = await self.collect()
+                if removed:
+                    logger.info("removed %d expired upload sessions", removed)
+            except Exception as e:
+                logger.warning("collect expired upload sessions failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+upload_session_collector = UploadSessionCollector()
@@ -0,0 +1,137 @@
+# 上传文件落盘工具
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import AsyncIterator, BinaryIO, List, Optional
+
+import aiofiles
+
+from app.core.config import settings
+
+"""流式保存上传文件
+
+按块读取上传内容（multipart 请求体的解析见 upload_form），边读边写入
+UPLOAD_DIR 下的临时文件，同时累计字节数（可选计算 SHA-256）。一旦超过
+大小上限立即中止并删除临时文件；成功后用 os.replace 原子地重命名为最终
+文件名，因此目录中不会出现写了一半的正式文件。单个上传的峰值内存只与
+块大小有关。
+"""
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+TEMP_PREFIX = ".upload-"
+TEMP_SUFFIX = ".part"
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过大小上限"""
+
+
+@dataclass
+class StreamedFile:
+    # 预签名直传时文件已在存储中，temp_path 为 None
+    temp_path: Optional[Path]
+    size: int
+    sha256: Optional[str] = None
+    # 直传会话的暂存 key：登记为新内容时在存储内改名为正式 key，否则删除
+    staged_key: Optional[str] = None
+
+
+def get_upload_dir() -> Path:
+    """上传目录的绝对路径：本地存储的根目录（main.py 挂载为 /uploads），也用于存放上传临时文件"""
+    base_dir = Path(__file__).resolve().parents[2]  # 到 backend 目录
+    upload_dir = base_dir / settings.UPLOAD_DIR
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    return upload_dir
+
+
+def temp_path_for(upload_dir: Path, token: str) -> Path:
+    # 与正式文件放在同一目录（同一文件系统），os.replace 才是原子的
+    return upload_dir / f"{TEMP_PREFIX}{token}{TEMP_SUFFIX}"
+
+
+def new_temp_path(upload_dir: Path) -> Path:
+    return temp_path_for(upload_dir, uuid.uuid4().hex)
+
+
+def public_file_key(path: Optional[str]) -> Optional[str]:
+    """返回给客户端的文件 key：旧数据可能存了绝对路径 / uploads/ 前缀，只取文件名；分片 key（ab/cd/name）保持原样"""
+    if path and ("\\" in path or ":" in path or path.startswith(("/", "uploads/"))):
+        return os.path.basename(path.replace("\\", "/"))
+    return path
+
+
+def material_file_names(material) -> List[str]:
+    """素材的全部文件（存储 key）：原文件、缩略图、视频封面、图片变体与 HLS 文件
+
+    旧数据的绝对路径 / uploads/ 前缀按列表接口的规则（public_file_key）取文件名，
+    含 .. 的 key 直接跳过，删除时不会落到存储根目录之外。
+    """
+    names = [material.file_path, material.thumbnail_path, material.poster_path]
+    names += [v.get("path") for v in (material.variants or [])]
+    names += material.hls_files or []
+    keys = [public_file_key(name) for name in names if name]
+    return [key for key in keys if ".." not in PurePosixPath(key).parts]
+
+
+def remove_quietly(path: Path) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def copy_to_temp(src: BinaryIO, upload_dir: Path, max_size: int, chunk_size: int = CHUNK_SIZE) -> StreamedFile:
+    """同步复制到临时文件并计算 SHA-256（在线程池中执行），超过 max_size 时抛出 UploadTooLarge"""
+    temp_path = new_temp_path(upload_dir)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as out:
+            for chunk in iter(lambda: src.read(chunk_size), b""):
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge(f"file exceeds {max_size} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        remove_quietly(temp_path)
+        raise
+    return StreamedFile(temp_path=temp_path, size=size, sha256=digest.hexdigest())
+
+
+def commit_temp(temp_path: Path, final_path: Path) -> None:
+    """原子地把临时文件重命名为正式文件"""
+    os.replace(temp_path, final_path)
+
+
+async def write_chunk_at(path: Path, offset: int, chunks: AsyncIterator[bytes], max_bytes: int) -> int:
+    """从 offset 处写入一个分片并截掉其后的内容，返回写入的字节数
+
+    分片按到达的数据块直接追加到文件，不在内存中拼接；超过 max_bytes 时
+    抛出 UploadTooLarge（文件恢复到 offset 处的长度）。
+    """
+    written = 0
+    async with aiofiles.open(path, "r+b") as out:
+        await out.seek(offset)
+        await out.truncate()
+        try:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"chunk exceeds {max_bytes} bytes")
+                await out.write(chunk)
+        except BaseException:
+            await out.truncate(offset)
+            raise
+    return written
+
+
+def hash_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """分块计算文件的 SHA-256（同步，调用方应放到线程池）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
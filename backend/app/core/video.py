@@ -0,0 +1,263 @@
+# 视频封面、元数据提取与 HLS 转码（ffmpeg / ffprobe）
+import asyncio
+import json
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.storage import sibling_key, storage
+from app.core.thumbnails import build_image_assets, save_material_assets
+from app.core.uploads import remove_quietly
+from app.models import models
+
+"""视频处理
+
+上传视频后由后台任务调用本地 ffprobe / ffmpeg（FFPROBE_PATH / FFMPEG_PATH）：
+
+1. ffprobe 读取时长、分辨率与编码，写入 materials.duration / width /
+   height / video_codec
+2. ffmpeg 截取一帧作为封面 poster_<stem>.jpg（poster_path）
+3. 封面交给图片流水线生成缩略图与多尺寸变体，列表页无需下载视频即可预览
+4. 封面回写后再转码 HLS：一次解码同时输出 HLS_RENDITIONS 中不超过原视频
+   高度的几档 H.264/AAC 码流（hls_<stem>/<高度>p/index.m3u8 与分片），
+   加上主播放列表 hls_<stem>/master.m3u8（hls_path），播放器按网速切换
+   码率、无需下载整个文件即可拖动；原文件保留，不支持 HLS 的客户端照常播放
+
+外部进程通过 asyncio 子进程运行，不阻塞事件循环；VIDEO_CONCURRENCY
+限制同时运行的提取任务数，VIDEO_TIMEOUT 限制单个命令的运行时间；转码
+更耗 CPU，另由 HLS_CONCURRENCY / HLS_TIMEOUT 限制。
+"""
+
+logger = logging.getLogger(__name__)
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_hls_semaphore: Optional[asyncio.Semaphore] = None
+
+HLS_AUDIO_BITRATE = 128  # kbps
+
+
+class VideoToolError(RuntimeError):
+    """ffmpeg / ffprobe 执行失败"""
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.VIDEO_CONCURRENCY)
+    return _semaphore
+
+
+def _get_hls_semaphore() -> asyncio.Semaphore:
+    global _hls_semaphore
+    if _hls_semaphore is None:
+        _hls_semaphore = asyncio.Semaphore(settings.HLS_CONCURRENCY)
+    return _hls_semaphore
+
+
+async def run_tool(args: List[str], timeout: float) -> bytes:
+    """运行外部命令并返回 stdout；超时会杀掉子进程"""
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise VideoToolError(f"{Path(args[0]).name} timed out after {timeout}s")
+    if proc.returncode != 0:
+        raise VideoToolError(f"{Path(args[0]).name} exited {proc.returncode}: {stderr.decode(errors='replace')[-500:]}")
+    return stdout
+
+
+def parse_probe(output: bytes) -> Dict:
+    """从 ffprobe 的 JSON 输出中取出时长、分辨率与视频编码"""
+    data = json.loads(output or b"{}")
+    stream = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), {})
+    duration = stream.get("duration") or data.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration else None,
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "video_codec": stream.get("codec_name"),
+    }
+
+
+async def probe_video(src: Path) -> Dict:
+    output = await run_tool(
+        [
+            settings.FFPROBE_PATH, "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=codec_type,codec_name,width,height,duration:format=duration",
+            "-of", "json",
+            str(src),
+        ],
+        settings.VIDEO_TIMEOUT,
+    )
+    return parse_probe(output)
+
+
+async def extract_poster(src: Path, dst: Path, duration: Optional[float]) -> None:
+    # 取 10% 处（最多第 3 秒）的画面，避开片头黑屏
+    at = min(duration * 0.1, 3.0) if duration else 0
+    await run_tool(
+        [
+            settings.FFMPEG_PATH, "-v", "error", "-y",
+            "-ss", f"{at:.3f}",
+            "-i", str(src),
+            "-frames:v", "1",
+            "-q:v", "3",
+            str(dst),
+        ],
+        settings.VIDEO_TIMEOUT,
+    )
+
+
+def hls_renditions(width: int, height: int) -> List[Dict]:
+    """按原视频分辨率挑选输出档位（不放大）；原视频比最低档还小时只输出一档原尺寸"""
+    ladder = sorted(settings.HLS_RENDITIONS)
+    picked = [(h, rate) for h, rate in ladder if h <= height] or [(height - height % 2, ladder[0][1])]
+    return [
+        {
+            "name": f"{h}p",
+            "width": round(width * h / height / 2) * 2,
+            "height": h,
+            "bitrate": rate,
+        }
+        for h, rate in picked
+    ]
+
+
+def build_hls_command(src: Path, out_dir: Path, renditions: List[Dict]) -> List[str]:
+    """一次解码、多路编码：每个档位一组 -map ... -f hls 输出"""
+    seconds = settings.HLS_SEGMENT_SECONDS
+    args = [settings.FFMPEG_PATH, "-v", "error", "-y", "-i", str(src)]
+    for r in renditions:
+        rate = r["bitrate"]
+        args += [
+            # 没有音轨的视频（0:a:0? 可选）只输出视频
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", f"scale=-2:{r['height']}",
+            "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main", "-pix_fmt", "yuv420p",
+            "-b:v", f"{rate}k", "-maxrate", f"{int(rate * 1.07)}k", "-bufsize", f"{int(rate * 1.5)}k",
+            # 关键帧对齐分片边界，各档位可以在任意分片处切换
+            "-force_key_frames", f"expr:gte(t,n_forced*{seconds})",
+            "-c:a", "aac", "-b:a", f"{HLS_AUDIO_BITRATE}k", "-ac", "2",
+            "-f", "hls",
+            "-hls_time", str(seconds),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_filename", str(out_dir / r["name"] / "seg_%05d.ts"),
+            str(out_dir / r["name"] / "index.m3u8"),
+        ]
+    return args
+
+
+def master_playlist(renditions: List[Dict]) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for r in renditions:
+        # BANDWIDTH 取峰值码率（视频 maxrate + 音频）
+        bandwidth = (int(r["bitrate"] * 1.07) + HLS_AUDIO_BITRATE) * 1000
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={r['width']}x{r['height']}")
+        lines.append(f"{r['name']}/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+async def build_hls_assets(material_id: int, src: Path, key: str, stem: str, width: int, height: int) -> Dict:
+    """把本地视频 src（存储 key 为 key）转码为多码率 HLS 并存入存储，返回需要回写的字段"""
+    renditions = hls_renditions(width, height)
+    base = sibling_key(key, f"hls_{stem}")
+    # 输出先写到以 . 开头的临时目录（不会被 /uploads 访问到），全部完成后再逐个存入
+    out_dir = Path(tempfile.mkdtemp(prefix=".hls-", dir=src.parent))
+    saved: List[str] = []
+    try:
+        for r in renditions:
+            (out_dir / r["name"]).mkdir()
+        async with _get_hls_semaphore():
+            await run_tool(build_hls_command(src, out_dir, renditions), settings.HLS_TIMEOUT)
+        (out_dir / "master.m3u8").write_text(master_playlist(renditions))
+        # 主播放列表最后保存：客户端看到它时各档位的分片都已就绪
+        files = sorted(
+            (path for path in out_dir.rglob("*") if path.is_file()),
+            key=lambda path: (path.name == "master.m3u8", str(path)),
+        )
+        for path in files:
+            file_key = f"{base}/{path.relative_to(out_dir).as_posix()}"
+            await storage.save(path, file_key)
+            saved.append(file_key)
+        return {"hls_path": f"{base}/master.m3u8", "hls_status": "ready", "hls_files": saved}
+    except Exception as e:
+        logger.warning("转码 HLS 失败: %r (material=%s, path=%s)", e, material_id, src)
+        for file_key in saved:
+            await storage.delete(file_key)
+        return {"hls_path": None, "hls_status": "failed", "hls_files": None}
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+async def save_hls_assets(material_id: int, values: Dict) -> None:
+    """回写 HLS 字段；转码期间复用了同一文件的素材（hls_status 仍为 pending）一并更新"""
+    table = models.Material
+    content_hash = select(table.content_hash).where(table.id == material_id).scalar_subquery()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(table)
+            .where(or_(
+                table.id == material_id,
+                and_(table.content_hash == content_hash, table.hls_status == "pending"),
+            ))
+            .values(updated_at=table.updated_at, **values)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+async def process_video(material_id: int, key: str, stem: str) -> None:
+    """后台任务：提取视频元数据与封面，再走图片流水线生成缩略图，最后转码 HLS"""
+    poster_name = f"poster_{stem}.jpg"
+    values: Dict = {}
+    hls: Dict = {"hls_status": "failed"} if settings.HLS_ENABLED else {}
+    saved = False
+    try:
+        async with storage.local_copy(key) as src:
+            poster = src.parent / poster_name
+            async with _get_semaphore():
+                try:
+                    values.update(await probe_video(src))
+                except Exception as e:
+                    logger.warning("读取视频元数据失败: %r (material=%s, path=%s)", e, material_id, src)
+                try:
+                    await extract_poster(src, poster, values.get("duration"))
+                    has_poster = True
+                except Exception as e:
+                    logger.warning("截取视频封面失败: %r (material=%s, path=%s)", e, material_id, src)
+                    remove_quietly(poster)
+                    has_poster = False
+
+            if has_poster:
+                # 封面与图片上传共用缩略图 / 变体流水线，派生文件都放在视频所在目录
+                poster_key = sibling_key(key, poster_name)
+                values.update(await build_image_assets(material_id, poster, poster_key, stem))
+                await storage.save(poster, poster_key)
+                values["poster_path"] = poster_key
+
+            # 封面先回写，列表页不必等转码完成
+            values.setdefault("thumbnail_status", "failed")
+            await save_material_assets(material_id, values)
+            saved = True
+
+            if settings.HLS_ENABLED and values.get("width") and values.get("height"):
+                hls = await build_hls_assets(material_id, src, key, stem, values["width"], values["height"])
+    except Exception as e:
+        logger.warning("读取视频失败: %r (material=%s, key=%s)", e, material_id, key)
+
+    if not saved:
+        values.setdefault("thumbnail_status", "failed")
+        await save_material_assets(material_id, values)
+    if hls:
+        await save_hls_assets(material_id, hls)
@@ -0,0 +1,96 @@
+# 浏览次数缓冲计数器
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models import models
+
+"""浏览次数聚合
+
+详情接口不再为每次浏览开启写事务，而是把增量记在进程内的缓冲区里，
+按素材 id 合并后由后台任务定期批量写回：
+
+    UPDATE materials SET views = views + :n WHERE id = :id   (executemany)
+
+增量写法保证多个 worker 并发刷新时不会互相覆盖；按 id 排序写入以避免
+不同 worker 之间的行锁死锁。刷新失败时增量会合并回缓冲区，下次重试；
+应用关闭时会做最后一次刷新。
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self, session_factory=AsyncSessionLocal, interval: float = settings.VIEW_FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._pending: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, material_id: int, n: int = 1) -> None:
+        """记录浏览（纯内存操作，不触发 IO）"""
+        self._pending[material_id] += n
+
+    def pending(self, material_id: int) -> int:
+        """尚未写回数据库的浏览增量"""
+        return self._pending.get(material_id, 0)
+
+    async def flush(self) -> int:
+        """把缓冲的增量批量写回数据库，返回写回的素材数"""
+        if not self._pending:
+            return 0
+        batch: Dict[int, int] = dict(self._pending)
+        self._pending = Counter()
+
+        # Core 层 executemany；浏览不算内容修改，显式保持 updated_at 不变
+        table = models.Material.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("material_id"))
+            .values(views=table.c.views + bindparam("delta"), updated_at=table.c.updated_at)
+        )
+        params = [{"material_id": mid, "delta": n} for mid, n in sorted(batch.items())]
+        try:
+            async with self.session_factory() as db:
+                conn = await db.connection()
+                await conn.execute(stmt, params)
+                await db.commit()
+        except Exception:
+            # 合并回缓冲区，等待下次刷新
+            self._pending.update(batch)
+            raise
+        return len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("flush view counts failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并做最后一次刷新（优雅关闭时调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("final flush of view counts failed, %d materials lost: %s", len(self._pending), e)
+
+
+view_counter = ViewCounter()
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Computed, Index, Float, BigInteger
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from app.core.database import Base
 
@@ -13,6 +14,9 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)  # 是否为管理员
     created_at = Column(DateTime, default=datetime.utcnow)
+    # 冗余计数：上传 / 删除素材时在同一事务中增减（不含软删除的素材）
+    materials_count = Column(Integer, nullable=False, default=0, server_default="0")
+    materials_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     # 关联素材
     materials = relationship("Material", back_populates="uploader")
@@ -28,7 +32,20 @@ class Material(Base):
     file_path = Column(String(500), nullable=False)  # 文件路径
     file_type = Column(String(20), nullable=False)  # 文件类型: image, video, gif
     file_size = Column(Integer)  # 文件大小(字节)
+    content_hash = Column(String(64), index=True)  # 文件内容 SHA-256，对应 media_blobs.sha256
     thumbnail_path = Column(String(500))  # 缩略图路径
+    thumbnail_status = Column(String(20), default="none")  # 缩略图状态: none, pending, ready, failed
+    variants = Column(JSONB, default=list)  # 响应式图片变体: [{width, height, format, path, size}]
+    poster_path = Column(String(500))  # 视频封面
+    duration = Column(Float)  # 视频时长(秒)
+    width = Column(Integer)  # 视频宽度(像素)
+    height = Column(Integer)  # 视频高度(像素)
+    video_codec = Column(String(50))  # 视频编码, 如 h264
+    hls_path = Column(String(500))  # HLS 主播放列表 master.m3u8
+    hls_status = Column(String(20))  # HLS 转码状态: pending, ready, failed（非视频为空）
+    hls_files = Column(JSONB)  # HLS 全部文件（播放列表与分片）的存储 key，删除素材时一并清理
+    # 派生文件任务的心跳：运行中的任务定期刷新，pending 且心跳过期的行由恢复任务重新排队
+    derived_heartbeat_at = Column(DateTime, default=datetime.utcnow)
     tags = Column(Text)  # 标签，用逗号分隔
     views = Column(Integer, default=0)  # 浏览次数
     likes = Column(Integer, default=0)  # 点赞数
@@ -36,6 +53,67 @@ class Material(Base):
     is_approved = Column(Boolean, default=False)  # 是否审核通过
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = Column(DateTime)  # 软删除时间：非空的行不再出现在任何列表中，由后台任务清理文件后物理删除
+    # 全文检索向量（数据库生成列，权重 title > tags > description），默认不加载
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(tags, '')), 'B') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+            persisted=True,
+        ),
+    ))
     
     # 关联用户
     uploader = relationship("User", back_populates="materials")
+
+class MaterialLike(Base):
+    """用户点赞记录，(user_id, material_id) 为主键保证同一用户只能点赞一次"""
+    __tablename__ = "material_likes"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    material_id = Column(Integer, ForeignKey("materials.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # 素材被删除时级联删除，以及按素材统计点赞
+        Index("ix_material_likes_material_id", "material_id"),
+    )
+
+class MediaBlob(Base):
+    """内容寻址存储的文件及其引用计数"""
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    file_path = Column(String(500), nullable=False)  # 存储 key（相对 UPLOAD_DIR 的路径）
+    size = Column(Integer)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class UploadSession(Base):
+    """上传会话：分片续传的字节写在 UPLOAD_DIR/.upload-<id>.part；直传会话的文件在 storage_key"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    file_type = Column(String(20), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, default=0)  # 已连续写入的字节数（下一个分片的偏移）
+    chunk_size = Column(Integer, nullable=False)
+    fields = Column(JSONB, default=dict)  # 完成时写入素材的 title / category 等字段
+    # 预签名直传：客户端直接 PUT 到存储中的 key，声明的 SHA-256 由对象存储校验
+    storage_key = Column(String(500))
+    content_hash = Column(String(64))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class StatCounter(Base):
+    """管理后台统计计数器，随上传 / 审核 / 删除 / 注册等操作在同一事务中增减"""
+    __tablename__ = "stat_counters"
+
+    dimension = Column(String(20), primary_key=True)  # all, category, map, day
+    bucket = Column(String(100), primary_key=True)  # 分类 / 地图名 / YYYY-MM-DD；all 与未填地图为空串
+    metric = Column(String(30), primary_key=True)  # materials, approved_materials, users, active_users
+    value = Column(BigInteger, nullable=False, default=0)
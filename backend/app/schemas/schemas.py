@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 
 # 用户相关 Schema
@@ -39,12 +39,29 @@ class MaterialBase(BaseModel):
 class MaterialCreate(MaterialBase):
     pass
 
+class ImageVariant(BaseModel):
+    width: int
+    height: int
+    format: str  # webp / avif
+    path: str  # 存储 key（相对 /uploads 的路径）
+    size: Optional[int] = None
+
 class Material(MaterialBase):
     id: int
     file_path: str
     file_type: str
     file_size: Optional[int] = None
+    content_hash: Optional[str] = None  # SHA-256，内容相同的素材共享同一文件
     thumbnail_path: Optional[str] = None
+    thumbnail_status: str = "none"
+    variants: List[ImageVariant] = []
+    poster_path: Optional[str] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_codec: Optional[str] = None
+    hls_path: Optional[str] = None  # HLS 主播放列表（相对 /uploads 的路径），原文件仍可直接播放
+    hls_status: Optional[str] = None
     views: int = 0
     likes: int = 0
     uploader_id: int
@@ -57,19 +74,93 @@ class Material(MaterialBase):
 
 class MaterialResponse(BaseModel):
     materials: List[Material]
-    total: int
+    # count=none 时为 None
+    total: Optional[int] = None
+    # total 的类型：exact 精确 / estimate 估算 / none 未统计
+    total_kind: str = "exact"
     page: int
     size: int
+    # 游标分页：下一页的不透明游标，已到末尾时为 None
+    next_cursor: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
 
+class LikeResult(BaseModel):
+    likes: int
+    liked: bool
+
+class LikedStatus(BaseModel):
+    # 请求的 id 中当前用户已点赞的那些
+    liked_ids: List[int]
+
+# 批量上传
+class BulkUploadItem(BaseModel):
+    # 按文件名匹配，覆盖表单中的默认字段
+    filename: str
+    title: Optional[str] = Field(None, max_length=200)
+    description: Optional[str] = None
+    category: Optional[str] = None
+    map_name: Optional[str] = None
+    tags: Optional[str] = None
+
+class BulkUploadResult(BaseModel):
+    index: int
+    filename: str
+    # 成功时为新素材 id，失败时 error 给出原因
+    material_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkUploadResult]
+
+# 分片续传
+class UploadSessionCreate(MaterialBase):
+    filename: str
+    total_size: int = Field(..., gt=0)
+
+class UploadSessionStatus(BaseModel):
+    id: str
+    filename: str
+    total_size: int
+    chunk_size: int
+    # 已连续接收的字节数，即下一个分片的偏移
+    received: int
+    next_chunk: int
+    expires_at: datetime
+
+class DirectUploadCreate(UploadSessionCreate):
+    # 客户端预先计算的 SHA-256（十六进制），对象存储按它校验上传内容
+    sha256: str = Field(..., pattern=r"^[0-9a-f]{64}$")
+
+class PresignedRequest(BaseModel):
+    url: str
+    method: str
+    headers: Dict[str, str]
+
+class DirectUploadTicket(BaseModel):
+    id: str
+    # 为空表示你已上传过相同内容，直接调用 complete 即可
+    upload: Optional[PresignedRequest] = None
+    expires_at: datetime
+
 # 管理员相关 Schema
+class StatsBucket(BaseModel):
+    bucket: str  # 分类 / 地图名 / YYYY-MM-DD（未填地图为空串）
+    materials: int = 0
+    approved_materials: int = 0
+    users: int = 0  # 仅按天统计时有值：当天注册的用户数
+
 class AdminStats(BaseModel):
     total_materials: int
     approved_materials: int
     pending_materials: int
     total_users: int
     active_users: int
+    by_category: List[StatsBucket] = []
+    by_map: List[StatsBucket] = []
+    by_day: List[StatsBucket] = []  # 最近 days 天，按日期升序
 
 class AdminUser(BaseModel):
     id: int
@@ -79,9 +170,34 @@ class AdminUser(BaseModel):
     is_admin: bool
     created_at: datetime
     materials_count: int
+    materials_bytes: int = 0
 
     model_config = ConfigDict(from_attributes=True)
 
+class AdminUserResponse(BaseModel):
+    users: List[AdminUser]
+    size: int
+    # 游标分页：下一页的不透明游标，已到末尾时为 None
+    next_cursor: Optional[str] = None
+
 class MaterialAction(BaseModel):
     action: str  # "approve" or "reject"
     reason: Optional[str] = None
+
+class MaterialFilter(BaseModel):
+    """批量操作的筛选条件，category / map_name / search 与素材列表接口的同名参数含义一致"""
+    category: Optional[str] = None
+    map_name: Optional[str] = None
+    search: Optional[str] = None
+    uploader_id: Optional[int] = None
+    is_approved: Optional[bool] = None
+    created_before: Optional[datetime] = None
+
+class BulkModeration(BaseModel):
+    """批量审核：ids 与 filter 二选一"""
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    filter: Optional[MaterialFilter] = None
+
+class BulkModerationResult(BaseModel):
+    affected: int
+    ids: List[int]
@@ -1,22 +1,45 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from pathlib import Path
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
 from datetime import datetime
 
-from app.core.database import get_db
+from app.core.database import async_engine, get_db
+from app.core.view_counter import view_counter
+from app.core.thumbnails import image_pool
+from app.core.upload_sessions import upload_session_collector
+from app.core.purger import material_purger
+from app.core.derived_assets import derived_asset_recovery
+from app.core.storage import LocalStorage, storage
+from app.core.media import MediaFiles
 import logging
-from app.api import materials, users
+from app.api import materials, media, uploads, users
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 logger.warning("Database schema is managed by Alembic migrations. Run 'alembic upgrade head' before starting the app.")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    view_counter.start()
+    upload_session_collector.start()
+    material_purger.start()
+    derived_asset_recovery.start()
+    yield
+    # 关闭时先写回缓冲的浏览次数，再释放异步连接池
+    await view_counter.stop()
+    await upload_session_collector.stop()
+    await material_purger.stop()
+    await derived_asset_recovery.stop()
+    image_pool.shutdown()
+    await async_engine.dispose()
+
 app = FastAPI(
     title="CS素材库 API",
     description="反恐精英道具教程素材集 API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS 配置
@@ -28,15 +51,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 静态文件服务（使用绝对路径，避免启动目录差异）
-BASE_DIR = Path(__file__).resolve().parent  # backend 目录
-UPLOAD_DIR = BASE_DIR / settings.UPLOAD_DIR
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# 媒体文件服务：仅本地存储需要，对象存储由前端直接访问桶地址（VITE_UPLOAD_URL）
+# 生产环境设置 MEDIA_ACCEL_REDIRECT 后由 nginx 发送文件，见 web/nginx.conf
+if isinstance(storage, LocalStorage):
+    app.mount(
+        "/uploads",
+        MediaFiles(storage.root, settings.MEDIA_CACHE_MAX_AGE, settings.MEDIA_ACCEL_REDIRECT),
+        name="uploads",
+    )
 
 # API 路由
 app.include_router(materials.router, prefix="/api/materials", tags=["materials"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(uploads.router, prefix="/api/uploads", tags=["uploads"])
+app.include_router(media.router, prefix="/api/media", tags=["media"])
 
 # 导入管理员路由
 from app.api import admin
@@ -51,9 +79,9 @@ async def root():
     }
 
 @app.get("/api/health/db")
-async def health_check_db(db: Session = Depends(get_db)):
+async def health_check_db(db: AsyncSession = Depends(get_db)):
     try:
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy"}
     except Exception:
         raise HTTPException(status_code=500, detail="database not available")
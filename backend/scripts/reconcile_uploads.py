@@ -0,0 +1,231 @@
+"""Find (and optionally delete) upload files that no row references, and rows whose files are gone.
+
+Usage (from project root):
+
+  python -m backend.scripts.reconcile_uploads                      # report only
+  python -m backend.scripts.reconcile_uploads --reclaim --min-age 3600
+  python -m backend.scripts.reconcile_uploads --max-files 100000 --state /var/tmp/reconcile.state
+
+The upload directory is walked recursively with os.scandir in sorted key order (one directory
+listing in memory at a time), and merged against every referenced key streamed from a
+server-side cursor in the same order (ORDER BY ... COLLATE "C"): file_path / thumbnail_path /
+poster_path, image variants and HLS files of every material (soft-deleted rows included, the
+purger owns those), media_blobs.file_path and pending direct-upload keys. Neither side is
+loaded into memory.
+
+  - orphan:  a file on disk that no row references
+  - missing: a referenced key with no file on disk
+
+Dot-prefixed entries (.resized cache, .hls-/.work- scratch dirs, .upload-*.part) and
+half-written *.tmp-* files are never touched. With --reclaim, orphans older than --min-age
+seconds are re-checked against the database in batches and then deleted; missing files are
+only reported.
+
+--max-files stops after that many files; with --state the last key is saved and the next run
+continues from there, so a large store can be reconciled a slice at a time. Keys referenced
+past the last scanned file are not reported as missing until the walk reaches them.
+Only STORAGE_BACKEND=local is supported.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+# Ensure project root & backend on sys.path when executed from repo root
+CURRENT_FILE = Path(__file__).resolve()
+BACKEND_DIR = CURRENT_FILE.parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import bindparam, text
+
+from app.core.database import SessionLocal
+from app.core.storage import LocalStorage, storage
+from app.core.uploads import remove_quietly
+
+# 所有引用文件的列；旧数据中的绝对路径 / uploads/ 前缀按列表接口的处理方式取文件名
+REFERENCED_KEYS = r"""
+SELECT CASE WHEN key LIKE '/%' OR key LIKE 'uploads/%' OR key LIKE '%\\%' OR key LIKE '%:%'
+            THEN regexp_replace(key, '^.*[/\\]', '') ELSE key END AS key
+FROM (
+    SELECT file_path AS key FROM materials
+    UNION ALL SELECT thumbnail_path FROM materials
+    UNION ALL SELECT poster_path FROM materials
+    UNION ALL SELECT v ->> 'path' FROM materials
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(variants) = 'array' THEN variants ELSE '[]'::jsonb END) v
+    UNION ALL SELECT h FROM materials
+        CROSS JOIN LATERAL jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(hls_files) = 'array' THEN hls_files ELSE '[]'::jsonb END) h
+    UNION ALL SELECT file_path FROM media_blobs
+    UNION ALL SELECT storage_key FROM upload_sessions
+) raw
+WHERE key IS NOT NULL AND key <> ''
+"""
+
+STREAM_SQL = text(f"""
+SELECT DISTINCT key COLLATE "C" AS key
+FROM ({REFERENCED_KEYS}) refs
+WHERE key COLLATE "C" > :after
+ORDER BY 1
+""")
+
+RECHECK_SQL = text(f"""
+SELECT DISTINCT key FROM ({REFERENCED_KEYS}) refs WHERE key IN :keys
+""").bindparams(bindparam("keys", expanding=True))
+
+
+def _skipped(name: str) -> bool:
+    return name.startswith(".") or ".tmp-" in name
+
+
+def walk(root: Path, after: str = "", prefix: str = "") -> Iterator[Tuple[str, os.DirEntry]]:
+    """按 key 的字符串顺序（与 COLLATE "C" 一致）递归产出 (key, entry)，只产出大于 after 的文件
+
+    目录按 "<name>/" 参与排序，这样深度优先遍历的顺序就是完整 key 的字典序。
+    """
+    with os.scandir(root / prefix if prefix else root) as it:
+        entries = [
+            (prefix + entry.name + ("/" if entry.is_dir(follow_symlinks=False) else ""), entry)
+            for entry in it
+            if not _skipped(entry.name)
+        ]
+    entries.sort(key=lambda item: item[0])
+    for key, entry in entries:
+        if key.endswith("/"):
+            # 整个子目录都在 after 之前时跳过
+            if key < after and not after.startswith(key):
+                continue
+            yield from walk(root, after, key)
+        elif key > after:
+            yield key, entry
+
+
+def still_referenced(keys: List[str]) -> set:
+    """在新的事务里再确认一次，排除扫描开始后才提交的引用"""
+    with SessionLocal() as db:
+        return set(db.scalars(RECHECK_SQL, {"keys": keys}))
+
+
+def reclaim(root: Path, candidates: List[Tuple[str, int]]) -> Tuple[int, int]:
+    """删除仍无引用的孤儿文件，返回 (文件数, 字节数)"""
+    referenced = still_referenced([key for key, _ in candidates])
+    removed = [(key, size) for key, size in candidates if key not in referenced]
+    for key, _ in removed:
+        remove_quietly(root / key)
+    return len(removed), sum(size for _, size in removed)
+
+
+def reconcile(
+    root: Path,
+    after: str = "",
+    max_files: Optional[int] = None,
+    do_reclaim: bool = False,
+    min_age: float = 3600,
+    batch_size: int = 500,
+    verbose: bool = True,
+) -> dict:
+    """对比磁盘与数据库，返回统计；last_key 为 None 表示本轮已走完整个目录"""
+    cutoff = time.time() - min_age
+    result = {
+        "scanned": 0, "orphans": 0, "orphan_bytes": 0, "missing": 0,
+        "reclaimed": 0, "reclaimed_bytes": 0, "last_key": None,
+    }
+    candidates: List[Tuple[str, int]] = []
+
+    def _flush():
+        if candidates:
+            removed, size = reclaim(root, candidates)
+            result["reclaimed"] += removed
+            result["reclaimed_bytes"] += size
+            candidates.clear()
+
+    def _missing(key):
+        result["missing"] += 1
+        if verbose:
+            print(f"missing {key}")
+
+    with SessionLocal() as db:
+        # psycopg2 命名游标：按 yield_per 分批从服务端取行
+        refs = iter(db.scalars(STREAM_SQL, {"after": after}, execution_options={"yield_per": 1000}))
+        ref = next(refs, None)
+        complete = True
+        for key, entry in walk(root, after):
+            while ref is not None and ref < key:
+                _missing(ref)
+                ref = next(refs, None)
+            result["scanned"] += 1
+            result["last_key"] = key
+            if ref == key:
+                ref = next(refs, None)
+            else:
+                st = entry.stat(follow_symlinks=False)
+                result["orphans"] += 1
+                result["orphan_bytes"] += st.st_size
+                if verbose:
+                    print(f"orphan {key} {st.st_size}")
+                if do_reclaim and st.st_mtime < cutoff:
+                    candidates.append((key, st.st_size))
+                    if len(candidates) >= batch_size:
+                        _flush()
+            if max_files and result["scanned"] >= max_files:
+                complete = False
+                break
+        if complete:
+            while ref is not None:
+                _missing(ref)
+                ref = next(refs, None)
+            result["last_key"] = None
+    _flush()
+    return result
+
+
+def _read_state(path: Optional[Path]) -> str:
+    if path and path.exists():
+        return path.read_text(encoding="utf-8").strip()
+    return ""
+
+
+def _write_state(path: Optional[Path], last_key: Optional[str]) -> None:
+    if not path:
+        return
+    if last_key is None:
+        # 走完一整轮，下次从头开始
+        path.unlink(missing_ok=True)
+    else:
+        path.write_text(last_key, encoding="utf-8")
+
+
+def main(max_files: Optional[int], do_reclaim: bool, min_age: float, state: Optional[Path], quiet: bool) -> None:
+    if not isinstance(storage, LocalStorage):
+        print("[reconcile_uploads] only STORAGE_BACKEND=local is supported")
+        sys.exit(1)
+    after = _read_state(state)
+    result = reconcile(storage.root, after, max_files, do_reclaim, min_age, verbose=not quiet)
+    _write_state(state, result["last_key"])
+    print(
+        f"[reconcile_uploads] scanned {result['scanned']} files"
+        f"{f' after {after!r}' if after else ''}: "
+        f"{result['orphans']} orphans ({result['orphan_bytes']} bytes), {result['missing']} missing"
+    )
+    if do_reclaim:
+        print(f"[reconcile_uploads] reclaimed {result['reclaimed']} files ({result['reclaimed_bytes']} bytes)")
+    if result["last_key"] is not None:
+        print(f"[reconcile_uploads] stopped at {result['last_key']!r}, run again to continue")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report or delete upload files without database rows")
+    parser.add_argument("--reclaim", action="store_true", help="delete orphan files (default: only report)")
+    parser.add_argument("--min-age", type=float, default=3600, help="only reclaim files older than this (seconds)")
+    parser.add_argument("--max-files", type=int, default=None, help="stop after scanning this many files")
+    parser.add_argument("--state", type=Path, default=None, help="file that stores where the next run continues")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+    main(args.max_files, args.reclaim, args.min_age, args.state, args.quiet)
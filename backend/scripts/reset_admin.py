@@ -29,7 +29,15 @@ from app.core.database import SessionLocal
 
 def ensure_admin(username: str, email: str, password: str, force: bool=False):
     from app.core.auth import get_password_hash  # local to avoid early import issues
+    from app.core.stats import active_deltas, counter_upsert, user_deltas
     from app.models import models
+
+    def add_user(session, user):
+        # 与注册接口一样，在同一事务中更新管理后台的用户计数
+        session.add(user)
+        session.flush()
+        session.execute(counter_upsert(user_deltas(user.created_at, user.is_active)))
+
     with SessionLocal() as session:
         admin = session.query(models.User).filter(models.User.username == username).first()
         any_admin = session.query(models.User).filter(models.User.is_admin == True).first()
@@ -38,7 +46,7 @@ def ensure_admin(username: str, email: str, password: str, force: bool=False):
             print(f"[reset_admin] No admin found, creating new admin '{username}'")
             hashed = get_password_hash(password)
             user = models.User(username=username, email=email, hashed_password=hashed, is_active=True, is_admin=True)
-            session.add(user)
+            add_user(session, user)
             session.commit()
             print("[reset_admin] Admin created.")
             return
@@ -47,6 +55,8 @@ def ensure_admin(username: str, email: str, password: str, force: bool=False):
                 print(f"[reset_admin] Updating existing admin '{username}' (force mode)")
                 admin.email = email
                 admin.hashed_password = get_password_hash(password)
+                if not admin.is_active:
+                    session.execute(counter_upsert(active_deltas(1)))
                 admin.is_active = True
                 admin.is_admin = True
                 session.commit()
@@ -58,7 +68,7 @@ def ensure_admin(username: str, email: str, password: str, force: bool=False):
                 print(f"[reset_admin] Creating admin '{username}' (no user with that username)")
                 hashed = get_password_hash(password)
                 user = models.User(username=username, email=email, hashed_password=hashed, is_active=True, is_admin=True)
-                session.add(user)
+                add_user(session, user)
                 session.commit()
                 print("[reset_admin] Admin created.")
             else:
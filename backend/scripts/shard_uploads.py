@@ -0,0 +1,247 @@
+"""Move flat upload files into the sharded layout (ab/cd/<name>) while the app keeps running.
+
+Usage (from project root):
+
+  python -m backend.scripts.shard_uploads --batch-size 500 --workers 8
+  python -m backend.scripts.shard_uploads --dry-run
+
+Each batch of materials whose file_path has no directory yet is migrated in three steps:
+
+  1. hard-link every file (original, thumbnail, poster, variants) to its new sharded key,
+     in parallel; the old path keeps working
+  2. in one transaction, lock the rows, rewrite file_path / thumbnail_path / poster_path /
+     variants (and media_blobs.file_path) to the new keys; after locking the blobs, rows that a
+     concurrent dedup upload pointed at an old key are rewritten too (or keep the old file)
+  3. after commit, unlink the old paths (skip with --keep-old)
+
+Rows sharing one file (content dedup) are migrated together, rows whose thumbnails or HLS
+renditions are still being generated are skipped (tasks lost to a restart are requeued by the
+app, see app/core/derived_assets.py). The script is idempotent; run it again to pick up skipped
+rows.
+Only STORAGE_BACKEND=local is supported: object stores have no directory lookups to speed up.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Ensure project root & backend on sys.path when executed from repo root
+CURRENT_FILE = Path(__file__).resolve()
+BACKEND_DIR = CURRENT_FILE.parents[1]
+PROJECT_ROOT = BACKEND_DIR.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import bindparam, select, update
+
+from app.core.database import SessionLocal
+from app.core.storage import LocalStorage, shard_key, sibling_key, storage
+from app.core.uploads import remove_quietly
+from app.models import models
+
+PATH_COLUMNS = ("file_path", "thumbnail_path", "poster_path")
+
+
+def _is_flat(key: Optional[str]) -> bool:
+    return bool(key) and "/" not in key
+
+
+def _is_pending(material: models.Material) -> bool:
+    """派生文件仍在生成（后台任务会按旧 key 写回）"""
+    return material.thumbnail_status == "pending" or material.hls_status == "pending"
+
+
+def plan_row(row: Dict) -> Dict:
+    """计算一行素材迁移后的字段值（只改写仍是扁平 key 的文件，派生文件与原文件同目录）"""
+    target = row["file_path"] if not _is_flat(row["file_path"]) else shard_key(row["file_path"])
+
+    def _move(key):
+        return sibling_key(target, key) if _is_flat(key) else key
+
+    planned = {column: _move(row[column]) for column in PATH_COLUMNS}
+    planned["variants"] = [dict(v, path=_move(v.get("path"))) for v in (row["variants"] or [])]
+    return planned
+
+
+def moves_for(row: Dict, planned: Dict) -> Dict[str, str]:
+    """旧 key -> 新 key"""
+    moves = {row[c]: planned[c] for c in PATH_COLUMNS if row[c] and row[c] != planned[c]}
+    for old, new in zip(row["variants"] or [], planned["variants"]):
+        if old.get("path") and old["path"] != new["path"]:
+            moves[old["path"]] = new["path"]
+    return moves
+
+
+def link_file(root: Path, old: str, new: str) -> bool:
+    """把 old 硬链接到 new（同一文件系统内零拷贝）；old 不存在时返回 False"""
+    dst = root / new
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(root / old, dst)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        return dst.exists()
+    return True
+
+
+def _row_dict(material: models.Material) -> Dict:
+    return {
+        "id": material.id,
+        "content_hash": material.content_hash,
+        "variants": material.variants,
+        **{column: getattr(material, column) for column in PATH_COLUMNS},
+    }
+
+
+def migrate_batch(root: Path, rows: List[Dict], pool: ThreadPoolExecutor, keep_old: bool) -> tuple[int, int]:
+    """迁移一批素材，返回 (更新的行数, 链接的文件数)"""
+    planned = {row["id"]: plan_row(row) for row in rows}
+    moves: Dict[str, str] = {}
+    for row in rows:
+        moves.update(moves_for(row, planned[row["id"]]))
+
+    # 1. 建立新路径的硬链接，旧路径继续可用
+    pairs = list(moves.items())
+    linked = dict(zip(pairs, pool.map(lambda pair: link_file(root, *pair), pairs)))
+    missing = {old for (old, _), ok in linked.items() if not ok}
+    for row in rows:
+        # 原文件缺失时保留这一行的旧 key，不把它指向不存在的新路径
+        if row["file_path"] in missing:
+            planned.pop(row["id"])
+
+    # 2. 在一个事务内锁定并改写路径
+    extra_rows: List[Dict] = []
+    with SessionLocal() as db:
+        locked = db.scalars(
+            select(models.Material)
+            .where(models.Material.id.in_(list(planned)))
+            .with_for_update()
+        ).all()
+        # 加锁期间被修改（或删除）的行跳过，下次运行再处理
+        rows_by_id = {row["id"]: row for row in rows}
+        unchanged = [m for m in locked if _row_dict(m) == rows_by_id[m.id]]
+        done = {m.id for m in unchanged}
+        hashes = sorted({m.content_hash for m in unchanged if m.content_hash})
+        if hashes:
+            # 锁住 blob 行：并发的重复上传会等本事务提交后拿到新 key
+            db.execute(
+                select(models.MediaBlob.sha256).where(models.MediaBlob.sha256.in_(hashes)).with_for_update()
+            ).all()
+        # 取批之后、锁住 blob 之前提交的重复上传拿到的也是旧 key：新路径都已链接好的一并改写，
+        # 其余（派生文件仍在生成等）保留旧 key，第 3 步不删除它们仍在用的旧路径
+        old_files = {rows_by_id[i]["file_path"] for i in done}
+        extras = db.scalars(
+            select(models.Material)
+            .where(models.Material.file_path.in_(old_files), models.Material.id.not_in(list(rows_by_id)))
+            .with_for_update()
+        ).all() if old_files else []
+        for m in extras:
+            row = _row_dict(m)
+            extra_rows.append(row)
+            plan = plan_row(row)
+            if not _is_pending(m) and all(linked.get(pair) for pair in moves_for(row, plan).items()):
+                planned[m.id] = plan
+                unchanged.append(m)
+                done.add(m.id)
+        table = models.Material.__table__
+        if unchanged:
+            db.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam("material_id"))
+                .values(
+                    updated_at=table.c.updated_at,
+                    **{column: bindparam(f"new_{column}") for column in (*PATH_COLUMNS, "variants")},
+                ),
+                [
+                    {"material_id": m.id, **{f"new_{k}": v for k, v in planned[m.id].items()}}
+                    for m in unchanged
+                ],
+            )
+        for m in unchanged:
+            if m.content_hash and m.file_path != planned[m.id]["file_path"]:
+                db.execute(
+                    update(models.MediaBlob)
+                    .where(models.MediaBlob.sha256 == m.content_hash, models.MediaBlob.file_path == m.file_path)
+                    .values(file_path=planned[m.id]["file_path"])
+                )
+        db.commit()
+
+    # 3. 提交后再删除旧路径；未更新的行撤销为它们新建的链接
+    done_moves: Dict[str, str] = {}
+    still_old = set()
+    for row in [*rows, *extra_rows]:
+        if row["id"] in done:
+            done_moves.update(moves_for(row, planned[row["id"]]))
+        else:
+            still_old.update(moves_for(row, plan_row(row)))
+    if not keep_old:
+        list(pool.map(lambda old: remove_quietly(root / old), [o for o in done_moves if o not in still_old]))
+    new_in_use = set(done_moves.values())
+    for old in still_old:
+        new = moves.get(old)
+        if new is not None and new not in new_in_use:
+            remove_quietly(root / new)
+    return len(done), sum(1 for ok in linked.values() if ok)
+
+
+def fetch_batch(last_id: int, batch_size: int) -> List[Dict]:
+    """按 id 取下一批仍是扁平 key 的素材，并带上共享同一文件的其他行"""
+    with SessionLocal() as db:
+        head = db.scalars(
+            select(models.Material)
+            .where(models.Material.id > last_id, ~models.Material.file_path.contains("/"))
+            .order_by(models.Material.id)
+            .limit(batch_size)
+        ).all()
+        if not head:
+            return []
+        group = db.scalars(
+            select(models.Material).where(models.Material.file_path.in_({m.file_path for m in head}))
+        ).all()
+        return [_row_dict(m) | {"_pending": _is_pending(m)} for m in {m.id: m for m in [*head, *group]}.values()]
+
+
+def main(batch_size: int, workers: int, dry_run: bool, keep_old: bool) -> None:
+    if not isinstance(storage, LocalStorage):
+        print("[shard_uploads] only STORAGE_BACKEND=local is supported")
+        sys.exit(1)
+    root = storage.root
+    last_id = 0
+    total_rows = total_files = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = fetch_batch(last_id, batch_size)
+            if not rows:
+                break
+            last_id = max(r["id"] for r in rows if _is_flat(r["file_path"]))
+            # 缩略图仍在生成的文件组整组跳过（后台任务会按旧 key 写回）
+            pending_files = {r["file_path"] for r in rows if r.pop("_pending")}
+            rows = [r for r in rows if r["file_path"] not in pending_files and _is_flat(r["file_path"])]
+            if dry_run:
+                files = {old for r in rows for old in moves_for(r, plan_row(r))}
+                total_rows += len(rows)
+                total_files += len(files)
+                continue
+            if rows:
+                updated, linked = migrate_batch(root, rows, pool, keep_old)
+                total_rows += updated
+                total_files += linked
+                print(f"[shard_uploads] up to id {last_id}: {updated} rows, {linked} files")
+    action = "would migrate" if dry_run else "migrated"
+    print(f"[shard_uploads] {action} {total_rows} rows, {total_files} files")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move flat upload files into ab/cd/<name> shards")
+    parser.add_argument("--batch-size", type=int, default=500, help="materials per transaction")
+    parser.add_argument("--workers", type=int, default=8, help="parallel file operations")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be moved")
+    parser.add_argument("--keep-old", action="store_true", help="keep the old flat paths after migration")
+    args = parser.parse_args()
+    main(args.batch_size, args.workers, args.dry_run, args.keep_old)
@@ -0,0 +1,67 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import SessionLocal, async_engine, engine
+
+
+def _database_available() -> bool:
+    try:
+        with engine.connect():
+            return True
+    except Exception:
+        return False
+
+
+@pytest.fixture(scope="session")
+def database():
+    """需要真实 PostgreSQL（CI 中已执行 alembic upgrade head）；不可用时跳过"""
+    if not _database_available():
+        pytest.skip("PostgreSQL is not available")
+    return engine
+
+
+@pytest.fixture
+def db_session(database):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(database):
+    """统计 with 块内 API（异步引擎）发出的 SQL 语句数（不含事务控制语句）"""
+    target = async_engine.sync_engine
+
+    @contextmanager
+    def _count():
+        counter = QueryCounter()
+
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            counter.statements.append(statement)
+
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        try:
+            yield counter
+        finally:
+            event.remove(target, "before_cursor_execute", _before_cursor_execute)
+
+    return _count
+
+
+@pytest.fixture
+def unique_name():
+    return lambda prefix: f"{prefix}_{uuid.uuid4().hex[:10]}"
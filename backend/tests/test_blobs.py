@@ -0,0 +1,36 @@
+import asyncio
+import hashlib
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.blobs import acquire_blob, blob_file_name, release_blob
+from app.core.database import async_url_obj
+from app.models import models
+
+
+def test_blob_ref_count_lifecycle(database, unique_name):
+    sha = hashlib.sha256(unique_name("blob").encode()).hexdigest()
+    name = blob_file_name(sha, ".png")
+
+    async def _run():
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        try:
+            async with async_sessionmaker(engine)() as db:
+                first = await acquire_blob(db, sha, name, 10)
+                # 第二次登记复用已有文件名，而不是调用方传入的新名字
+                second = await acquire_blob(db, sha, "other.png", 10)
+                last_after_one = await release_blob(db, sha)
+                last_after_two = await release_blob(db, sha)
+                remaining = await db.get(models.MediaBlob, sha)
+                await db.commit()
+            return first, second, last_after_one, last_after_two, remaining
+        finally:
+            await engine.dispose()
+
+    first, second, last_after_one, last_after_two, remaining = asyncio.run(_run())
+    assert first == (name, True)
+    assert second == (name, False)
+    assert last_after_one is False
+    assert last_after_two is True
+    assert remaining is None
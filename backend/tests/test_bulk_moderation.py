@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.auth import create_access_token, get_password_hash
+from app.core.blobs import blob_file_name
+from app.core.database import async_url_obj
+from app.core import purger
+from app.core.purger import MaterialPurger
+from app.models import models
+from main import app
+
+
+@pytest.fixture
+def seeded(db_session, unique_name):
+    """四个素材：前两个内容相同（共享一个 blob），一个已审核"""
+    name = unique_name("bm")
+    admin = models.User(username=name, email=f"{name}@example.com", hashed_password=get_password_hash("pw"), is_admin=True)
+    db_session.add(admin)
+    db_session.flush()
+
+    category = unique_name("cat")
+    shared, single = (hashlib.sha256(unique_name(p).encode()).hexdigest() for p in ("shared", "single"))
+    db_session.add_all([
+        models.MediaBlob(sha256=shared, file_path=blob_file_name(shared, ".png"), size=1, ref_count=2),
+        models.MediaBlob(sha256=single, file_path=blob_file_name(single, ".png"), size=1, ref_count=1),
+    ])
+    materials = [
+        models.Material(
+            title=f"bulk {i}", category=category, file_type="image", uploader_id=admin.id,
+            file_path=blob_file_name(sha, ".png"), content_hash=sha, is_approved=i == 3, file_size=10,
+        )
+        for i, sha in enumerate((shared, shared, single, None))
+    ]
+    materials[3].file_path = f"{category}.png"
+    db_session.add_all(materials)
+    db_session.commit()
+
+    yield {
+        "headers": {"Authorization": f"Bearer {create_access_token({'sub': name})}"},
+        "category": category,
+        "ids": [m.id for m in materials],
+        "hashes": (shared, single),
+        "admin_id": admin.id,
+    }
+
+    db_session.rollback()
+    db_session.execute(models.Material.__table__.delete().where(models.Material.category == category))
+    db_session.execute(models.MediaBlob.__table__.delete().where(models.MediaBlob.sha256.in_((shared, single))))
+    db_session.delete(db_session.get(models.User, admin.id))
+    db_session.commit()
+
+
+def test_bulk_moderation(db_session, seeded, count_queries):
+    headers, category, ids = seeded["headers"], seeded["category"], seeded["ids"]
+    shared, single = seeded["hashes"]
+
+    with TestClient(app) as client:
+        assert client.post("/api/admin/materials/batch/approve", json={"filter": {}}, headers=headers).status_code == 400
+        assert client.post("/api/admin/materials/batch/approve", json={}, headers=headers).status_code == 400
+
+        approved = client.post(
+            "/api/admin/materials/batch/approve",
+            json={"filter": {"category": category, "is_approved": False}},
+            headers=headers,
+        ).json()
+        assert approved == {"affected": 3, "ids": ids[:3]}
+
+        # 已全部审核，批量拒绝不影响任何素材
+        rejected = client.post("/api/admin/materials/batch/reject", json={"ids": ids}, headers=headers).json()
+        assert rejected["affected"] == 0
+
+        # 直接插入的行没有经过上传接口，先校正一次上传者计数
+        assert client.post("/api/admin/stats/reconcile", headers=headers).status_code == 200
+        db_session.expire_all()
+        admin = db_session.get(models.User, seeded["admin_id"])
+        assert (admin.materials_count, admin.materials_bytes) == (4, 40)
+
+        with count_queries() as counter:
+            deleted = client.post("/api/admin/materials/batch/delete", json={"ids": ids[:1]}, headers=headers).json()
+        assert deleted == {"affected": 1, "ids": ids[:1]}
+        assert sum(s.lstrip().upper().startswith("UPDATE MATERIALS") for s in counter.statements) == 1
+        db_session.refresh(admin)
+        assert (admin.materials_count, admin.materials_bytes) == (3, 30)
+        # 软删除后立即从列表与详情中消失，重复删除返回 404
+        assert client.get(f"/api/materials/{ids[0]}").status_code == 404
+        assert client.delete(f"/api/admin/materials/{ids[0]}", headers=headers).status_code == 404
+        listed = client.get("/api/materials/", params={"category": category}).json()
+        assert sorted(m["id"] for m in listed["materials"]) == ids[1:]
+
+        deleted = client.post("/api/admin/materials/batch/delete", json={"filter": {"category": category}}, headers=headers).json()
+        assert deleted["ids"] == ids[1:]
+
+    # 引用计数与文件在后台清理时才释放
+    assert db_session.get(models.MediaBlob, shared).ref_count == 2
+    assert asyncio.run(_purge()) >= len(ids)
+
+    db_session.expire_all()
+    assert db_session.scalars(select(models.Material.id).where(models.Material.category == category)).all() == []
+    assert db_session.scalars(select(models.MediaBlob).where(models.MediaBlob.sha256.in_((shared, single)))).all() == []
+
+
+async def _purge():
+    engine = create_async_engine(async_url_obj, poolclass=NullPool)
+    try:
+        return await MaterialPurger(session_factory=async_sessionmaker(engine), batch_size=2).purge()
+    finally:
+        await engine.dispose()
+
+
+def test_purge_failure_requeues_batch(db_session, seeded, monkeypatch):
+    ids = seeded["ids"][2:]
+    shared, single = seeded["hashes"]
+    # 删除时间早于库中其他软删除行，保证这两行排在队首
+    db_session.execute(
+        models.Material.__table__.update()
+        .where(models.Material.id.in_(ids))
+        .values(deleted_at=datetime(2000, 1, 1))
+    )
+    db_session.commit()
+
+    async def _fail(key, retries=0):
+        raise OSError("storage unavailable")
+
+    monkeypatch.setattr(purger, "delete_with_retry", _fail)
+
+    async def _run():
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        try:
+            await MaterialPurger(session_factory=async_sessionmaker(engine), batch_size=2).purge_batch()
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(OSError):
+        asyncio.run(_run())
+
+    # 行保留并排到队尾，引用计数随整批回滚
+    db_session.expire_all()
+    rows = db_session.scalars(select(models.Material).where(models.Material.id.in_(ids))).all()
+    assert len(rows) == 2
+    assert all(m.deleted_at > datetime(2000, 1, 1) for m in rows)
+    assert db_session.get(models.MediaBlob, single).ref_count == 1
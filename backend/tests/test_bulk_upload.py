@@ -0,0 +1,47 @@
+import asyncio
+import hashlib
+import zipfile
+
+import pytest
+
+from app.core.bulk_upload import BulkItem, archive_members, extract_member, stage_items
+from app.core.uploads import UploadTooLarge
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "lineups.zip"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("mirage/a.png", b"a" * 100)
+        zf.writestr("mirage/", b"")
+        zf.writestr("mirage/.DS_Store", b"x")
+        zf.writestr("__MACOSX/mirage/._a.png", b"x")
+        zf.writestr("bomb.png", b"\0" * 10_000)
+    return path
+
+
+def test_archive_members_skips_dirs_and_metadata(archive):
+    assert archive_members(archive) == ["mirage/a.png", "bomb.png"]
+
+
+def test_extract_member_hashes_and_limits_uncompressed_size(archive, tmp_path):
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+    streamed = extract_member(archive, "mirage/a.png", upload_dir, max_size=1000)
+    assert streamed.size == 100
+    assert streamed.sha256 == hashlib.sha256(b"a" * 100).hexdigest()
+    with pytest.raises(UploadTooLarge):
+        extract_member(archive, "bomb.png", upload_dir, max_size=1000)
+    assert [p.name for p in upload_dir.iterdir()] == [streamed.temp_path.name]
+
+
+def test_stage_items_records_errors_per_item(archive, tmp_path):
+    items = [
+        BulkItem(index=0, filename="a.png", stage=lambda: extract_member(archive, "mirage/a.png", tmp_path, 1000)),
+        BulkItem(index=1, filename="bomb.png", stage=lambda: extract_member(archive, "bomb.png", tmp_path, 1000)),
+        BulkItem(index=2, filename="bad.exe", error="不支持的文件类型"),
+    ]
+    asyncio.run(stage_items(items, concurrency=2))
+    assert items[0].streamed is not None and items[0].error is None
+    assert items[1].streamed is None and items[1].error == "文件大小超出限制"
+    assert items[2].error == "不支持的文件类型"
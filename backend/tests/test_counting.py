@@ -0,0 +1,16 @@
+from app.core.counting import CountCache
+
+
+def test_count_cache_get_set_and_invalidate():
+    cache = CountCache(ttl=60)
+    assert cache.get(("materials", "smoke")) is None
+    cache.set(("materials", "smoke"), 12)
+    assert cache.get(("materials", "smoke")) == 12
+    cache.invalidate()
+    assert cache.get(("materials", "smoke")) is None
+
+
+def test_count_cache_expires():
+    cache = CountCache(ttl=-1)
+    cache.set("pending", 3)
+    assert cache.get("pending") is None
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core import derived_assets
+from app.core.database import async_url_obj
+from app.core.derived_assets import DerivedAssetRecovery
+from app.models import models
+
+
+def test_recover_requeues_only_stale_pending_rows(db_session, unique_name, monkeypatch):
+    name = unique_name("da")
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.flush()
+    now = datetime.utcnow()
+    materials = {
+        # 任务随进程丢失：心跳早已过期
+        "stale": models.Material(file_path=f"{name}_a.png", derived_heartbeat_at=datetime(2000, 1, 1)),
+        # 其他 worker 仍在处理
+        "running": models.Material(file_path=f"{name}_b.png", derived_heartbeat_at=now),
+        "ready": models.Material(file_path=f"{name}_c.png", derived_heartbeat_at=datetime(2000, 1, 1), thumbnail_status="ready"),
+    }
+    for m in materials.values():
+        m.title, m.category, m.file_type, m.uploader_id = "t", name, "image", user.id
+        m.thumbnail_status = m.thumbnail_status or "pending"
+    db_session.add_all(materials.values())
+    db_session.commit()
+
+    ran = []
+
+    async def _generate(material_id, key, stem):
+        ran.append((material_id, key, stem))
+
+    monkeypatch.setattr(derived_assets, "generate_image_assets", _generate)
+
+    async def _run():
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        try:
+            recovery = DerivedAssetRecovery(session_factory=async_sessionmaker(engine), batch_size=1000)
+            await recovery.recover(now)
+            await asyncio.gather(*recovery._tasks)
+            # 已认领的行心跳刷新，马上再检查不会重复运行
+            await recovery.recover(now)
+            await asyncio.gather(*recovery._tasks)
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(_run())
+        mine = [r for r in ran if r[0] in {m.id for m in materials.values()}]
+        assert mine == [(materials["stale"].id, f"{name}_a.png", f"{name}_a")]
+        db_session.refresh(materials["stale"])
+        assert materials["stale"].derived_heartbeat_at == now
+    finally:
+        db_session.rollback()
+        for m in materials.values():
+            db_session.delete(m)
+        db_session.delete(user)
+        db_session.commit()
+
+
+def test_heartbeat_renews_rows_in_progress(db_session, unique_name):
+    name = unique_name("hb")
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.flush()
+    material = models.Material(
+        title="t", category=name, file_type="video", file_path=f"{name}.mp4", uploader_id=user.id,
+        thumbnail_status="pending", derived_heartbeat_at=datetime(2000, 1, 1),
+    )
+    db_session.add(material)
+    db_session.commit()
+    updated_at = material.updated_at
+    now = datetime.utcnow()
+
+    async def _run():
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        try:
+            recovery = DerivedAssetRecovery(session_factory=async_sessionmaker(engine))
+            recovery._running.add(material.id)
+            await recovery.heartbeat(now)
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(_run())
+        db_session.refresh(material)
+        assert material.derived_heartbeat_at == now
+        assert material.updated_at == updated_at
+    finally:
+        db_session.delete(material)
+        db_session.delete(user)
+        db_session.commit()
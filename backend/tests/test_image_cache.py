@@ -0,0 +1,56 @@
+import asyncio
+
+from app.api.media import snap_size
+from app.core.image_cache import DiskLRUCache
+
+
+def test_snap_size_rounds_up_to_allowlist():
+    allowed = [160, 480, 1080]
+    assert snap_size(1, allowed) == 160
+    assert snap_size(161, allowed) == 480
+    assert snap_size(480, allowed) == 480
+    assert snap_size(5000, allowed) == 1080
+
+
+def test_disk_lru_evicts_least_recently_used(tmp_path):
+    cache = DiskLRUCache(tmp_path / "cache", max_bytes=25)
+
+    def _writer(data):
+        async def _create(path):
+            path.write_bytes(data)
+        return _create
+
+    async def _run():
+        a = await cache.get_or_create("aa.webp", _writer(b"a" * 10))
+        await cache.get_or_create("bb.webp", _writer(b"b" * 10))
+        # 命中 a 后 b 成为最久未使用，写入 c 时被淘汰
+        assert await cache.get_or_create("aa.webp", _writer(b"x")) == a
+        await cache.get_or_create("cc.webp", _writer(b"c" * 10))
+        return a
+
+    a = asyncio.run(_run())
+    assert a.read_bytes() == b"a" * 10
+    assert not cache.path("bb.webp").exists()
+    assert cache.path("cc.webp").exists()
+
+    # 重启后按文件 mtime 重建索引
+    reloaded = DiskLRUCache(tmp_path / "cache", max_bytes=25)
+    asyncio.run(reloaded._ensure_loaded())
+    assert reloaded._total == 20
+
+
+def test_disk_lru_deduplicates_concurrent_requests(tmp_path):
+    cache = DiskLRUCache(tmp_path, max_bytes=1024)
+    calls = []
+
+    async def _create(path):
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        path.write_bytes(b"img")
+
+    async def _run():
+        return await asyncio.gather(*(cache.get_or_create("ab.png", _create) for _ in range(5)))
+
+    paths = asyncio.run(_run())
+    assert len(calls) == 1
+    assert len(set(paths)) == 1
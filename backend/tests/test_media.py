@@ -0,0 +1,70 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.core.media import MediaFiles, parse_range
+
+
+def _client(root, accel_prefix=None):
+    app = Starlette(routes=[Mount("/uploads", MediaFiles(root, 3600, accel_prefix))])
+    return TestClient(app)
+
+
+@pytest.fixture
+def media_root(tmp_path):
+    (tmp_path / "ab" / "cd").mkdir(parents=True)
+    (tmp_path / "ab" / "cd" / "clip.mp4").write_bytes(bytes(range(100)))
+    (tmp_path / ".upload-x.part").write_bytes(b"partial")
+    return tmp_path
+
+
+def test_parse_range():
+    assert parse_range("bytes=10-19", 100) == (10, 19)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    # 多区间按完整文件返回
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_media_files_cache_headers_and_ranges(media_root):
+    client = _client(media_root)
+
+    full = client.get("/uploads/ab/cd/clip.mp4")
+    assert full.status_code == 200
+    assert full.content == bytes(range(100))
+    assert full.headers["cache-control"] == "public, max-age=3600, immutable"
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+    assert not etag.startswith("W/")
+
+    assert client.get("/uploads/ab/cd/clip.mp4", headers={"If-None-Match": etag}).status_code == 304
+
+    part = client.get("/uploads/ab/cd/clip.mp4", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206
+    assert part.content == bytes(range(10, 20))
+    assert part.headers["content-range"] == "bytes 10-19/100"
+
+    # If-Range 不匹配时返回完整文件
+    stale = client.get("/uploads/ab/cd/clip.mp4", headers={"Range": "bytes=10-19", "If-Range": '"0-0"'})
+    assert stale.status_code == 200 and len(stale.content) == 100
+
+    unsatisfiable = client.get("/uploads/ab/cd/clip.mp4", headers={"Range": "bytes=200-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */100"
+
+    # 上传临时文件不对外提供
+    assert client.get("/uploads/.upload-x.part").status_code == 404
+
+
+def test_media_files_accel_redirect(media_root):
+    client = _client(media_root, accel_prefix="/_media/")
+
+    response = client.get("/uploads/ab/cd/clip.mp4")
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == "/_media/ab/cd/clip.mp4"
+    assert response.headers["cache-control"] == "public, max-age=3600, immutable"
+    assert response.content == b""
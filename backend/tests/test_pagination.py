@@ -0,0 +1,17 @@
+from datetime import datetime
+
+import pytest
+
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2025, 8, 22, 2, 5, 43, 785451)
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+def test_invalid_cursor_raises():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
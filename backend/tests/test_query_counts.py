@@ -0,0 +1,159 @@
+"""断言各列表/详情接口发出的 SQL 语句数，防止 N+1 懒加载回归"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.auth import create_access_token, get_password_hash
+from app.core.counting import invalidate_counts
+from app.models import models
+from main import app
+
+
+PAGE_SIZE = 20
+
+
+@pytest.fixture(scope="module")
+def client():
+    # 整个模块共用一个事件循环，asyncpg 连接池里的连接绑定在创建它的循环上
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def seeded(db_session, unique_name):
+    """创建若干上传者与素材（一半待审核），测试结束后清理"""
+    users = []
+    for _ in range(5):
+        name = unique_name("qc")
+        users.append(models.User(
+            username=name,
+            email=f"{name}@example.com",
+            hashed_password=get_password_hash("password"),
+            is_admin=True,
+        ))
+    db_session.add_all(users)
+    db_session.flush()
+
+    category = unique_name("cat")
+    materials = []
+    for i in range(PAGE_SIZE * 2):
+        materials.append(models.Material(
+            title=f"query count {i}",
+            category=category,
+            file_path=f"{category}_{i}.jpg",
+            file_type="image",
+            uploader_id=users[i % len(users)].id,
+            is_approved=i % 2 == 0,
+        ))
+    db_session.add_all(materials)
+    db_session.commit()
+    invalidate_counts()
+
+    yield {"category": category, "admin": users[0], "users": users, "materials": materials}
+
+    for m in materials:
+        db_session.delete(m)
+    for u in users:
+        db_session.delete(u)
+    db_session.commit()
+    invalidate_counts()
+
+
+def test_material_list_uploaders_loaded_in_one_query(client, seeded, count_queries):
+    with count_queries() as counter:
+        resp = client.get(
+            "/api/materials/",
+            params={"category": seeded["category"], "size": PAGE_SIZE, "include_unapproved": True},
+        )
+    assert resp.status_code == 200
+    assert len(resp.json()["materials"]) == PAGE_SIZE
+    # count + 本页素材 + 批量加载上传者
+    assert counter.count == 3, counter.statements
+
+
+def test_material_list_count_none_skips_count_query(client, seeded, count_queries):
+    with count_queries() as counter:
+        resp = client.get("/api/materials/", params={"category": seeded["category"], "count": "none"})
+    assert resp.status_code == 200
+    assert resp.json()["total_kind"] == "none"
+    assert counter.count == 2, counter.statements
+
+
+def test_material_detail_single_select(client, seeded, count_queries):
+    material_id = seeded["materials"][0].id
+    with count_queries() as counter:
+        resp = client.get(f"/api/materials/{material_id}")
+    assert resp.status_code == 200
+    assert resp.json()["uploader"]["id"] == seeded["materials"][0].uploader_id
+    # 素材 JOIN 上传者；浏览次数走缓冲区，不产生 UPDATE
+    assert counter.count == 1, counter.statements
+
+
+def test_pending_list_uploaders_loaded_in_one_query(client, seeded, count_queries):
+    token = create_access_token({"sub": seeded["admin"].username})
+    with count_queries() as counter:
+        resp = client.get(
+            "/api/admin/materials/pending",
+            params={"size": PAGE_SIZE},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert resp.status_code == 200
+    # 当前用户 + count + 本页素材 + 批量加载上传者
+    assert counter.count == 4, counter.statements
+
+
+def test_admin_stats_reads_counters_only(client, seeded, count_queries):
+    token = create_access_token({"sub": seeded["admin"].username})
+    with count_queries() as counter:
+        resp = client.get("/api/admin/stats", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    # 当前用户 + 计数器，与素材 / 用户表的大小无关
+    assert counter.count == 2, counter.statements
+
+
+def test_admin_users_keyset_pages_without_aggregating(client, seeded, count_queries):
+    token = create_access_token({"sub": seeded["admin"].username})
+    prefix = seeded["admin"].username[:3].upper()  # qc_，不区分大小写
+    seen = []
+    cursor = None
+    while True:
+        params = {"size": 2, "search": prefix, **({"cursor": cursor} if cursor else {})}
+        with count_queries() as counter:
+            resp = client.get("/api/admin/users", params=params, headers={"Authorization": f"Bearer {token}"})
+        assert resp.status_code == 200
+        # 当前用户 + 本页用户，素材数来自冗余列
+        assert counter.count == 2, counter.statements
+        page = resp.json()
+        seen += [u["id"] for u in page["users"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True)
+    assert {u.id for u in seeded["users"]} <= set(seen)
+
+
+def test_admin_export_streams_with_list_filters(client, seeded, count_queries):
+    import csv
+    import io
+    import json
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': seeded['admin'].username})}"}
+    with count_queries() as counter:
+        resp = client.get(
+            "/api/admin/materials/export",
+            params={"category": seeded["category"], "include_unapproved": True},
+            headers=headers,
+        )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["id"] for r in rows] == sorted(m.id for m in seeded["materials"])
+    assert rows[0]["uploader"] == seeded["materials"][0].uploader.username
+    # 当前用户 + 一条导出查询（游标分批 FETCH 不产生新的语句）
+    assert counter.count == 2, counter.statements
+
+    resp = client.get(
+        "/api/admin/materials/export", params={"category": seeded["category"], "format": "csv"}, headers=headers
+    )
+    table = list(csv.DictReader(io.StringIO(resp.content.decode("utf-8-sig"))))
+    assert len(table) == PAGE_SIZE  # 默认只导出已审核的素材
+    assert all(row["is_approved"] == "True" for row in table)
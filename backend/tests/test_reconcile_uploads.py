@@ -0,0 +1,57 @@
+import os
+
+from app.models import models
+from scripts.reconcile_uploads import reconcile, walk
+
+
+def _touch(root, key, content=b"x"):
+    path = root / key
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def test_walk_yields_keys_in_byte_order_and_skips_scratch(tmp_path):
+    for key in ("ab/cd/a.png", "ab/cd-x.png", "ab/c.png", "b.png", "ab/cd/hls_a/master.m3u8",
+                ".resized/aa/x.webp", "ab/.hls-123/seg.ts", "ab/cd/a.png.tmp-1", ".upload-1.part"):
+        _touch(tmp_path, key)
+
+    keys = [key for key, _ in walk(tmp_path)]
+    assert keys == sorted(keys)
+    assert keys == ["ab/c.png", "ab/cd-x.png", "ab/cd/a.png", "ab/cd/hls_a/master.m3u8", "b.png"]
+    # 增量：只产出 after 之后的文件
+    assert [key for key, _ in walk(tmp_path, after="ab/cd/a.png")] == ["ab/cd/hls_a/master.m3u8", "b.png"]
+
+
+def test_reconcile_reclaims_only_unreferenced_files(tmp_path, db_session, unique_name):
+    name = unique_name("rc")
+    referenced = f"zz/{name}/{name}.png"
+    thumb = f"zz/{name}/thumb_{name}.png"
+    variant = f"zz/{name}/{name}_160.webp"
+    material = models.Material(
+        title="reconcile", category="smoke", file_type="image", file_path=referenced,
+        thumbnail_path=thumb, variants=[{"path": variant}],
+    )
+    db_session.add(material)
+    db_session.commit()
+    try:
+        for key in (referenced, thumb, variant):
+            _touch(tmp_path, key)
+        orphan = _touch(tmp_path, f"zz/{name}/orphan.png", b"orphan")
+        fresh = _touch(tmp_path, f"zz/{name}/fresh.png")
+        os.utime(orphan, (0, 0))
+
+        result = reconcile(tmp_path, do_reclaim=True, min_age=3600, verbose=False)
+        assert result["orphans"] == 2
+        assert (result["reclaimed"], result["reclaimed_bytes"]) == (1, 6)
+        assert not orphan.exists()
+        # 新文件可能属于尚未提交的上传，不回收
+        assert fresh.exists()
+        assert all((tmp_path / key).exists() for key in (referenced, thumb, variant))
+        assert result["last_key"] is None
+
+        partial = reconcile(tmp_path, max_files=1, verbose=False)
+        assert partial["scanned"] == 1 and partial["last_key"] is not None
+    finally:
+        db_session.delete(material)
+        db_session.commit()
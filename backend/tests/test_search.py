@@ -0,0 +1,12 @@
+from app.core.search import build_prefix_tsquery, is_trigram_term
+
+
+def test_prefix_tsquery_strips_operators():
+    assert build_prefix_tsquery("Mirage  smoke!") == "mirage:* & smoke:*"
+    assert build_prefix_tsquery("a & | !b") == "a:* & b:*"
+
+
+def test_short_and_cjk_terms_use_trigram():
+    assert is_trigram_term("ab")
+    assert is_trigram_term("烟雾弹")
+    assert not is_trigram_term("mirage")
@@ -0,0 +1,52 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.storage import shard_key, sibling_key
+from app.models import models
+from scripts.shard_uploads import _row_dict, migrate_batch
+
+
+def test_migrate_batch_rewrites_dedup_rows_committed_after_fetch(tmp_path, db_session, unique_name):
+    name = unique_name("sh")
+    sha = hashlib.sha256(name.encode()).hexdigest()
+    old, thumb = f"{name}.png", f"thumb_{name}.png"
+    for key in (old, thumb):
+        (tmp_path / key).write_bytes(b"x")
+
+    def _material(**fields):
+        return models.Material(
+            title="shard", category="smoke", file_type="image", file_path=old, content_hash=sha, **fields
+        )
+
+    blob = models.MediaBlob(sha256=sha, file_path=old, size=1, ref_count=1)
+    first = _material(thumbnail_path=thumb, thumbnail_status="ready")
+    db_session.add_all([blob, first])
+    db_session.commit()
+    rows = [_row_dict(first)]
+
+    # 取批之后提交的重复上传：一个复用了已生成的缩略图，一个还在等自己的缩略图任务
+    reused = _material(thumbnail_path=thumb, thumbnail_status="ready")
+    pending = _material(thumbnail_status="pending")
+    db_session.add_all([reused, pending])
+    blob.ref_count = 3
+    db_session.commit()
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            updated, _ = migrate_batch(tmp_path, rows, pool, keep_old=False)
+        assert updated == 2
+
+        new = shard_key(old)
+        for m in (first, reused, blob, pending):
+            db_session.refresh(m)
+        assert first.file_path == reused.file_path == blob.file_path == new
+        assert reused.thumbnail_path == sibling_key(new, thumb)
+        # 仍在生成缩略图的行保留旧 key，旧文件不能被删除
+        assert pending.file_path == old
+        assert (tmp_path / old).exists()
+        assert (tmp_path / new).exists()
+        assert not (tmp_path / thumb).exists()
+    finally:
+        for m in (first, reused, pending, blob):
+            db_session.delete(m)
+        db_session.commit()
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app.core.auth import create_access_token, get_password_hash
+from app.core.stats import approval_deltas, material_deltas, user_deltas
+from app.models import models
+from main import app
+
+
+CREATED = datetime(2026, 10, 18, 12, 30)
+
+
+def test_material_deltas_cover_every_dimension():
+    deltas = material_deltas([("smoke", None, CREATED, True), ("smoke", "mirage", CREATED, False)])
+    assert deltas[("all", "", "materials")] == 2
+    assert deltas[("all", "", "approved_materials")] == 1
+    assert deltas[("category", "smoke", "materials")] == 2
+    assert deltas[("map", "", "approved_materials")] == 1
+    assert deltas[("map", "mirage", "materials")] == 1
+    assert deltas[("day", "2026-10-18", "materials")] == 2
+
+    removed = material_deltas([("smoke", None, CREATED, True)], sign=-1)
+    assert removed[("category", "smoke", "approved_materials")] == -1
+    assert approval_deltas([("he", "nuke", CREATED, False)])[("map", "nuke", "approved_materials")] == 1
+
+
+def test_user_deltas():
+    assert user_deltas(CREATED, is_active=False) == {("all", "", "users"): 1, ("day", "2026-10-18", "users"): 1}
+
+
+def test_reconcile_matches_tables(db_session, unique_name):
+    name = unique_name("st")
+    admin = models.User(username=name, email=f"{name}@example.com", hashed_password=get_password_hash("pw"), is_admin=True)
+    db_session.add(admin)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': name})}"}
+    try:
+        with TestClient(app) as client:
+            stats = client.post("/api/admin/stats/reconcile", headers=headers).json()
+        total, approved = db_session.execute(
+            select(func.count(), func.count().filter(models.Material.is_approved)).select_from(models.Material)
+        ).one()
+        assert (stats["total_materials"], stats["approved_materials"]) == (total, approved)
+        assert stats["total_users"] == db_session.scalar(select(func.count()).select_from(models.User))
+        assert sum(b["materials"] for b in stats["by_category"]) == total
+        assert sum(b["materials"] for b in stats["by_map"]) == total
+    finally:
+        db_session.delete(admin)
+        db_session.commit()
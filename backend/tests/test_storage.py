@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app.core.storage import LocalStorage, StorageError, shard_key, sibling_key
+
+
+def test_local_storage_roundtrip(tmp_path):
+    storage = LocalStorage(tmp_path / "media")
+    src = tmp_path / "upload.part"
+    src.write_bytes(b"lineup")
+
+    async def _run():
+        await storage.save(src, "ab/cd/file.jpg")
+        size = await storage.size("ab/cd/file.jpg")
+        async with storage.local_copy("ab/cd/file.jpg") as path:
+            content = path.read_bytes()
+        await storage.delete("ab/cd/file.jpg")
+        # 删除不存在的 key 不报错
+        await storage.delete("ab/cd/file.jpg")
+        return size, content, await storage.size("ab/cd/file.jpg")
+
+    assert asyncio.run(_run()) == (6, b"lineup", None)
+    assert not src.exists()
+
+
+def test_local_storage_has_no_presigned_uploads(tmp_path):
+    storage = LocalStorage(tmp_path)
+    assert storage.supports_presign is False
+    with pytest.raises(StorageError):
+        storage.presign_put("a.jpg", 1, "0" * 64)
+
+
+def test_shard_key_and_siblings():
+    key = shard_key("abcdef0123.jpg")
+    assert key == "ab/cd/abcdef0123.jpg"
+    assert sibling_key(key, "thumb_abcdef0123.jpg") == "ab/cd/thumb_abcdef0123.jpg"
+    # 未迁移的扁平 key 的派生文件仍在根目录
+    assert sibling_key("legacy.jpg", "thumb_legacy.jpg") == "thumb_legacy.jpg"
@@ -0,0 +1,39 @@
+from PIL import Image
+
+from app.core.thumbnails import make_resized, make_thumbnail, make_variants
+
+
+def test_make_thumbnail_uses_draft_and_bounds_size(tmp_path):
+    src = tmp_path / "big.jpg"
+    dst = tmp_path / "thumb_big.jpg"
+    Image.new("RGB", (3000, 2000), (10, 20, 30)).save(src, "JPEG")
+
+    make_thumbnail(str(src), str(dst))
+
+    with Image.open(dst) as thumb:
+        assert thumb.format == "JPEG"
+        assert max(thumb.size) == 300
+
+
+def test_make_variants_never_upscales(tmp_path):
+    src = tmp_path / "photo.png"
+    Image.new("RGB", (600, 300)).save(src, "PNG")
+
+    variants = make_variants(str(src), "photo", [160, 480, 1080], ["webp"])
+
+    assert [(v["width"], v["height"]) for v in variants] == [(600, 300), (480, 240), (160, 80)]
+    assert all((tmp_path / v["path"]).exists() and v["format"] == "webp" for v in variants)
+
+
+def test_make_resized_fits_box_without_upscaling(tmp_path):
+    src = tmp_path / "photo.png"
+    Image.new("RGBA", (800, 400)).save(src, "PNG")
+
+    make_resized(str(src), str(tmp_path / "a.jpeg"), 320, None, "jpeg")
+    make_resized(str(src), str(tmp_path / "b.webp"), 1920, 100, "webp")
+    make_resized(str(src), str(tmp_path / "c.png"), 1920, None, "png")
+
+    with Image.open(tmp_path / "a.jpeg") as a, Image.open(tmp_path / "b.webp") as b, Image.open(tmp_path / "c.png") as c:
+        assert (a.format, a.size) == ("JPEG", (320, 160))
+        assert b.size == (200, 100)
+        assert c.size == (800, 400)
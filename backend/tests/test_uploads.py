@@ -0,0 +1,353 @@
+import asyncio
+import hashlib
+
+import pytest
+from sqlalchemy import select
+from starlette.requests import Request
+
+from app.core.upload_form import FileField, TooManyFiles, receive_form
+from app.core.uploads import UploadTooLarge, hash_file, public_file_key, remove_quietly, write_chunk_at
+
+
+BOUNDARY = "testboundary"
+
+
+def _multipart(fields=(), files=()):
+    body = b""
+    for name, value in fields:
+        body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name, filename, data in files:
+        body += (
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _request(body, chunk_size=1000, content_length=True):
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    reads = []
+
+    async def receive():
+        reads.append(1)
+        data = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": data, "more_body": bool(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive)
+    return request, reads
+
+
+def test_receive_form_streams_files_into_upload_dir(tmp_path):
+    data = b"x" * 2500
+    body = _multipart(fields=[("title", "标题")], files=[("file", "a.png", data), ("other", "b.png", b"skip")])
+    request, _ = _request(body)
+    form = asyncio.run(receive_form(request, tmp_path, {"file": FileField(lambda name: 10_000)}, max_body=len(body)))
+    assert form.fields == {"title": "标题"}
+    [upload] = form.files
+    assert (upload.field, upload.filename) == ("file", "a.png")
+    assert upload.streamed.size == 2500
+    assert upload.streamed.temp_path.read_bytes() == data
+    assert upload.streamed.sha256 == hashlib.sha256(data).hexdigest()
+    # 未声明的文件字段不落盘
+    assert list(tmp_path.iterdir()) == [upload.streamed.temp_path]
+
+
+def test_receive_form_aborts_over_limit(tmp_path):
+    body = _multipart(files=[("file", "a.png", b"x" * 5000)])
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_form(_request(body)[0], tmp_path, {"file": FileField(lambda name: 3000)}, max_body=10**6))
+    assert list(tmp_path.iterdir()) == []
+
+    # 没有 Content-Length 的请求按实际接收的字节数限制
+    with pytest.raises(UploadTooLarge):
+        request = _request(body, content_length=False)[0]
+        asyncio.run(receive_form(request, tmp_path, {"file": FileField(lambda name: 10**6)}, max_body=3000))
+    assert list(tmp_path.iterdir()) == []
+
+    # Content-Length 超限时不读取请求体
+    request, reads = _request(body)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_form(request, tmp_path, {"file": FileField(lambda name: 10**6)}, max_body=3000))
+    assert reads == []
+
+
+def test_receive_form_keeps_going_after_lenient_file_too_large(tmp_path):
+    body = _multipart(files=[("files", "big.png", b"x" * 5000), ("files", "ok.png", b"ok"), ("files", "a.exe", b"no")])
+    spec = FileField(lambda name: None if name.endswith(".exe") else 3000, max_count=3, abort_too_large=False)
+    form = asyncio.run(receive_form(_request(body)[0], tmp_path, {"files": spec}, max_body=10**6))
+    big, ok, exe = form.files
+    assert big.too_large and big.streamed is None
+    assert ok.streamed.temp_path.read_bytes() == b"ok"
+    assert exe.streamed is None and not exe.too_large
+    assert list(tmp_path.iterdir()) == [ok.streamed.temp_path]
+
+    with pytest.raises(TooManyFiles):
+        spec.max_count = 2
+        asyncio.run(receive_form(_request(body)[0], tmp_path, {"files": spec}, max_body=10**6))
+
+
+async def _iter(*parts):
+    for part in parts:
+        yield part
+
+
+def test_write_chunk_at_appends_and_rewrites(tmp_path):
+    path = tmp_path / "session.part"
+    path.touch()
+    assert asyncio.run(write_chunk_at(path, 0, _iter(b"aaa", b"bb"), max_bytes=5)) == 5
+    assert asyncio.run(write_chunk_at(path, 5, _iter(b"ccccc"), max_bytes=5)) == 5
+    # 重传第二片：其后的内容被丢弃
+    assert asyncio.run(write_chunk_at(path, 5, _iter(b"dd"), max_bytes=5)) == 2
+    assert path.read_bytes() == b"aaabbdd"
+    assert hash_file(path, chunk_size=3) == hashlib.sha256(b"aaabbdd").hexdigest()
+
+
+def test_write_chunk_at_rejects_oversized_chunk(tmp_path):
+    path = tmp_path / "session.part"
+    path.write_bytes(b"12345")
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(write_chunk_at(path, 5, _iter(b"abc", b"def"), max_bytes=4))
+    assert path.read_bytes() == b"12345"
+
+
+def test_public_file_key_keeps_sharded_keys():
+    assert public_file_key("ab/cd/thumb_x.jpg") == "ab/cd/thumb_x.jpg"
+    assert public_file_key("uploads/thumb_x.jpg") == "thumb_x.jpg"
+    assert public_file_key("/app/uploads/thumb_x.jpg") == "thumb_x.jpg"
+    assert public_file_key("C:\\data\\uploads\\thumb_x.jpg") == "thumb_x.jpg"
+    assert public_file_key(None) is None
+
+
+def test_discard_session_files_keeps_key_shared_by_other_session(db_session, unique_name, monkeypatch, tmp_path):
+    from datetime import datetime, timedelta
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.core import upload_sessions
+    from app.core.database import async_url_obj
+    from app.core.storage import LocalStorage
+    from app.models import models
+
+    monkeypatch.setattr(upload_sessions, "storage", LocalStorage(tmp_path))
+    name = unique_name("ds")
+    key = f"zz/{name}.png"
+    (tmp_path / "zz").mkdir()
+    (tmp_path / key).write_bytes(b"x")
+
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.flush()
+    sessions = [
+        models.UploadSession(
+            id=f"{name}{i}", user_id=user.id, filename="a.png", file_type="image", total_size=1,
+            chunk_size=1, storage_key=key, expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+        for i in range(2)
+    ]
+    db_session.add_all(sessions)
+    db_session.commit()
+
+    async def _discard(session_id):
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        try:
+            async with async_sessionmaker(engine)() as db:
+                await upload_sessions.discard_session_files(db, session_id, key, None)
+        finally:
+            await engine.dispose()
+
+    try:
+        # 第一个会话取消时另一个会话仍在用同一个对象
+        db_session.delete(sessions[0])
+        db_session.commit()
+        asyncio.run(_discard(sessions[0].id))
+        assert (tmp_path / key).exists()
+
+        db_session.delete(sessions[1])
+        db_session.commit()
+        asyncio.run(_discard(sessions[1].id))
+        assert not (tmp_path / key).exists()
+    finally:
+        db_session.delete(user)
+        db_session.commit()
+
+
+def test_session_file_lock_rejects_concurrent_holder(tmp_path, monkeypatch):
+    from app.core import upload_sessions
+    from app.core.upload_sessions import SessionBusy, session_file_lock
+
+    monkeypatch.setattr(upload_sessions, "get_upload_dir", lambda: tmp_path)
+    upload_sessions.session_temp_path("s1").touch()
+
+    async def _run():
+        async with session_file_lock("s1"):
+            # 同一会话的第二个请求不排队，直接失败
+            with pytest.raises(SessionBusy):
+                async with session_file_lock("s1"):
+                    pass
+        # 释放后可以再次获取
+        async with session_file_lock("s1"):
+            pass
+        # 会话已被清理（临时文件不存在）
+        with pytest.raises(FileNotFoundError):
+            async with session_file_lock("gone"):
+                pass
+
+    asyncio.run(_run())
+
+
+def test_material_file_names_normalises_legacy_keys():
+    from types import SimpleNamespace
+
+    from app.core.uploads import material_file_names
+
+    material = SimpleNamespace(
+        file_path="uploads/a.png",
+        thumbnail_path="C:\\data\\uploads\\thumb_a.png",
+        poster_path="/srv/app/uploads/poster_a.jpg",
+        variants=[{"path": "ab/cd/a_160.webp"}],
+        hls_files=["ab/../../etc/passwd"],
+    )
+    assert material_file_names(material) == ["a.png", "thumb_a.png", "poster_a.jpg", "ab/cd/a_160.webp"]
+
+
+def test_resent_chunk_during_complete_cannot_touch_the_blob(db_session, unique_name, monkeypatch):
+    import httpx
+
+    from app.api import uploads as uploads_api
+    from app.core.auth import create_access_token
+    from app.core.database import async_engine
+    from app.core.storage import storage
+    from app.models import models
+    from main import app
+
+    name = unique_name("rc")
+    user = models.User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': name})}"}
+    data = name.encode() * 100
+    resent = {}
+
+    async def _run():
+        await async_engine.dispose()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            detach = uploads_api.detach_session_file
+
+            async def _detach_then_resend(session_id):
+                staged = await detach(session_id)
+                # complete 已取走文件、尚未提交时客户端重传第 0 片
+                response = await client.put(f"/api/uploads/{session_id}/chunks/0", content=b"x" * len(data), headers=headers)
+                resent["status"] = response.status_code
+                return staged
+
+            monkeypatch.setattr(uploads_api, "detach_session_file", _detach_then_resend)
+            session = (await client.post(
+                "/api/uploads/", json={"filename": "a.png", "total_size": len(data), "title": "t", "category": name},
+                headers=headers,
+            )).json()
+            await client.put(f"/api/uploads/{session['id']}/chunks/0", content=data, headers=headers)
+            response = await client.post(f"/api/uploads/{session['id']}/complete", headers=headers)
+        await async_engine.dispose()
+        return response
+
+    try:
+        response = asyncio.run(_run())
+        assert response.status_code == 200
+        assert resent["status"] == 404
+        material = response.json()
+        assert material["content_hash"] == hashlib.sha256(data).hexdigest()
+        assert storage.path(material["file_path"]).read_bytes() == data
+    finally:
+        db_session.rollback()
+        hashes = db_session.scalars(
+            select(models.Material.content_hash).where(models.Material.uploader_id == user.id)
+        ).all()
+        for sha in hashes:
+            blob = db_session.get(models.MediaBlob, sha)
+            if blob is not None:
+                remove_quietly(storage.path(blob.file_path))
+                db_session.delete(blob)
+        db_session.execute(models.Material.__table__.delete().where(models.Material.uploader_id == user.id))
+        db_session.delete(user)
+        db_session.commit()
+
+
+def test_direct_upload_requires_the_file_unless_the_user_owns_it(db_session, unique_name, monkeypatch):
+    import httpx
+
+    from app.core.auth import create_access_token
+    from app.core.database import async_engine
+    from app.core.storage import storage
+    from app.models import models
+    from main import app
+
+    # 本地存储模拟直传：预签名 PUT 即直接写入暂存 key
+    monkeypatch.setattr(storage, "supports_presign", True)
+    monkeypatch.setattr(storage, "presign_put", lambda key, size, sha256: {"url": key, "method": "PUT", "headers": {}})
+
+    names = [unique_name("du"), unique_name("du")]
+    users = [models.User(username=n, email=f"{n}@example.com", hashed_password="x") for n in names]
+    db_session.add_all(users)
+    db_session.commit()
+    owner, other = ({"Authorization": f"Bearer {create_access_token({'sub': n})}"} for n in names)
+    data = names[0].encode() * 100
+    body = {
+        "filename": "a.png", "total_size": len(data), "sha256": hashlib.sha256(data).hexdigest(),
+        "title": "t", "category": names[0],
+    }
+    results = {}
+
+    async def _run():
+        await async_engine.dispose()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ticket = (await client.post("/api/uploads/direct", json=body, headers=owner)).json()
+            results["first_upload"] = ticket["upload"]
+            path = storage.path(ticket["upload"]["url"])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            results["first"] = await client.post(f"/api/uploads/{ticket['id']}/complete", headers=owner)
+
+            # 别人知道哈希和大小也必须上传文件，不能直接 complete
+            ticket = (await client.post("/api/uploads/direct", json=body, headers=other)).json()
+            results["other_upload"] = ticket["upload"]
+            results["other"] = await client.post(f"/api/uploads/{ticket['id']}/complete", headers=other)
+            await client.delete(f"/api/uploads/{ticket['id']}", headers=other)
+
+            # 自己上传过的内容可以跳过上传
+            ticket = (await client.post("/api/uploads/direct", json=body, headers=owner)).json()
+            results["again_upload"] = ticket["upload"]
+            results["again"] = await client.post(f"/api/uploads/{ticket['id']}/complete", headers=owner)
+        await async_engine.dispose()
+
+    try:
+        asyncio.run(_run())
+        assert results["first_upload"]["url"].startswith(".direct/")
+        assert results["first"].status_code == 200
+        material = results["first"].json()
+        assert storage.path(material["file_path"]).read_bytes() == data
+        assert not storage.path(results["first_upload"]["url"]).exists()
+
+        assert results["other_upload"] is not None
+        assert results["other"].status_code == 409
+
+        assert results["again_upload"] is None
+        assert results["again"].status_code == 200
+        assert results["again"].json()["file_path"] == material["file_path"]
+    finally:
+        db_session.rollback()
+        ids = [u.id for u in users]
+        blob = db_session.get(models.MediaBlob, body["sha256"])
+        if blob is not None:
+            remove_quietly(storage.path(blob.file_path))
+            db_session.delete(blob)
+        db_session.execute(models.UploadSession.__table__.delete().where(models.UploadSession.user_id.in_(ids)))
+        db_session.execute(models.Material.__table__.delete().where(models.Material.uploader_id.in_(ids)))
+        for user in users:
+            db_session.delete(user)
+        db_session.commit()
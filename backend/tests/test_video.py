@@ -0,0 +1,36 @@
+import json
+
+from app.core.video import hls_renditions, master_playlist, parse_probe
+
+
+def test_parse_probe_reads_first_video_stream():
+    output = json.dumps({
+        "streams": [
+            {"codec_type": "audio", "codec_name": "aac"},
+            {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080, "duration": "12.480000"},
+        ],
+        "format": {"duration": "12.500000"},
+    }).encode()
+    assert parse_probe(output) == {"duration": 12.48, "width": 1920, "height": 1080, "video_codec": "h264"}
+
+
+def test_parse_probe_falls_back_to_container_duration():
+    output = json.dumps({"streams": [{"codec_type": "video", "codec_name": "vp9"}], "format": {"duration": "3.0"}}).encode()
+    assert parse_probe(output)["duration"] == 3.0
+
+
+def test_hls_renditions_never_upscale(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.HLS_RENDITIONS", [[720, 2800], [360, 800], [1080, 5000]])
+    assert [(r["width"], r["height"]) for r in hls_renditions(1280, 720)] == [(640, 360), (1280, 720)]
+    # 比最低档还小时只输出一档原尺寸
+    assert [(r["width"], r["height"], r["bitrate"]) for r in hls_renditions(320, 240)] == [(320, 240, 800)]
+
+
+def test_master_playlist_lists_renditions():
+    playlist = master_playlist([{"name": "360p", "width": 640, "height": 360, "bitrate": 800}])
+    assert playlist.splitlines() == [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-STREAM-INF:BANDWIDTH=984000,RESOLUTION=640x360",
+        "360p/index.m3u8",
+    ]
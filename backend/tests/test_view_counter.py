@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.database import async_url_obj
+from app.core.view_counter import ViewCounter
+from app.models import models
+
+
+def test_record_coalesces_per_material():
+    counter = ViewCounter(session_factory=None)
+    for _ in range(3):
+        counter.record(1)
+    counter.record(2)
+    assert counter.pending(1) == 3
+    assert counter.pending(2) == 1
+    assert counter.pending(3) == 0
+
+
+def test_flush_applies_increments(db_session, unique_name):
+    user = models.User(username=unique_name("vc"), email=f"{unique_name('vc')}@example.com", hashed_password="x")
+    db_session.add(user)
+    db_session.flush()
+    material = models.Material(
+        title="view counter", category="smoke", file_path="vc.jpg", file_type="image",
+        uploader_id=user.id, views=5,
+    )
+    db_session.add(material)
+    db_session.commit()
+
+    async def _flush():
+        engine = create_async_engine(async_url_obj, poolclass=NullPool)
+        counter = ViewCounter(session_factory=async_sessionmaker(engine))
+        for _ in range(4):
+            counter.record(material.id)
+        try:
+            return await counter.flush()
+        finally:
+            await engine.dispose()
+
+    try:
+        assert asyncio.run(_flush()) == 1
+        db_session.refresh(material)
+        assert material.views == 9
+    finally:
+        db_session.delete(material)
+        db_session.delete(user)
+        db_session.commit()
@@ -1,7 +1,7 @@
 import axios from 'axios'
-import type { Material, MaterialResponse, Category } from '@/types'
+import type { Material, MaterialResponse, Category, UploadSession, BulkUploadResponse, DirectUploadTicket } from '@/types'
 import type { LoginForm, RegisterForm, AuthResponse, User } from '@/types/auth'
-import type { AdminStats, AdminUser } from '@/types/admin'
+import type { AdminStats, AdminUserPage } from '@/types/admin'
 
 const api = axios.create({
   baseURL: '/api',
@@ -66,17 +66,35 @@ export const materialsApi = {
     return api.get(`/materials/${id}`)
   },
 
-  // 点赞素材
-  likeMaterial: (id: number): Promise<{ likes: number }> => {
+  // 点赞素材（幂等）
+  likeMaterial: (id: number): Promise<{ likes: number; liked: boolean }> => {
     return api.post(`/materials/${id}/like`)
   },
 
+  // 取消点赞
+  unlikeMaterial: (id: number): Promise<{ likes: number; liked: boolean }> => {
+    return api.delete(`/materials/${id}/like`)
+  },
+
+  // 批量查询当前用户的点赞状态
+  getLikedStatus: (ids: number[]): Promise<{ liked_ids: number[] }> => {
+    return api.get('/materials/likes/status', {
+      params: { ids },
+      paramsSerializer: { indexes: null },
+    })
+  },
+
   // 上传素材
   uploadMaterial: (data: FormData): Promise<Material> => {
   // 不能手动设置 multipart/form-data 头，否则 boundary 丢失导致后端解析不到字段 -> 422 Field required
   return api.post('/materials/upload', data)
   },
 
+  // 批量上传：FormData 中包含 category 等默认字段、多个 files 和/或一个 archive（zip）
+  bulkUploadMaterials: (data: FormData): Promise<BulkUploadResponse> => {
+    return api.post('/materials/bulk-upload', data, { timeout: 0 })
+  },
+
   // 获取类别列表
   getCategories: (): Promise<{ categories: Category[] }> => {
     return api.get('/materials/categories/list')
@@ -90,6 +108,83 @@ export const materialsApi = {
 
 export default api
 
+// 分片续传API
+export const uploadsApi = {
+  // 创建上传会话（同时提交素材字段）
+  createSession: (data: {
+    filename: string
+    total_size: number
+    title: string
+    category: string
+    description?: string
+    map_name?: string
+    tags?: string
+  }): Promise<UploadSession> => {
+    return api.post('/uploads/', data)
+  },
+
+  // 创建直传会话（仅对象存储后端）：返回预签名 PUT，存储中已有相同内容时 upload 为空
+  createDirect: (data: {
+    filename: string
+    total_size: number
+    sha256: string
+    title: string
+    category: string
+    description?: string
+    map_name?: string
+    tags?: string
+  }): Promise<DirectUploadTicket> => {
+    return api.post('/uploads/direct', data)
+  },
+
+  // 直传：文件直接 PUT 到对象存储，不经过 API 服务，完成后登记素材
+  uploadDirect: async (ticket: DirectUploadTicket, file: Blob): Promise<Material> => {
+    if (ticket.upload) {
+      await axios.request({
+        url: ticket.upload.url,
+        method: ticket.upload.method,
+        headers: ticket.upload.headers,
+        data: file,
+      })
+    }
+    return uploadsApi.complete(ticket.id)
+  },
+
+  // 查询已接收的偏移
+  getSession: (id: string): Promise<UploadSession> => {
+    return api.get(`/uploads/${id}`)
+  },
+
+  // 上传第 index 个分片
+  putChunk: (id: string, index: number, chunk: Blob): Promise<UploadSession> => {
+    return api.put(`/uploads/${id}/chunks/${index}`, chunk, {
+      headers: { 'Content-Type': 'application/octet-stream' },
+      timeout: 0,
+    })
+  },
+
+  // 全部分片到齐后创建素材
+  complete: (id: string): Promise<Material> => {
+    return api.post(`/uploads/${id}/complete`)
+  },
+
+  // 放弃上传
+  abort: (id: string): Promise<{ message: string }> => {
+    return api.delete(`/uploads/${id}`)
+  },
+
+  // 从会话的 next_chunk 开始依次上传剩余分片，断线后用同一个 session 再次调用即可续传
+  uploadFile: async (session: UploadSession, file: Blob, onProgress?: (received: number) => void): Promise<Material> => {
+    let current = session
+    while (current.received < current.total_size) {
+      const start = current.next_chunk * current.chunk_size
+      current = await uploadsApi.putChunk(current.id, current.next_chunk, file.slice(start, start + current.chunk_size))
+      onProgress?.(current.received)
+    }
+    return uploadsApi.complete(current.id)
+  }
+}
+
 // 认证相关API
 export const authApi = {
   // 用户登录
@@ -140,9 +235,10 @@ export const adminApi = {
 
   // 获取用户列表
   getUsers: (params?: {
-    page?: number
     size?: number
-  }): Promise<AdminUser[]> => {
+    cursor?: string
+    search?: string
+  }): Promise<AdminUserPage> => {
     return api.get('/admin/users', { params })
   },
 
@@ -1,14 +1,17 @@
 // 开发环境配置 (允许用 VITE_API_BASE 覆盖，以便 local_dev 动态端口注入)
 const DEV_BASE = import.meta.env.VITE_API_BASE || ''
+// 素材文件地址：本地存储为 /uploads，对象存储（STORAGE_BACKEND=s3）时用 VITE_UPLOAD_URL 指向桶的公开地址
+const UPLOAD_URL = import.meta.env.VITE_UPLOAD_URL || `/uploads`
+
 export const development = {
   API_BASE_URL: DEV_BASE,
-  UPLOAD_URL: `/uploads`
+  UPLOAD_URL
 }
 
 // 生产环境配置
 export const production = {
   API_BASE_URL: import.meta.env.VITE_API_BASE || '',
-  UPLOAD_URL: `/uploads`
+  UPLOAD_URL
 }
 
 // 根据环境变量自动选择配置
@@ -31,4 +31,11 @@ export interface AdminUser {
   is_admin: boolean
   created_at: string
   materials_count: number
+  materials_bytes: number
+}
+
+export interface AdminUserPage {
+  users: AdminUser[]
+  size: number
+  next_cursor?: string | null
 }
@@ -7,7 +7,17 @@ export interface Material {
   file_path: string
   file_type: string
   file_size?: number
+  content_hash?: string
   thumbnail_path?: string
+  thumbnail_status?: 'none' | 'pending' | 'ready' | 'failed'
+  variants?: ImageVariant[]
+  poster_path?: string
+  duration?: number
+  width?: number
+  height?: number
+  video_codec?: string
+  hls_path?: string
+  hls_status?: 'pending' | 'ready' | 'failed'
   tags?: string
   views: number
   likes: number
@@ -18,6 +28,44 @@ export interface Material {
   uploader: User
 }
 
+export interface BulkUploadResult {
+  index: number
+  filename: string
+  material_id: number | null
+  error: string | null
+}
+
+export interface BulkUploadResponse {
+  created: number
+  failed: number
+  results: BulkUploadResult[]
+}
+
+export interface DirectUploadTicket {
+  id: string
+  // 为空表示存储中已有相同内容，直接 complete
+  upload: { url: string; method: string; headers: Record<string, string> } | null
+  expires_at: string
+}
+
+export interface UploadSession {
+  id: string
+  filename: string
+  total_size: number
+  chunk_size: number
+  received: number
+  next_chunk: number
+  expires_at: string
+}
+
+export interface ImageVariant {
+  width: number
+  height: number
+  format: string
+  path: string
+  size?: number
+}
+
 export interface User {
   id: number
   username: string
@@ -29,9 +77,11 @@ export interface User {
 
 export interface MaterialResponse {
   materials: Material[]
-  total: number
+  total: number | null
+  total_kind?: 'exact' | 'estimate' | 'none'
   page: number
   size: number
+  next_cursor?: string | null
 }
 
 export interface Category {